@@ -0,0 +1,108 @@
+# bench_flatten_json.py
+"""Throughput of `flatten_json` against the previous recursive version on synthetic listings.
+
+Checks that the default mode still matches the recursive output key for key, then
+reports listings/sec (best of --repeat runs) for each mode. Raise --max-images to
+see how both scale with list length.
+
+Run with:
+    python -m benchmarks.bench_flatten_json --rows 2000 --max-images 60
+or, through pytest-benchmark (`BENCH_ROWS` listings):
+    pytest benchmarks/bench_flatten_json.py
+"""
+
+import argparse
+import time
+
+import pytest
+
+from benchmarks.synthetic import synthetic_properties
+from pipelines.helper_functions import NESTED_LIST_PATHS, flatten_json
+
+
+def legacy_flatten_json(y, prefix="", keep_paths=()):
+    """The recursive implementation `flatten_json` replaced, kept as the baseline."""
+    out = {}
+
+    if keep_paths and prefix[:-1] in keep_paths:
+        out[prefix[:-1]] = y
+    elif isinstance(y, dict):
+        for k, v in y.items():
+            out.update(legacy_flatten_json(v, prefix + k + ".", keep_paths))
+    elif isinstance(y, list):
+        for i, v in enumerate(y):
+            out.update(legacy_flatten_json(v, prefix + str(i) + ".", keep_paths))
+    else:
+        out[prefix[:-1]] = y
+
+    return out
+
+
+CASES = [
+    ("legacy", lambda p: legacy_flatten_json(p)),
+    ("default", lambda p: flatten_json(p)),
+    ("legacy nested", lambda p: legacy_flatten_json(p, keep_paths=NESTED_LIST_PATHS)),
+    ("nested", lambda p: flatten_json(p, keep_paths=NESTED_LIST_PATHS)),
+    ("keep_lists", lambda p: flatten_json(p, keep_lists=True)),
+    ("max_depth=3", lambda p: flatten_json(p, max_depth=3)),
+]
+
+
+def bench(fn, payloads, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for payload in payloads:
+            fn(payload)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def check_matches_legacy(payloads) -> None:
+    """Raises SystemExit if `flatten_json` differs from the recursive version on any payload."""
+    for keep_paths in ((), NESTED_LIST_PATHS):
+        for payload in payloads:
+            expected = legacy_flatten_json(payload, keep_paths=keep_paths)
+            actual = flatten_json(payload, keep_paths=keep_paths)
+            if list(expected.items()) != list(actual.items()):
+                raise SystemExit("flatten_json output differs from the recursive version")
+
+
+# ------------------------------------------------------
+# pytest-benchmark cases
+# ------------------------------------------------------
+@pytest.fixture(scope="module")
+def payloads(rows) -> list:
+    return list(synthetic_properties(rows))
+
+
+def test_matches_legacy(payloads):
+    check_matches_legacy(payloads)
+
+
+@pytest.mark.parametrize("name, fn", CASES, ids=[name for name, _ in CASES])
+def test_flatten(benchmark, payloads, name, fn):
+    benchmark.extra_info["listings"] = len(payloads)
+    benchmark(lambda: [fn(payload) for payload in payloads])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--max-images", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    payloads = list(synthetic_properties(args.rows, max_images=args.max_images))
+    check_matches_legacy(payloads)
+
+    leaves = sum(len(flatten_json(p)) for p in payloads)
+    print(f"{args.rows} synthetic listings, {leaves / args.rows:.0f} keys per listing (output identical)")
+
+    for name, fn in CASES:
+        elapsed = bench(fn, payloads, args.repeat)
+        print(f"{name:>14}: {elapsed * 1000:9.1f} ms  {args.rows / elapsed:10.0f} listings/s")
+
+
+if __name__ == "__main__":
+    main()
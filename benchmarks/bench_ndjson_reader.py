@@ -0,0 +1,111 @@
+# bench_ndjson_reader.py
+"""Compares the raw-layer NDJSON read paths on synthetic flattened listings.
+
+* legacy:  decode body -> json.loads per line -> pl.DataFrame(list_of_dicts)
+* native:  spool stream -> pl.read_ndjson (what `read_ndjson_frame_from_minio` does)
+
+Run with:
+    python -m benchmarks.bench_ndjson_reader --rows 2000 --compression gzip
+or, through pytest-benchmark (`BENCH_ROWS` rows, every available compression):
+    pytest benchmarks/bench_ndjson_reader.py
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import polars as pl
+import pytest
+
+from benchmarks.synthetic import synthetic_properties
+from pipelines.helper_functions import flatten_json, ndjson_stream_to_frame
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def build_payload(rows: int, compression: str = None) -> bytes:
+    body = "".join(json.dumps(flatten_json(p)) + "\n" for p in synthetic_properties(rows)).encode("utf-8")
+    if compression == "gzip":
+        return gzip.compress(body)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(body)
+    return body
+
+
+def legacy_read(payload: bytes, compression: str = None) -> pl.DataFrame:
+    if compression == "gzip":
+        payload = gzip.decompress(payload)
+    elif compression == "zstd":
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    content = payload.decode("utf-8")
+    records = [json.loads(line) for line in content.strip().splitlines()]
+    return pl.DataFrame(records, infer_schema_length=None)
+
+
+def native_read(payload: bytes, compression: str = None) -> pl.DataFrame:
+    spool_path = os.path.join(tempfile.gettempdir(), "bench_ndjson_reader.ndjson")
+    return ndjson_stream_to_frame(io.BytesIO(payload), spool_path, content_encoding=compression)
+
+
+def measure(fn, *args):
+    # tracemalloc only sees Python allocations, which is exactly what the legacy path is heavy on
+    tracemalloc.start()
+    started = time.perf_counter()
+    df = fn(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+# ------------------------------------------------------
+# pytest-benchmark cases
+# ------------------------------------------------------
+COMPRESSIONS = [None, "gzip"] + (["zstd"] if zstandard is not None else [])
+READERS = [legacy_read, native_read]
+
+
+@pytest.fixture(scope="module", params=COMPRESSIONS, ids=lambda c: c or "plain")
+def payload(request, rows) -> tuple:
+    return build_payload(rows, request.param), request.param
+
+
+def test_native_matches_legacy(payload):
+    expected = legacy_read(*payload)
+    assert native_read(*payload).select(expected.columns).equals(expected)
+
+
+@pytest.mark.parametrize("reader", READERS, ids=lambda fn: fn.__name__)
+def test_read(benchmark, payload, reader):
+    benchmark.extra_info["bytes"] = len(payload[0])
+    df = benchmark(reader, *payload)
+    benchmark.extra_info["rows"] = df.height
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    args = parser.parse_args()
+
+    payload = build_payload(args.rows, args.compression)
+    print(f"payload: {args.rows} rows, {len(payload) / 1e6:.1f} MB ({args.compression or 'plain'})")
+
+    for name, fn in [("legacy", legacy_read), ("native", native_read)]:
+        df, elapsed, peak = measure(fn, payload, args.compression)
+        print(
+            f"{name:>7}: {elapsed:7.3f}s  {df.height / elapsed:10.0f} rows/s  "
+            f"{df.width} cols  python peak {peak / 1e6:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# bench_silver_transforms.py
+"""Throughput of the silver-layer helpers on N synthetic listings.
+
+Reports input rows/sec (best of --repeat runs) for every helper in
+`pipelines.helper_functions` used by `build_silver_incremental`, so a
+regression in any single transform shows up on its own line.
+
+Room dimension parsing and summary cleaning are also checked against known strings, and the run fails
+when `explode_room_details` drops below `--min-room-rows-per-sec` listings/s
+(`MIN_ROOM_ROWS_PER_SEC` under pytest).
+
+Run with:
+    python -m benchmarks.bench_silver_transforms --rows 5000 --layout nested
+or, through pytest-benchmark (both layouts, `BENCH_ROWS` listings):
+    pytest benchmarks/bench_silver_transforms.py
+"""
+
+import argparse
+import os
+import time
+
+import polars as pl
+import pytest
+
+from benchmarks.synthetic import synthetic_properties
+from pipelines.helper_functions import (
+    NESTED_LIST_PATHS,
+    add_room_dimensions,
+    clean_accommodation_summary_column,
+    explode_images,
+    explode_room_details,
+    extract_agent_dim,
+    extract_energy_metrics,
+    extract_location_dim,
+    flatten_json,
+)
+
+HELPERS = [
+    clean_accommodation_summary_column,
+    explode_room_details,
+    explode_images,
+    extract_agent_dim,
+    extract_location_dim,
+    extract_energy_metrics,
+]
+
+# dimensions, dimensions_alt -> length_m, width_m, dimension_parse_status
+ROOM_DIMENSION_CASES = [
+    ("4.50m x 3.20m", None, 4.5, 3.2, "ok"),
+    ("450 x 320cm", None, 4.5, 3.2, "ok"),
+    ("14'9\" x 10'6\"", None, 4.5, 3.2, "ok"),
+    ("3.20m (10'6\") x 2.5m (8'2\")", None, 3.2, 2.5, "ok"),
+    (None, "14ft 9in x 10ft 6in", 4.5, 3.2, "ok"),
+    ("5m", None, 5.0, None, "partial"),
+    ("see floor plan", None, None, None, "unparsed"),
+    (None, None, None, None, "missing"),
+]
+
+
+def check_room_dimensions() -> None:
+    """Raises SystemExit if any known dimension string parses differently."""
+    inputs = pl.DataFrame(
+        [case[:2] for case in ROOM_DIMENSION_CASES],
+        schema={"dimensions": pl.Utf8, "dimensions_alt": pl.Utf8},
+        orient="row",
+    )
+    got = add_room_dimensions(inputs).select("length_m", "width_m", "dimension_parse_status").rows()
+    mismatches = [
+        (case[:2], row, case[2:]) for case, row in zip(ROOM_DIMENSION_CASES, got) if row != case[2:]
+    ]
+    if mismatches:
+        raise SystemExit(f"Room dimension parsing changed (input, got, expected): {mismatches}")
+    # A dimensions_alt column that is entirely null arrives with dtype Null
+    add_room_dimensions(inputs.with_columns(pl.lit(None).alias("dimensions_alt")))
+
+
+ACCOMMODATION_SUMMARY_CASES = [
+    "• 3 bedrooms\r\n• 2 bathrooms\n\n  • Garden ",
+    "Single line",
+    "",
+    None,
+]
+
+
+def check_accommodation_summary() -> None:
+    """Raises SystemExit if the summary expression disagrees with the old per-row cleaner."""
+    column = "result.pageContext.propertyData.accomadation_summary"
+    inputs = pl.DataFrame({column: ACCOMMODATION_SUMMARY_CASES}, schema={column: pl.Utf8})
+    got = clean_accommodation_summary_column(inputs)[column].to_list()
+    expected = [
+        None if summary is None else ", ".join(
+            line.strip("•").strip() for line in summary.replace("\r", "\n").split("\n") if line.strip()
+        )
+        for summary in ACCOMMODATION_SUMMARY_CASES
+    ]
+    if got != expected:
+        raise SystemExit(f"Accommodation summary cleaning changed: got {got}, expected {expected}")
+
+
+def build_raw_frame(rows: int, layout: str = "flattened") -> pl.DataFrame:
+    """Raw-layer frame as `ingest_raw` would see it, plus the lat/lon columns silver adds."""
+    keep_paths = NESTED_LIST_PATHS if layout == "nested" else ()
+    df = pl.DataFrame(
+        [flatten_json(p, keep_paths=keep_paths) for p in synthetic_properties(rows)],
+        infer_schema_length=None,
+    )
+    return df.with_columns(
+        pl.col("result.pageContext.propertyData.latitude").alias("latitude"),
+        pl.col("result.pageContext.propertyData.longitude").alias("longitude"),
+    )
+
+
+def bench(fn, df: pl.DataFrame, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - started)
+    return best, out
+
+
+# ------------------------------------------------------
+# pytest-benchmark cases
+# ------------------------------------------------------
+MIN_ROOM_ROWS_PER_SEC = float(os.getenv("MIN_ROOM_ROWS_PER_SEC", "1000"))
+
+
+def test_room_dimensions():
+    check_room_dimensions()
+
+
+def test_accommodation_summary():
+    check_accommodation_summary()
+
+
+@pytest.fixture(scope="module", params=["flattened", "nested"])
+def raw_frame(request, rows) -> pl.DataFrame:
+    return build_raw_frame(rows, request.param)
+
+
+@pytest.mark.parametrize("fn", HELPERS, ids=lambda fn: fn.__name__)
+def test_helper(benchmark, raw_frame, fn):
+    benchmark.extra_info["rows_in"] = raw_frame.height
+    out = benchmark(fn, raw_frame)
+    benchmark.extra_info["rows_out"] = out.height
+    if fn is explode_room_details and benchmark.stats:
+        rows_per_sec = raw_frame.height / benchmark.stats.stats.min
+        assert rows_per_sec >= MIN_ROOM_ROWS_PER_SEC, (
+            f"explode_room_details ran at {rows_per_sec:.0f} rows/s, "
+            f"below MIN_ROOM_ROWS_PER_SEC {MIN_ROOM_ROWS_PER_SEC:.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--layout", choices=["flattened", "nested"], default="flattened")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-room-rows-per-sec", type=float, default=MIN_ROOM_ROWS_PER_SEC,
+                        help="fail when explode_room_details is slower than this")
+    args = parser.parse_args()
+
+    check_room_dimensions()
+    check_accommodation_summary()
+
+    df = build_raw_frame(args.rows, args.layout)
+    print(f"{args.rows} synthetic listings, {args.layout} layout, {df.width} raw columns")
+
+    for fn in HELPERS:
+        elapsed, out = bench(fn, df, args.repeat)
+        print(
+            f"{fn.__name__:>36}: {elapsed * 1000:9.1f} ms  "
+            f"{df.height / elapsed:12.0f} rows/s  -> {out.height} rows out"
+        )
+        if fn is explode_room_details and df.height / elapsed < args.min_room_rows_per_sec:
+            raise SystemExit(
+                f"explode_room_details ran at {df.height / elapsed:.0f} rows/s, "
+                f"below --min-room-rows-per-sec {args.min_room_rows_per_sec:.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# bench_spatial.py
+"""Cell-pruned spatial queries against brute-force scans on synthetic points.
+
+Generates N points clustered around Dublin, checks that `SpatialIndex` returns
+exactly what a full haversine scan returns, then reports ms/query for radius,
+bounding-box and k-nearest queries both ways.
+
+Run with:
+    python -m benchmarks.bench_spatial --sizes 100000 1000000 --queries 50
+or, through pytest-benchmark (`BENCH_POINTS` points):
+    pytest benchmarks/bench_spatial.py
+"""
+
+import argparse
+import math
+import random
+import time
+
+import polars as pl
+import pytest
+
+from pipelines.spatial import KM_PER_DEGREE, SpatialIndex, haversine_km
+
+CENTRE = (53.35, -6.26)
+
+
+def synthetic_points(n: int, seed: int = 42) -> pl.DataFrame:
+    """Points in a few dense clusters over a sparse background, like listings in a city."""
+    rng = random.Random(seed)
+    hubs = [(CENTRE[0] + rng.uniform(-0.1, 0.1), CENTRE[1] + rng.uniform(-0.2, 0.2)) for _ in range(8)]
+    lats, lons = [], []
+    for _ in range(n):
+        if rng.random() < 0.7:
+            lat, lon = rng.choice(hubs)
+            lats.append(rng.gauss(lat, 0.02))
+            lons.append(rng.gauss(lon, 0.03))
+        else:
+            lats.append(CENTRE[0] + rng.uniform(-0.5, 0.5))
+            lons.append(CENTRE[1] + rng.uniform(-0.8, 0.8))
+    return pl.DataFrame({"id": range(n), "latitude": lats, "longitude": lons})
+
+
+def brute_radius(df: pl.DataFrame, lat: float, lon: float, km: float) -> pl.DataFrame:
+    return (
+        df.with_columns(haversine_km("latitude", "longitude", lat, lon))
+        .filter(pl.col("distance_km") <= km)
+        .sort("distance_km")
+    )
+
+
+def brute_bbox(df, min_lat, min_lon, max_lat, max_lon) -> pl.DataFrame:
+    return df.filter(
+        pl.col("latitude").is_between(min_lat, max_lat),
+        pl.col("longitude").is_between(min_lon, max_lon),
+    )
+
+
+def brute_nearest(df: pl.DataFrame, lat: float, lon: float, k: int) -> pl.DataFrame:
+    return df.with_columns(haversine_km("latitude", "longitude", lat, lon)).sort("distance_km").head(k)
+
+
+def build_queries(n: int, radius_km: float = 2.0, k: int = 10) -> dict:
+    """Radius, bounding-box and k-nearest query arguments around `n` random centres."""
+    rng = random.Random(7)
+    centres = [
+        (CENTRE[0] + rng.uniform(-0.3, 0.3), CENTRE[1] + rng.uniform(-0.5, 0.5))
+        for _ in range(n)
+    ]
+    half = radius_km / KM_PER_DEGREE
+    return {
+        "radius": [(lat, lon, radius_km) for lat, lon in centres],
+        "bbox": [
+            (lat - half, lon - half / math.cos(math.radians(lat)), lat + half, lon + half / math.cos(math.radians(lat)))
+            for lat, lon in centres
+        ],
+        "nearest": [(lat, lon, k) for lat, lon in centres],
+    }
+
+
+def query_pairs(df: pl.DataFrame, index: SpatialIndex) -> dict:
+    """Query kind -> (indexed, full scan) functions over the same points."""
+    return {
+        "radius": (index.radius, lambda *q: brute_radius(df, *q)),
+        "bbox": (index.bbox, lambda *q: brute_bbox(df, *q)),
+        "nearest": (index.nearest, lambda *q: brute_nearest(df, *q)),
+    }
+
+
+def check_same_ids(name: str, fast, slow) -> None:
+    """Raises SystemExit if any indexed result differs from the full scan."""
+    for a, b in zip(fast, slow):
+        if sorted(a["id"].to_list()) != sorted(b["id"].to_list()):
+            raise SystemExit(f"{name}: indexed result differs from the full scan")
+
+
+def timed(fn, queries) -> tuple:
+    started = time.perf_counter()
+    results = [fn(*q) for q in queries]
+    return (time.perf_counter() - started) * 1000 / len(queries), results
+
+
+# ------------------------------------------------------
+# pytest-benchmark cases
+# ------------------------------------------------------
+KINDS = ["radius", "bbox", "nearest"]
+
+
+@pytest.fixture(scope="module")
+def indexed_points(points) -> tuple:
+    df = synthetic_points(points)
+    return df, SpatialIndex(df)
+
+
+@pytest.fixture(scope="module")
+def queries() -> dict:
+    return build_queries(20)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_indexed_matches_scan(indexed_points, queries, kind):
+    indexed, brute = query_pairs(*indexed_points)[kind]
+    check_same_ids(kind, [indexed(*q) for q in queries[kind]], [brute(*q) for q in queries[kind]])
+
+
+def test_build_index(benchmark, points):
+    df = synthetic_points(points)
+    benchmark(SpatialIndex, df)
+
+
+@pytest.mark.parametrize("mode", ["indexed", "scan"])
+@pytest.mark.parametrize("kind", KINDS)
+def test_query(benchmark, indexed_points, queries, kind, mode):
+    indexed, brute = query_pairs(*indexed_points)[kind]
+    fn = brute if mode == "scan" else indexed
+    benchmark.extra_info["queries"] = len(queries[kind])
+    benchmark(lambda: [fn(*q) for q in queries[kind]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    queries = build_queries(args.queries, args.radius_km, args.k)
+
+    for n in args.sizes:
+        df = synthetic_points(n)
+        started = time.perf_counter()
+        index = SpatialIndex(df)
+        build_ms = (time.perf_counter() - started) * 1000
+        print(f"{n} points, index built in {build_ms:.0f} ms")
+
+        for name, (indexed, brute) in query_pairs(df, index).items():
+            fast_ms, fast = timed(indexed, queries[name])
+            slow_ms, slow = timed(brute, queries[name])
+            check_same_ids(name, fast, slow)
+            rows = sum(r.height for r in fast) / len(queries[name])
+            print(
+                f"{name:>8}: indexed {fast_ms:7.2f} ms  scan {slow_ms:7.2f} ms  "
+                f"{slow_ms / fast_ms:5.1f}x  ({rows:.0f} rows/query)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# conftest.py
+"""pytest setup for the benchmark modules.
+
+`pytest benchmarks` runs the correctness checks and times every case with
+pytest-benchmark; add `--benchmark-only` to skip the checks, or `--benchmark-disable`
+to run each case once as a plain test. Input sizes come from `BENCH_ROWS` and
+`BENCH_POINTS` so CI can keep them small.
+
+Without pytest-benchmark installed the timed cases are skipped and only the
+checks run.
+"""
+
+import importlib.util
+import os
+
+import pytest
+
+BENCH_ROWS = int(os.getenv("BENCH_ROWS", "1000"))
+BENCH_POINTS = int(os.getenv("BENCH_POINTS", "100000"))
+
+
+def pytest_collection_modifyitems(items):
+    if importlib.util.find_spec("pytest_benchmark") is not None:
+        return
+    skip = pytest.mark.skip(reason="pytest-benchmark is not installed")
+    for item in items:
+        if "benchmark" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def rows() -> int:
+    return BENCH_ROWS
+
+
+@pytest.fixture(scope="session")
+def points() -> int:
+    return BENCH_POINTS
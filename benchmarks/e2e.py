@@ -0,0 +1,552 @@
+# e2e.py
+"""End-to-end pipeline benchmark on synthetic listings against a local S3.
+
+Starts a throwaway S3 (a moto server by default, or a local `minio` binary, or an
+existing endpoint), writes N synthetic listings per day as sharded NDJSON the way
+the scraper does, then for each day runs `ingest_raw`, `build_silver_incremental`,
+the DuckDB load (`lake_cache.refresh_cache`) and the dbt models. Day one is a full
+load; later days reprice `--churn` of the listings and add `--growth` new ones, so
+the incremental paths are measured too.
+
+Per step it reports wall/CPU time, listings per second, peak RSS, S3 bytes and the
+files each step leaves behind, using the stage records of
+`pipelines.instrumentation`. The report is written as JSON next to the commit it
+was run on, and `--baseline` compares it with an earlier one.
+
+Run with:
+    python -m benchmarks.e2e --listings 20000 --days 2
+    python -m benchmarks.e2e --steps ingest_raw build_silver   # no DuckDB delta extension or dbt
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.synthetic import synthetic_properties
+
+ACCESS_KEY = "minioadmin"
+SECRET_KEY = "minioadmin"
+RAW_BUCKET = "bench-scrape"
+# Same layout as the scraper: shards and manifest under one dated prefix per day
+OBJECT_NAME_TEMPLATE = "raw/scraped_data_{date}/props.ndjson"
+FIRST_DAY = date(2025, 1, 1)
+
+STEPS = ["generate", "ingest_raw", "build_silver", "duckdb_load", "dbt"]
+
+PRICE_PATH = ("result", "pageContext", "propertyData", "price")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Local S3 exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Local S3 did not start on port {port} within {timeout:.0f}s")
+
+
+def _peak_rss_of(pid: int) -> Optional[int]:
+    """High-water RSS of another process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+@contextmanager
+def local_s3(kind: str, workdir: str):
+    """
+    Runs a local S3 server for the duration of the benchmark.
+
+    The server lives in its own process so its memory is not counted against the
+    pipeline stages.
+
+    Args:
+        kind (str): "moto" (needs `moto[server]`) or "minio" (needs `minio` on PATH).
+        workdir (str): Where MinIO keeps its data.
+
+    Yields:
+        dict: `endpoint` URL, server `pid` and the keys to use.
+    """
+    port = _free_port()
+    env = dict(os.environ)
+    if kind == "minio":
+        if not shutil.which("minio"):
+            raise SystemExit("minio binary not found on PATH; use --s3 moto")
+        command = ["minio", "server", os.path.join(workdir, "minio"),
+                   "--address", f"127.0.0.1:{port}", "--quiet"]
+        env.update(MINIO_ROOT_USER=ACCESS_KEY, MINIO_ROOT_PASSWORD=SECRET_KEY)
+    else:
+        command = [sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)]
+
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for_port(port, process)
+        yield {"endpoint": f"http://127.0.0.1:{port}", "pid": process.pid,
+               "access_key": ACCESS_KEY, "secret_key": SECRET_KEY}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextmanager
+def s3_endpoint(args, workdir: str):
+    """The S3 given with `--endpoint` (keys from the MINIO_* env), else a local one."""
+    if not args.endpoint:
+        with local_s3(args.s3, workdir) as server:
+            yield server
+        return
+    yield {
+        "endpoint": args.endpoint,
+        "pid": None,
+        "access_key": os.getenv("MINIO_ACCESS_KEY_ID", ACCESS_KEY),
+        "secret_key": os.getenv("MINIO_SECRET_ACCESS_KEY", SECRET_KEY),
+    }
+
+
+def configure_env(endpoint: str, workdir: str, access_key: str, secret_key: str) -> None:
+    """
+    Points the pipeline at the benchmark S3 and work directory.
+
+    Pipeline modules read their settings at import time, so this must run before any
+    of them is imported.
+    """
+    os.environ.update(
+        MINIO_ENDPOINT_URL=endpoint,
+        MINIO_ACCESS_KEY_ID=access_key,
+        MINIO_SECRET_ACCESS_KEY=secret_key,
+        BUCKET_NAME=RAW_BUCKET,
+        OBJECT_NAME_TEMPLATE=OBJECT_NAME_TEMPLATE,
+        DUCKDB_PATH=os.path.join(workdir, "warehouse.duckdb"),
+        NDJSON_SPOOL_DIR=os.path.join(workdir, "spool"),
+        METRICS_DIR=os.path.join(workdir, "metrics"),
+        PROMETHEUS_TEXTFILE=os.path.join(workdir, "metrics", "pipeline.prom"),
+    )
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+# ------------------------------------------------------------------
+# Synthetic days
+# ------------------------------------------------------------------
+
+def day_listings(day_index: int, listings: int, churn: float, growth: float):
+    """
+    Payloads scraped on one day.
+
+    Every day rescrapes the same `listings` base properties, with a `churn` fraction
+    repriced after day one, plus `growth * listings` new properties per elapsed day.
+    """
+    rng = random.Random(1000 + day_index)
+    for payload in synthetic_properties(listings, seed=42):
+        if day_index and rng.random() < churn:
+            data = payload
+            for key in PRICE_PATH[:-1]:
+                data = data[key]
+            data[PRICE_PATH[-1]] = round(data[PRICE_PATH[-1]] * rng.uniform(0.9, 1.1), -3)
+        yield payload
+    for batch in range(1, day_index + 1):
+        yield from synthetic_properties(int(listings * growth), seed=42 + batch)
+
+
+# ------------------------------------------------------------------
+# File counts
+# ------------------------------------------------------------------
+
+def _object_stats(bucket: str, prefix: str) -> Dict[str, int]:
+    from pipelines.helper_functions import s3
+
+    stats = {"objects": 0, "bytes": 0}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            stats["objects"] += 1
+            stats["bytes"] += obj["Size"]
+    return stats
+
+
+def _delta_files(path: str) -> Dict[str, int]:
+    """Active data files of a Delta table, plus every object under it (log, removed files)."""
+    import polars as pl
+    from deltalake import DeltaTable
+
+    from pipelines.delta_lake import storage_options
+
+    bucket, _, prefix = path.split("://", 1)[1].partition("/")
+    stats = _object_stats(bucket, prefix.rstrip("/") + "/")
+    if not DeltaTable.is_deltatable(path, storage_options=storage_options):
+        return {"files": 0, "file_bytes": 0, **stats}
+    actions = pl.DataFrame(DeltaTable(path, storage_options=storage_options).get_add_actions(flatten=True))
+    return {
+        "files": actions.height,
+        "file_bytes": int(actions["size_bytes"].sum()) if actions.height else 0,
+        **stats,
+    }
+
+
+def _warehouse_files() -> Dict[str, Dict[str, int]]:
+    path = os.environ["DUCKDB_PATH"]
+    return {
+        os.path.basename(p): {"files": 1, "bytes": os.path.getsize(p)}
+        for p in (path, f"{path}.wal")
+        if os.path.exists(p)
+    }
+
+
+def _warehouse_rows() -> Dict[str, int]:
+    """Rows per schema in the benchmark warehouse."""
+    import duckdb
+
+    con = duckdb.connect(os.environ["DUCKDB_PATH"], read_only=True)
+    try:
+        rows = con.execute(
+            "SELECT schema_name, sum(estimated_size)::BIGINT FROM duckdb_tables() GROUP BY ALL"
+        ).fetchall()
+    finally:
+        con.close()
+    return dict(rows)
+
+
+# ------------------------------------------------------------------
+# Steps
+# ------------------------------------------------------------------
+# Each step gets the open stage's metrics and the day. Pipeline modules are
+# imported inside them, after configure_env.
+
+class StepSkipped(Exception):
+    """A step whose tool is not available here."""
+
+
+def _generate(metrics, day: date, args) -> Dict:
+    import posixpath
+
+    from pipelines.helper_functions import NESTED_LIST_PATHS, flatten_json, s3
+    from pipelines.minio_upload import ShardedNDJSONWriter
+
+    keep_paths = NESTED_LIST_PATHS if args.layout == "nested" else ()
+    prefix = posixpath.dirname(OBJECT_NAME_TEMPLATE.format(date=day))
+    day_index = (day - FIRST_DAY).days
+    with ShardedNDJSONWriter(
+        s3, RAW_BUCKET, prefix, shard_size=args.shard_size, compression=args.compression, resume=False
+    ) as writer:
+        for i, payload in enumerate(day_listings(day_index, args.listings, args.churn, args.growth)):
+            writer.write(flatten_json(payload, keep_paths=keep_paths))
+            writer.mark_done(str(i))
+            writer.checkpoint()
+    metrics.add_rows(rows_out=writer.records_written)
+
+
+def _ingest_raw(metrics, day: date, args) -> Dict:
+    from pipelines.delta_lake import ingest_raw
+
+    df = ingest_raw(day)
+    metrics.add_rows(rows_in=df.height, rows_out=df.height)
+
+
+def _build_silver(metrics, day: date, args) -> Dict:
+    from pipelines.delta_lake import STG_PROP_PATH, build_silver_incremental
+
+    offset = _stage_records(0)[1]
+    build_silver_incremental()
+    merges = [r for r in _stage_records(offset)[0] if r["stage"] == "silver.merge"]
+    # Listings merged into the property table; nothing when silver was up to date
+    listings = [r for r in merges if r["labels"].get("table") == os.path.basename(STG_PROP_PATH)]
+    metrics.add_rows(
+        rows_in=sum(r["rows_in"] for r in listings),
+        rows_out=sum(r["rows_out"] for r in merges),
+    )
+
+
+def _duckdb_load(metrics, day: date, args) -> Dict:
+    from pipelines.duckdb_ingestion import connect
+    from pipelines.lake_cache import CACHE_SCHEMA, refresh_cache
+
+    con = connect(os.environ["DUCKDB_PATH"])
+    try:
+        status = refresh_cache(con)
+    finally:
+        con.close()
+    missing = [view for view, state in status.items() if state not in ("refreshed", "hit")]
+    if missing:
+        print(f"⚠️  Lake views not cached: {missing}")
+    metrics.add_rows(rows_out=_warehouse_rows().get(CACHE_SCHEMA, 0))
+
+
+def _dbt_profiles_dir(workdir: str) -> str:
+    """Profile pointing dbt at the benchmark warehouse, unless DBT_PROFILES_DIR is set."""
+    if os.getenv("DBT_PROFILES_DIR"):
+        return os.environ["DBT_PROFILES_DIR"]
+    directory = os.path.join(workdir, "dbt")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "profiles.yml"), "w") as f:
+        f.write(
+            "real_estate:\n"
+            "  target: bench\n"
+            "  outputs:\n"
+            "    bench:\n"
+            "      type: duckdb\n"
+            f"      path: {os.environ['DUCKDB_PATH']}\n"
+            "      threads: 4\n"
+        )
+    return directory
+
+
+def _dbt(metrics, day: date, args) -> Dict:
+    from pipelines.lake_cache import CACHE_SCHEMA
+    from pipelines.runner import DBT_PROJECT_DIR
+
+    if not shutil.which("dbt"):
+        raise StepSkipped("dbt is not installed")
+    workdir = os.path.dirname(os.environ["DUCKDB_PATH"])
+    options = [
+        "--project-dir", DBT_PROJECT_DIR,
+        "--profiles-dir", _dbt_profiles_dir(workdir),
+    ]
+    if not os.path.isdir(os.path.join(DBT_PROJECT_DIR, "dbt_packages")):
+        subprocess.run(["dbt", "deps", *options], check=True)
+    subprocess.run(
+        ["dbt", "run", *options,
+         "--target-path", os.path.join(workdir, "dbt", "target"),
+         "--log-path", os.path.join(workdir, "dbt", "logs")],
+        check=True,
+    )
+    rows = _warehouse_rows()
+    metrics.add_rows(rows_out=sum(n for schema, n in rows.items() if schema != CACHE_SCHEMA))
+
+
+def files_after(name: str, day: date) -> Dict:
+    """Files a step has left behind, counted outside its timing."""
+    import posixpath
+
+    from pipelines.delta_lake import RAW_PATH, SILVER_PATHS
+
+    if name == "generate":
+        prefix = posixpath.dirname(OBJECT_NAME_TEMPLATE.format(date=day))
+        return {"ndjson": _object_stats(RAW_BUCKET, f"{prefix}/")}
+    if name == "ingest_raw":
+        return {"raw": _delta_files(RAW_PATH)}
+    if name == "build_silver":
+        return {os.path.basename(path): _delta_files(path) for path in SILVER_PATHS}
+    return _warehouse_files()
+
+
+STEP_FUNCTIONS: Dict[str, Callable] = {
+    "generate": _generate,
+    "ingest_raw": _ingest_raw,
+    "build_silver": _build_silver,
+    "duckdb_load": _duckdb_load,
+    "dbt": _dbt,
+}
+
+
+# ------------------------------------------------------------------
+# Runner and report
+# ------------------------------------------------------------------
+
+def _stage_records(offset: int) -> tuple:
+    """Stage records appended to stages.jsonl since `offset`, and the new offset."""
+    path = os.path.join(os.environ["METRICS_DIR"], "stages.jsonl")
+    if not os.path.exists(path):
+        return [], offset
+    with open(path) as f:
+        f.seek(offset)
+        records = [json.loads(line) for line in f if line.strip()]
+        return records, f.tell()
+
+
+def run_step(name: str, day: date, args, offset: int) -> tuple:
+    """
+    Runs one step inside an `e2e` stage and summarizes its stage records.
+
+    Returns:
+        tuple: The step result and the stages.jsonl offset after it.
+    """
+    from pipelines.instrumentation import stage
+
+    status, error, files = "ok", None, {}
+    try:
+        with stage("e2e", step=name, day=str(day)) as metrics:
+            STEP_FUNCTIONS[name](metrics, day, args)
+        files = files_after(name, day)
+    except StepSkipped as e:
+        status, error = "skipped", str(e)
+    except Exception as e:
+        status, error = "failed", f"{type(e).__name__}: {e}"
+
+    records, offset = _stage_records(offset)
+    # The step's own record is emitted last, after everything nested in it
+    record, nested = records[-1], records[:-1]
+    rows = record["rows_in"] or record["rows_out"]
+    result = {
+        "step": name,
+        "day": str(day),
+        "status": status,
+        **({"error": error} if error else {}),
+        **{key: record[key] for key in (
+            "wall_seconds", "cpu_seconds", "rows_in", "rows_out",
+            "bytes_read", "bytes_written", "peak_rss_bytes",
+        )},
+        "rows_per_second": round(rows / record["wall_seconds"], 1) if record["wall_seconds"] else None,
+        "files": files,
+        "substages": [
+            {key: r[key] for key in ("stage", "labels", "wall_seconds", "rows_in", "rows_out", "peak_rss_bytes")}
+            for r in nested
+        ],
+    }
+    return result, offset
+
+
+def _totals(results: List[Dict]) -> Dict[str, Dict]:
+    totals = {}
+    for r in results:
+        if r["status"] != "ok":
+            continue
+        t = totals.setdefault(r["step"], {"runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                           "rows": 0, "peak_rss_bytes": 0})
+        t["runs"] += 1
+        t["wall_seconds"] = round(t["wall_seconds"] + r["wall_seconds"], 6)
+        t["cpu_seconds"] = round(t["cpu_seconds"] + r["cpu_seconds"], 6)
+        t["rows"] += r["rows_in"] or r["rows_out"]
+        t["peak_rss_bytes"] = max(t["peak_rss_bytes"], r["peak_rss_bytes"])
+    for t in totals.values():
+        t["rows_per_second"] = round(t["rows"] / t["wall_seconds"], 1) if t["wall_seconds"] else None
+    return totals
+
+
+def _git_commit() -> Dict[str, object]:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": sha, "dirty": dirty}
+
+
+def _print_result(r: Dict) -> None:
+    if r["status"] != "ok":
+        icon = "⏭️ " if r["status"] == "skipped" else "❌"
+        print(f"{icon} {r['day']} {r['step']}: {r['status']} ({r.get('error')})")
+        return
+    files = sum(f.get("files", f.get("objects", 0)) for f in r["files"].values())
+    print(
+        f"⏱️  {r['day']} {r['step']:>12}: {r['wall_seconds']:8.2f}s  "
+        f"{r['rows_per_second'] or 0:10.0f} rows/s  peak {r['peak_rss_bytes'] / 2**20:7.0f} MB  "
+        f"{files} files"
+    )
+
+
+def compare(report: Dict, baseline: Dict) -> None:
+    """Prints wall time, throughput and peak RSS of each step relative to a baseline report."""
+    print(f"\nAgainst {baseline.get('commit')} ({baseline['config']['listings']} listings/day):")
+    for step, now in report["totals"].items():
+        before = baseline.get("totals", {}).get(step)
+        if not before:
+            print(f"  {step:>12}: not in baseline")
+            continue
+        print(
+            f"  {step:>12}: wall {now['wall_seconds'] / before['wall_seconds']:5.2f}x  "
+            f"rows/s {(now['rows_per_second'] or 0) / (before['rows_per_second'] or 1):5.2f}x  "
+            f"peak RSS {now['peak_rss_bytes'] / max(before['peak_rss_bytes'], 1):5.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", type=int, default=2000, help="base listings scraped per day")
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--churn", type=float, default=0.1, help="share of listings repriced each day")
+    parser.add_argument("--growth", type=float, default=0.05, help="new listings per day, as a share")
+    parser.add_argument("--layout", choices=["flattened", "nested"], default="flattened")
+    parser.add_argument("--shard-size", type=int, default=500)
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    parser.add_argument("--steps", nargs="+", choices=STEPS, default=STEPS)
+    parser.add_argument("--s3", choices=["moto", "minio"], default="moto", help="local S3 to start")
+    parser.add_argument("--endpoint", help="use this running S3 instead (keys from MINIO_* env)")
+    parser.add_argument("--workdir", help="keep the warehouse and metrics here (default: temp dir)")
+    parser.add_argument("--output", help="report path (default: data/bench/e2e-<commit>.json)")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="web2warehouse-e2e-")
+    os.makedirs(workdir, exist_ok=True)
+    steps = [s for s in STEPS if s in args.steps]
+
+    with s3_endpoint(args, workdir) as server:
+        configure_env(server["endpoint"], workdir, server["access_key"], server["secret_key"])
+
+        from pipelines.helper_functions import s3
+        from pipelines.minio_upload import ensure_bucket_exists
+
+        for bucket in (RAW_BUCKET, "delta"):
+            ensure_bucket_exists(s3, bucket)
+
+        started = time.perf_counter()
+        results, offset = [], _stage_records(0)[1]
+        for day_index in range(args.days):
+            day = FIRST_DAY + timedelta(days=day_index)
+            for name in steps:
+                result, offset = run_step(name, day, args, offset)
+                _print_result(result)
+                results.append(result)
+                if result["status"] == "failed":
+                    break
+            if results and results[-1]["status"] == "failed":
+                break
+        server_rss = _peak_rss_of(server["pid"]) if server.get("pid") else None
+
+    report = {
+        **_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "s3": "endpoint" if args.endpoint else args.s3,
+        "config": {key: getattr(args, key) for key in (
+            "listings", "days", "churn", "growth", "layout", "shard_size", "compression",
+        )},
+        "steps_run": steps,
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "s3_server_peak_rss_bytes": server_rss,
+        "totals": _totals(results),
+        "results": results,
+    }
+    output = args.output or os.path.join("data", "bench", f"e2e-{report['commit'] or int(time.time())}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if any(r["status"] == "failed" for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# synthetic.py
+"""Synthetic property payloads shaped like the listing JSON returned by `transform_to_json_url`.
+
+Used by the benchmarks so they can run offline without scraping anything.
+"""
+
+import random
+import uuid
+from typing import Dict, Iterator
+
+TOWNS = ["Rathmines", "Ranelagh", "Drumcondra", "Clontarf", "Sandyford", "Swords", "Lucan", "Howth"]
+COUNTIES = ["Dublin", "Co. Dublin"]
+BUILDING_TYPES = ["Apartment", "House", "Semi-Detached", "Terraced", "Detached", "Duplex"]
+ROOM_NAMES = ["Living Room", "Kitchen", "Bedroom 1", "Bedroom 2", "Bathroom", "Utility", "Study"]
+BER_RATINGS = ["A2", "A3", "B1", "B2", "B3", "C1", "C2", "C3", "D1", "D2", "E1", "F", "G"]
+
+
+def _dimensions(rng: random.Random) -> Dict[str, str]:
+    length, width = rng.uniform(2, 7), rng.uniform(2, 5)
+    metric = f"{length:.2f}m x {width:.2f}m"
+    feet = lambda m: f"{int(m / 0.3048)}'{int((m / 0.3048 % 1) * 12)}\""  # noqa: E731
+    return {"dimensions": metric, "dimensionsAlt": f"{feet(length)} x {feet(width)}"}
+
+
+def synthetic_property(rng: random.Random, max_images: int = 30, max_rooms: int = 12) -> Dict:
+    """Returns one nested property payload with a variable number of images and rooms."""
+    prop_id = uuid.UUID(int=rng.getrandbits(128)).hex[:24]
+    town = rng.choice(TOWNS)
+    postcode = f"D{rng.randint(1, 24):02d}"
+    house_number = str(rng.randint(1, 300))
+    street = f"{rng.choice(['Main', 'Church', 'Park', 'Mill', 'Station'])} {rng.choice(['Street', 'Road', 'Avenue'])}"
+    n_images = rng.randint(1, max_images)
+    n_rooms = rng.randint(0, max_rooms)
+    created = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00.000Z"
+
+    property_data = {
+        "_id": prop_id,
+        "id": prop_id,
+        "crm_id": f"DUB{rng.randint(100000, 999999)}",
+        "title": f"{rng.randint(1, 5)} bedroom {rng.choice(BUILDING_TYPES).lower()} for sale",
+        "display_address": f"{house_number} {street}, {town}, {postcode}",
+        "slug": f"{house_number}-{street.lower().replace(' ', '-')}-{prop_id[:6]}",
+        "bedroom": rng.randint(1, 5),
+        "bathroom": rng.randint(1, 3),
+        "reception": rng.randint(0, 2),
+        "price": rng.randrange(150_000, 1_500_000, 5_000),
+        "price_qualifier": rng.choice(["Asking Price", "In Excess of", "Guide Price"]),
+        "latitude": 53.35 + rng.uniform(-0.15, 0.15),
+        "longitude": -6.26 + rng.uniform(-0.25, 0.25),
+        "floorarea_min": rng.randint(40, 250),
+        "floorarea_max": rng.choice([None, rng.randint(60, 300)]),
+        "floorarea_type": "squareMetres",
+        "area": town,
+        "status": rng.choice(["For Sale", "Sale Agreed", "Sold"]),
+        "publish": True,
+        "search_type": "sales",
+        "department": "residential",
+        "building": [rng.choice(BUILDING_TYPES)],
+        "description": "A bright and spacious home. " * rng.randint(5, 20),
+        "accomadation_summary": "\r\n".join(
+            f"• {rng.choice(ROOM_NAMES)} with {rng.choice(['wooden floors', 'fitted units', 'bay window'])}"
+            for _ in range(rng.randint(0, 6))
+        ),
+        "address": {
+            "house_name": rng.choice([None, None, "The Willows", "Rose Cottage"]),
+            "house_number": house_number,
+            "address1": street,
+            "address2": town,
+            "address3": rng.choice(COUNTIES),
+            "address4": rng.choice([None, "Leinster"]),
+            "country": "Ireland",
+            "postcode": postcode,
+        },
+        "crm_negotiator_id": {
+            "ID": f"NEG{rng.randint(1, 60):03d}",
+            "Name": f"Agent {rng.randint(1, 60)}",
+            "Email": f"agent{rng.randint(1, 60)}@example.com",
+        },
+        "extras": {
+            "disposal": "Private Treaty",
+            "is_archived": False,
+            "created_on": created,
+            "modified_on": created,
+            "extrasField": {
+                "pBERRating": rng.choice(BER_RATINGS),
+                "pBERNumber": str(rng.randint(100000000, 999999999)),
+                "pEPI": f"{rng.uniform(20, 450):.2f} kWh/m²/yr",
+                "ratingValue": rng.randint(1, 15),
+            },
+        },
+        "images": [
+            {
+                "srcUrl": f"https://img.example.com/{prop_id}/{i}.jpg",
+                "url": f"https://img.example.com/{prop_id}/{i}_full.jpg",
+                "caption": rng.choice(["", "Front", "Kitchen", "Garden"]),
+                "order": i,
+                "etag": uuid.UUID(int=rng.getrandbits(128)).hex,
+                "reapit_etag": uuid.UUID(int=rng.getrandbits(128)).hex,
+                "last-modified": created,
+                "createdAt": created,
+                "updatedAt": created,
+            }
+            for i in range(n_images)
+        ],
+        "room_details": [
+            {
+                "name": rng.choice(ROOM_NAMES),
+                **_dimensions(rng),
+                "description": "Laminate flooring, ceiling light. " * rng.randint(1, 3),
+            }
+            for _ in range(n_rooms)
+        ],
+        "listingHistory": {"agent": f"NEG{rng.randint(1, 60):03d}"},
+    }
+
+    return {
+        "componentChunkName": "component---src-templates-property-details-js",
+        "path": f"/property-for-sale/{property_data['slug']}/",
+        "result": {
+            "pageContext": {
+                "id": prop_id,
+                "title": property_data["title"],
+                "display_address": property_data["display_address"],
+                "propertyData": property_data,
+            }
+        },
+        "staticQueryHashes": [str(rng.randint(10**8, 10**9)) for _ in range(6)],
+    }
+
+
+def synthetic_properties(n: int, seed: int = 42, **kwargs) -> Iterator[Dict]:
+    """Yields `n` deterministic synthetic property payloads."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield synthetic_property(rng, **kwargs)
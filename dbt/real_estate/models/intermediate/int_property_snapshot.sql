@@ -1,25 +1,72 @@
 {{ config(
-    materialized = 'view', 
-    schema = 'int') 
-    
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = ['property_id', 'valid_from'],
+    schema = 'int',
+    -- silver keeps only the latest row per property, so the history lives here
+    -- and a full refresh would lose it
+    full_refresh = false)
+
     }}
 
 
 with src as (
     select * from {{ ref('stg_property_flat')}}
+    {% if is_incremental() %}
+    where snapshot_date > (select coalesce(max(processed_through), date '1900-01-01') from {{ this }})
+    {% endif %}
 ),
-changes as(
+batch as (
     select 
     "result.pageContext.propertyData._id" as property_id,
     snapshot_date ::date as effective_date,
     "result.pageContext.propertyData.price" as price,
     "result.pageContext.propertyData.price_qualifier" as price_qualifier,
     "result.pageContext.propertyData.status" as status,
-    row_number() over (
-            partition by property_id, price, status
-            order by snapshot_date
-        ) as rn
+    false as is_existing
     from src
+    where "result.pageContext.propertyData._id" is not null
+    qualify row_number() over (
+            partition by property_id, effective_date
+            order by ingested_at desc
+        ) = 1
+),
+{% if is_incremental() %}
+open_rows as (
+    -- current interval of every property seen in this batch
+    select
+        property_id,
+        valid_from as effective_date,
+        price,
+        price_qualifier,
+        status,
+        true as is_existing
+    from {{ this }}
+    where valid_to is null
+      and property_id in (select property_id from batch)
+),
+history as (
+    select * from open_rows
+    union all
+    select * from batch
+    where not exists (
+        select 1 from open_rows o
+        where o.property_id = batch.property_id and o.effective_date = batch.effective_date
+    )
+),
+{% else %}
+history as (
+    select * from batch
+),
+{% endif %}
+changes as (
+    select
+        *,
+        lag(price) over w as prev_price,
+        lag(status) over w as prev_status,
+        row_number() over w as rn
+    from history
+    window w as (partition by property_id order by effective_date)
 ),
 scd2 as (
 select
@@ -31,11 +78,22 @@ select
         lead(effective_date) over (
             partition by property_id
             order by effective_date
-        ) - interval 1 day as valid_to
+        ) - interval 1 day as valid_to,
+        is_existing
     from changes
-    where rn = 1 
+    where rn = 1
+       or price is distinct from prev_price
+       or status is distinct from prev_status
 )
 
-select * from scd2
-
-
+select
+    property_id,
+    price,
+    price_qualifier,
+    status,
+    valid_from,
+    valid_to,
+    (select max(snapshot_date) from src) as processed_through
+from scd2
+-- an open interval that is still open is unchanged and need not be rewritten
+where not (is_existing and valid_to is null)
@@ -1,4 +1,8 @@
-{{ config(materialized='table', schema='marts') }}
+{{ config(
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = 'postcode',
+    schema = 'marts') }}
 
 with property_snapshot as (
     select * from {{ ref('int_property_snapshot') }}
@@ -8,11 +12,29 @@ property_base as (
         prop_id as property_id,
         postcode
     from {{ ref('int_property_base') }}
+    -- null postcodes cannot be matched by the incremental delete
+    where postcode is not null
+),
+{% if is_incremental() %}
+changed_postcodes as (
+    select distinct pb.postcode
+    from property_snapshot ps
+    join property_base pb on ps.property_id = pb.property_id
+    where ps.processed_through > (select max(processed_through) from {{ this }})
+),
+{% endif %}
+scoped as (
+    select pb.postcode, ps.price, ps.processed_through
+    from property_snapshot ps
+    join property_base pb on ps.property_id = pb.property_id
+    {% if is_incremental() %}
+    where pb.postcode in (select postcode from changed_postcodes)
+    {% endif %}
 )
 
 select
-    pb.postcode,
-    avg(ps.price) as average_price
-from property_snapshot ps
-left join property_base pb on ps.property_id = pb.property_id
-group by 1
\ No newline at end of file
+    postcode,
+    avg(price) as average_price,
+    max(processed_through) as processed_through
+from scoped
+group by 1
@@ -13,7 +13,9 @@ with src as (
     from {{ source('lake', 'ext_property_flat') }}
 )
 
+-- snapshot_date is the raw partition the row was scraped into; rows written
+-- before the raw table was partitioned fall back to their ingest date.
 select 
-    src.*,
-    cast('{{ run_started_at }}' as date) as snapshot_date
-from src
\ No newline at end of file
+    src.* exclude (snapshot_date),
+    coalesce(src.snapshot_date, cast(src.ingested_at as date)) as snapshot_date
+from src
@@ -0,0 +1,307 @@
+# async_fetcher.py
+
+import asyncio
+import hashlib
+import os
+import random
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Union
+
+import httpx
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+# Longest Retry-After honoured, in seconds; a server asking for more is retried sooner
+MAX_RETRY_AFTER = float(os.getenv("FETCH_MAX_RETRY_AFTER", "60"))
+
+
+@dataclass
+class FetchResult:
+    """
+    Outcome of a single URL fetch. `index` is the position in the input list.
+
+    `payload` is the decoded JSON body, or the body text for text fetches.
+    `content_hash` is the SHA-256 of the raw body and `validators` holds the
+    response's ETag / Last-Modified, for conditional re-fetching.
+    """
+
+    index: int
+    url: str
+    status_code: Optional[int] = None
+    payload: Optional[Union[dict, str]] = None
+    latency_s: float = 0.0
+    attempts: int = 0
+    error: Optional[str] = None
+    content_hash: Optional[str] = None
+    validators: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200 and self.error is None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status_code == 304 and self.error is None
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter shared by every request of a fetch run.
+
+    Args:
+        rate (float): Tokens added per second (sustained requests/sec).
+        capacity (int): Maximum burst size. Defaults to `max(1, int(rate))`.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int, backoff_base: float) -> float:
+    """Honour `Retry-After` (seconds, up to `MAX_RETRY_AFTER`), else exponential backoff with jitter."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+    return backoff_base * (2**attempt) + random.uniform(0, backoff_base)
+
+
+async def _fetch_one(
+    client: httpx.AsyncClient,
+    bucket: TokenBucket,
+    semaphore: asyncio.Semaphore,
+    index: int,
+    url: str,
+    max_retries: int,
+    backoff_base: float,
+    parse_json: bool = True,
+    headers: Optional[Dict[str, str]] = None,
+) -> FetchResult:
+    result = FetchResult(index=index, url=url)
+
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            await bucket.acquire()
+            result.attempts = attempt + 1
+            response = None
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+                result.latency_s = time.perf_counter() - started
+                result.status_code = response.status_code
+                result.error = None
+                result.validators = {
+                    h: response.headers[h] for h in VALIDATOR_HEADERS if h in response.headers
+                }
+                if response.status_code == 200:
+                    result.content_hash = hashlib.sha256(response.content).hexdigest()
+                    try:
+                        result.payload = response.json() if parse_json else response.text
+                    except ValueError as e:
+                        # The same body would come back on a retry
+                        result.error = f"Invalid JSON: {e}"
+                    return result
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return result
+            except httpx.TransportError as e:
+                result.latency_s = time.perf_counter() - started
+                result.error = str(e)
+
+            if attempt < max_retries:
+                await asyncio.sleep(_retry_delay(response, attempt, backoff_base))
+
+    return result
+
+
+def _pooled_client(
+    concurrency: int, timeout: float, transport: Optional[httpx.AsyncBaseTransport]
+) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    return httpx.AsyncClient(
+        timeout=timeout, limits=limits, transport=transport, follow_redirects=True
+    )
+
+
+async def fetch_json_async(
+    urls: List[str],
+    concurrency: int = 16,
+    rate_per_sec: float = 8.0,
+    max_retries: int = 3,
+    backoff_base: float = 0.5,
+    timeout: float = 10.0,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    parse_json: bool = True,
+    request_headers: Optional[Dict[str, Dict[str, str]]] = None,
+) -> List[FetchResult]:
+    """
+    Fetches JSON documents concurrently over a single pooled HTTP client.
+
+    Connections are kept alive and reused per host, requests are throttled by a
+    shared token bucket and 429/5xx responses are retried with backoff.
+
+    Args:
+        urls (List[str]): URLs to fetch.
+        concurrency (int): Maximum number of in-flight requests.
+        rate_per_sec (float): Sustained request rate across all hosts.
+        max_retries (int): Retries per URL on 429/5xx or transport errors.
+        backoff_base (float): Base delay (seconds) of the exponential backoff.
+        timeout (float): Per-request timeout in seconds.
+        transport (httpx.AsyncBaseTransport): Optional transport override, e.g. for a stub server.
+        parse_json (bool): Decode bodies as JSON; when False the payload is the body text.
+        request_headers (Dict[str, Dict[str, str]]): Extra headers per URL, e.g. the
+            conditional `If-None-Match` / `If-Modified-Since` from a fetch cache.
+
+    Returns:
+        List[FetchResult]: One result per input URL, in input order.
+    """
+    bucket = TokenBucket(rate_per_sec)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with _pooled_client(concurrency, timeout, transport) as client:
+        tasks = [
+            _fetch_one(
+                client, bucket, semaphore, i, url, max_retries, backoff_base, parse_json,
+                (request_headers or {}).get(url),
+            )
+            for i, url in enumerate(urls)
+        ]
+        # gather preserves input order regardless of completion order
+        return await asyncio.gather(*tasks)
+
+
+async def iter_fetch_json(
+    urls: Iterable[str],
+    concurrency: int = 16,
+    rate_per_sec: float = 8.0,
+    max_retries: int = 3,
+    backoff_base: float = 0.5,
+    timeout: float = 10.0,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    parse_json: bool = True,
+    request_headers: Optional[Dict[str, Dict[str, str]]] = None,
+    window: Optional[int] = None,
+) -> AsyncIterator[FetchResult]:
+    """
+    Streaming form of `fetch_json_async`: yields results in input order as they finish.
+
+    One client and one token bucket serve the whole run. At most `window` URLs are
+    scheduled ahead of the oldest unfinished one, so a slow URL holds back at most
+    `window` buffered results instead of every payload of the run.
+
+    Args:
+        urls (Iterable[str]): URLs to fetch.
+        concurrency (int): Maximum number of in-flight requests.
+        rate_per_sec (float): Sustained request rate across all hosts.
+        max_retries (int): Retries per URL on 429/5xx or transport errors.
+        backoff_base (float): Base delay (seconds) of the exponential backoff.
+        timeout (float): Per-request timeout in seconds.
+        transport (httpx.AsyncBaseTransport): Optional transport override, e.g. for a stub server.
+        parse_json (bool): Decode bodies as JSON; when False the payload is the body text.
+        request_headers (Dict[str, Dict[str, str]]): Extra headers per URL.
+        window (int): Results scheduled or buffered at once. Defaults to `4 * concurrency`.
+
+    Yields:
+        FetchResult: One result per input URL, in input order.
+    """
+    window = max(window or concurrency * 4, concurrency)
+    bucket = TokenBucket(rate_per_sec)
+    semaphore = asyncio.Semaphore(concurrency)
+    todo = enumerate(urls)
+    scheduled: deque = deque()
+
+    async with _pooled_client(concurrency, timeout, transport) as client:
+
+        def schedule() -> None:
+            for i, url in todo:
+                scheduled.append(
+                    asyncio.ensure_future(
+                        _fetch_one(
+                            client, bucket, semaphore, i, url, max_retries, backoff_base,
+                            parse_json, (request_headers or {}).get(url),
+                        )
+                    )
+                )
+                if len(scheduled) >= window:
+                    return
+
+        try:
+            schedule()
+            while scheduled:
+                result = await scheduled.popleft()
+                schedule()
+                yield result
+        finally:
+            # The consumer stopped early (or failed): don't leave requests running
+            for task in scheduled:
+                task.cancel()
+            await asyncio.gather(*scheduled, return_exceptions=True)
+
+
+def fetch_json_concurrently(urls: List[str], **kwargs) -> List[FetchResult]:
+    """Synchronous wrapper around `fetch_json_async` for non-async callers."""
+    return asyncio.run(fetch_json_async(urls, **kwargs))
+
+
+def fetch_text_concurrently(urls: List[str], **kwargs) -> List[FetchResult]:
+    """Like `fetch_json_concurrently`, but returns each body as text (e.g. HTML pages)."""
+    return fetch_json_concurrently(urls, parse_json=False, **kwargs)
+
+
+def summarize_latencies(results: List[FetchResult]) -> Dict[str, float]:
+    """
+    Aggregates per-request latency stats for a fetch run.
+
+    Args:
+        results (List[FetchResult]): Results returned by `fetch_json_async`.
+
+    Returns:
+        Dict[str, float]: Request counts plus mean/p50/p90/p99/max latency in seconds.
+    """
+    latencies = sorted(r.latency_s for r in results if r.attempts)
+    stats = {
+        "requests": len(results),
+        "ok": sum(1 for r in results if r.ok),
+        "not_modified": sum(1 for r in results if r.not_modified),
+        "failed": sum(1 for r in results if not (r.ok or r.not_modified)),
+        "retries": sum(max(r.attempts - 1, 0) for r in results),
+    }
+    if not latencies:
+        return stats
+
+    def pct(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    stats.update(
+        {
+            "mean_s": statistics.fmean(latencies),
+            "p50_s": pct(0.50),
+            "p90_s": pct(0.90),
+            "p99_s": pct(0.99),
+            "max_s": latencies[-1],
+        }
+    )
+    return stats
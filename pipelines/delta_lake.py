@@ -1,17 +1,30 @@
 # delta_lake.py
+import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import polars as pl
 from deltalake import write_deltalake, DeltaTable
 from datetime import date, datetime, timezone
 
 from pipelines.helper_functions import (
-    read_ndjson_from_minio,
+    read_ndjson_frame_from_minio,
     clean_accommodation_summary_column,
     explode_room_details,
     explode_images,
     extract_agent_dim,
     extract_location_dim,
     extract_energy_metrics,
+    cell_id_expr,
+)
+from pipelines.delta_merge import merge_upsert
+from pipelines.instrumentation import count_bytes, instrumented, stage
+from pipelines.delta_watermarks import (
+    bytes_added,
+    latest_version,
+    read_watermark,
+    scan_delta_changes,
+    write_watermark,
 )
 
 # Environment and storage setup
@@ -29,7 +42,9 @@ storage_options = {
 
 # Paths
 dt = date.today()
-RAW_PATH = f"s3a://delta/delta_table/raw/delta_{dt}"
+# One raw table for every day, partitioned by snapshot_date
+RAW_PATH = "s3a://delta/delta_table/raw/property_json"
+RAW_PARTITION_COL = "snapshot_date"
 STG_PROP_PATH = "s3a://delta/delta_table/silver/property_details"
 STG_ROOMS_PATH = "s3a://delta/delta_table/silver/property_rooms"
 STG_IMAGES_PATH = "s3a://delta/delta_table/silver/property_images"
@@ -37,16 +52,23 @@ STG_AGENT_PATH = "s3a://delta/delta_table/silver/agents"
 STG_LOCATION_PATH = "s3a://delta/delta_table/silver/locations"
 STG_ENERGY_PATH = "s3a://delta/delta_table/silver/property_energy"
 
+# Silver tables are independent, so their merges run side by side; most of each
+# merge is spent waiting on MinIO.
+SILVER_WRITE_WORKERS = int(os.getenv("SILVER_WRITE_WORKERS", "6"))
+
 
+@instrumented("ingest_raw")
 def ingest_raw(date_str: date):
-    records = read_ndjson_from_minio(date_str)
-    if not records:
+    # Polars parses the NDJSON natively; no per-record Python dicts are built
+    df = read_ndjson_frame_from_minio(date_str)
+    if df.is_empty():
         print(f"No data to ingest for {date_str}")
-        return
-    df = pl.DataFrame(records)
+        return df
 
-    # Drop columns with only nulls
-    null_cols = [c for c, dt in zip(df.columns, df.dtypes) if dt == pl.Null]
+    # Drop columns with only nulls (incl. nested lists that were empty on every row)
+    null_cols = [
+        c for c, dt in zip(df.columns, df.dtypes) if dt in (pl.Null, pl.List(pl.Null))
+    ]
     if null_cols:
         df = df.drop(null_cols)
         print(f"Dropped null-only columns: {null_cols}")
@@ -56,96 +78,317 @@ def ingest_raw(date_str: date):
         if dt == pl.Object:
             df = df.with_columns(pl.col(col).cast(pl.Utf8))
 
+    write_raw_partition(df, date_str)
+    print(f"✅ Raw delta table ingested for {date_str}")
+    return df
+
+
+def write_raw_partition(df: pl.DataFrame, snapshot_date: date):
+    """
+    Writes one day's records into its `snapshot_date` partition of the raw table.
+
+    The partition is replaced rather than appended to, so re-ingesting a day is idempotent.
+
+    Args:
+        df (pl.DataFrame): The day's raw records.
+        snapshot_date (date): Partition to (over)write.
+    """
+    df = df.with_columns(
+        pl.lit(str(snapshot_date)).str.to_date().alias(RAW_PARTITION_COL)
+    )
+    before = _version_or_none(RAW_PATH)
     write_deltalake(
         RAW_PATH,
         df,
         storage_options=storage_options,
-        mode="append",
+        mode="overwrite",
+        predicate=f"{RAW_PARTITION_COL} = '{snapshot_date}'",
+        partition_by=[RAW_PARTITION_COL],
         schema_mode="merge",
     )
-    print(f"✅ Raw delta table ingested for {date_str}")
+    count_bytes(bytes_written=bytes_added(RAW_PATH, storage_options, before))
 
 
-def build_silver_incremental():
-    raw_df = pl.read_delta(RAW_PATH, storage_options=storage_options)
-    now_ts = datetime.now(timezone.utc).isoformat()
+def _version_or_none(path: str):
+    """Latest version of a Delta table, or None if it does not exist yet."""
+    if not DeltaTable.is_deltatable(path, storage_options=storage_options):
+        return None
+    return latest_version(path, storage_options)
 
-    try:
-        existing = pl.read_delta(STG_PROP_PATH, storage_options=storage_options)
-        existing_ids = existing.select("id").unique()
-        new_df = raw_df.filter(
-            ~pl.col("result.pageContext.propertyData._id").is_in(existing_ids["id"])
-        )
-    except Exception:
-        new_df = raw_df
 
-    if new_df.is_empty():
-        print("✅ No new records to process.")
-        return
+def read_raw(start_date: date, end_date: date = None) -> pl.LazyFrame:
+    """
+    Scans the raw table for a date range; only the matching partitions are read.
+
+    Args:
+        start_date (date): First snapshot date (inclusive).
+        end_date (date): Last snapshot date (inclusive). Defaults to `start_date`.
+
+    Returns:
+        pl.LazyFrame: Raw records of the selected days.
+    """
+    return pl.scan_delta(RAW_PATH, storage_options=storage_options).filter(
+        pl.col(RAW_PARTITION_COL).is_between(start_date, end_date or start_date)
+    )
+
+
+# Merge keys identifying a row in each silver table
+SILVER_MERGE_KEYS = {
+    STG_PROP_PATH: ["id"],
+    STG_ROOMS_PATH: ["property_id", "room_index"],
+    STG_IMAGES_PATH: ["property_id", "image_index"],
+    STG_AGENT_PATH: ["agent_id"],
+    STG_LOCATION_PATH: ["location_key"],
+    STG_ENERGY_PATH: ["property_id"],
+}
+SILVER_PATHS = list(SILVER_MERGE_KEYS)
+
+
+PROPERTY_DATA = "result.pageContext.propertyData"
+# Nested columns kept out of property_details
+NESTED_COLUMNS = {
+    f"{PROPERTY_DATA}.room_details",
+    f"{PROPERTY_DATA}.images",
+    f"{PROPERTY_DATA}.extras",
+}
+
+
+def _silver_plans(raw: pl.LazyFrame, now_ts: str) -> dict:
+    """
+    Plans every silver output over one lazy raw scan.
+
+    Nothing is read here. Each returned LazyFrame only references the columns its
+    output needs, so projection pushdown keeps the wide room/image columns out of the
+    narrow dimension tables, and `pl.collect_all` runs the shared scan once.
+
+    Args:
+        raw (pl.LazyFrame): Raw rows to process.
+        now_ts (str): Load timestamp stamped on every output row.
+
+    Returns:
+        dict: Silver table path -> LazyFrame.
+    """
+    columns = raw.collect_schema().names()
+    if RAW_PARTITION_COL in columns:
+        # Re-scraped listings are kept: the merge updates them when they changed.
+        # Sorting by day makes the newest snapshot win when a listing appears twice.
+        raw = raw.sort(RAW_PARTITION_COL, maintain_order=True)
 
     # Manually flatten address fields and concatenate
-    cleaned = new_df.with_columns(
+    cleaned = raw.with_columns(
         [
             pl.concat_str(
                 [
-                    pl.col("result.pageContext.propertyData.address.house_number"),
+                    pl.col(f"{PROPERTY_DATA}.address.house_number"),
                     pl.lit(" "),
-                    pl.col("result.pageContext.propertyData.address.address1"),
+                    pl.col(f"{PROPERTY_DATA}.address.address1"),
                     pl.lit(", "),
-                    pl.col("result.pageContext.propertyData.address.address2"),
+                    pl.col(f"{PROPERTY_DATA}.address.address2"),
                     pl.lit(", "),
-                    pl.col("result.pageContext.propertyData.address.address3"),
+                    pl.col(f"{PROPERTY_DATA}.address.address3"),
                 ],
                 separator="",
             ).alias("full_address"),
-            pl.col("result.pageContext.propertyData.latitude").alias("latitude"),
-            pl.col("result.pageContext.propertyData.longitude").alias("longitude"),
+            pl.col(f"{PROPERTY_DATA}.latitude").alias("latitude"),
+            pl.col(f"{PROPERTY_DATA}.longitude").alias("longitude"),
         ]
     )
     cleaned = clean_accommodation_summary_column(cleaned)
     cleaned = cleaned.with_columns(pl.lit(now_ts).alias("ingested_at"))
 
-    # Extract silver tables
     prop_df = (
         cleaned
         .drop([
-            col for col in cleaned.columns
-            if col.startswith("result.pageContext.propertyData.address.")
-            or col in {
-                "result.pageContext.propertyData.room_details",
-                "result.pageContext.propertyData.images",
-                "result.pageContext.propertyData.extras"
-            }
+            col for col in cleaned.collect_schema().names()
+            if col.startswith(f"{PROPERTY_DATA}.address.") or col in NESTED_COLUMNS
         ])
-        .with_columns(pl.col("result.pageContext.propertyData._id").alias("id"))
+        .with_columns(pl.col(f"{PROPERTY_DATA}._id").alias("id"), cell_id_expr())
+    )
+
+    return {
+        STG_PROP_PATH: prop_df,
+        STG_ROOMS_PATH: explode_room_details(cleaned).with_columns(pl.lit(now_ts).alias("ingested_at")),
+        STG_IMAGES_PATH: explode_images(cleaned).with_columns(pl.lit(now_ts).alias("ingested_at")),
+        STG_AGENT_PATH: extract_agent_dim(cleaned).with_columns(pl.lit(now_ts).alias("loaded_at")),
+        STG_LOCATION_PATH: extract_location_dim(cleaned).with_columns(pl.lit(now_ts).alias("loaded_at")),
+        STG_ENERGY_PATH: extract_energy_metrics(cleaned).with_columns(pl.lit(now_ts).alias("loaded_at")),
+    }
+
+
+def _pending_range(start_version: int = None, end_version: int = None):
+    """Resolves which silver tables are behind and the raw version range to read."""
+    if end_version is None:
+        end_version = latest_version(RAW_PATH, storage_options)
+
+    watermarks = {
+        path: read_watermark(path, RAW_PATH, storage_options) for path in SILVER_PATHS
+    }
+    pending = [
+        path for path, wm in watermarks.items() if wm is None or wm < end_version
+    ]
+    if start_version is not None:
+        return SILVER_PATHS, start_version, end_version
+    if not pending:
+        return [], None, end_version
+    pending_wms = [watermarks[path] for path in pending]
+    start_version = None if None in pending_wms else min(pending_wms)
+    return pending, start_version, end_version
+
+
+def explain_silver_plans(start_version: int = None, end_version: int = None) -> dict:
+    """
+    Returns the optimized query plan of every silver output, for debugging.
+
+    Args:
+        start_version (int): Plan files added after this raw version (default: watermarks).
+        end_version (int): Last raw version to plan. Defaults to the latest.
+
+    Returns:
+        dict: Silver table path -> `LazyFrame.explain()` text.
+    """
+    _, start_version, end_version = _pending_range(start_version, end_version)
+    raw = scan_delta_changes(
+        RAW_PATH, storage_options, start_version=start_version, end_version=end_version
     )
+    now_ts = datetime.now(timezone.utc).isoformat()
+    return {path: lf.explain() for path, lf in _silver_plans(raw, now_ts).items()}
+
+
+def _timed_merge(path: str, df: pl.DataFrame) -> dict:
+    started = time.perf_counter()
+    try:
+        # The error leaves the stage first, so its record has success=0
+        with stage("silver.merge", thread_cpu=True, table=os.path.basename(path)) as metrics:
+            metrics.add_rows(rows_in=df.height)
+            before = _version_or_none(path)
+            result = merge_upsert(path, df, SILVER_MERGE_KEYS[path], storage_options)
+            metrics.add_rows(rows_out=result["inserted"] + result["updated"])
+            count_bytes(bytes_written=bytes_added(path, storage_options, before))
+    except Exception as e:
+        result = {"error": str(e)}
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def merge_silver_tables(frames: dict, max_workers: int = None) -> dict:
+    """
+    Merges each silver frame into its Delta table on a bounded thread pool.
+
+    Every table is written independently: one failing merge does not stop the others,
+    and its error is reported in the result instead of raised.
+
+    Args:
+        frames (dict): Silver table path -> DataFrame to upsert.
+        max_workers (int): Concurrent merges. Defaults to `SILVER_WRITE_WORKERS`.
+
+    Returns:
+        dict: Path -> merge counts (or `error`) plus `seconds` spent on that table.
+    """
+    if not frames:
+        return {}
+    workers = max(1, min(max_workers or SILVER_WRITE_WORKERS, len(frames)))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="silver-merge") as pool:
+        futures = {path: pool.submit(_timed_merge, path, df) for path, df in frames.items()}
+        results = {path: future.result() for path, future in futures.items()}
+
+    slowest = max(result["seconds"] for result in results.values())
+    print(
+        f"⏱️  Merged {len(frames)} silver tables in {time.perf_counter() - started:.2f}s "
+        f"({workers} workers, slowest table {slowest:.2f}s)"
+    )
+    return results
+
 
-    
-    room_df = explode_room_details(cleaned).with_columns(pl.lit(now_ts).alias("ingested_at"))
-    img_df = explode_images(cleaned).with_columns(pl.lit(now_ts).alias("ingested_at"))
-    agent_df = extract_agent_dim(cleaned).with_columns(pl.lit(now_ts).alias("loaded_at"))
-    loc_df = extract_location_dim(cleaned).with_columns(pl.lit(now_ts).alias("loaded_at"))
-    energy_df = extract_energy_metrics(cleaned).with_columns(pl.lit(now_ts).alias("loaded_at"))
-    # print(f'cols - prop_details count :{len(prop_df.columns)}')
-    
-    for path, df in [
-        (STG_PROP_PATH, prop_df),
-        (STG_ROOMS_PATH, room_df),
-        (STG_IMAGES_PATH, img_df),
-        (STG_AGENT_PATH, agent_df),
-        (STG_LOCATION_PATH, loc_df),
-        (STG_ENERGY_PATH, energy_df),
-    ]:
-        write_deltalake(
-            path,
-            df,
-            storage_options=storage_options,
-            mode="append",
-            schema_mode="merge",
+@instrumented("build_silver")
+def build_silver_incremental(start_version: int = None, end_version: int = None):
+    """
+    Builds the silver tables from raw Delta versions not yet processed.
+
+    Each silver table keeps a watermark (the last raw version it was built from) in
+    the control table, and only data files added to the raw table since the lowest
+    watermark are read, so the cost scales with new data rather than history. The
+    outputs are planned lazily over that scan and collected together, then merged
+    concurrently. Tables that merged keep their new watermark even if another failed.
+
+    Args:
+        start_version (int): Reprocess files added after this raw version, ignoring the
+            stored watermarks.
+        end_version (int): Last raw version to process. Defaults to the latest.
+
+    Raises:
+        RuntimeError: If any silver table failed to merge (after the rest were written).
+    """
+    pending, start_version, end_version = _pending_range(start_version, end_version)
+    if not pending:
+        print(f"✅ Silver is up to date with raw version {end_version}.")
+        return
+
+    print(f"Processing raw versions ({start_version}, {end_version}] of {RAW_PATH}")
+    raw = scan_delta_changes(
+        RAW_PATH, storage_options, start_version=start_version, end_version=end_version
+    )
+    now_ts = datetime.now(timezone.utc).isoformat()
+
+    # Only plan the tables that are behind and whose key columns exist in this batch
+    plans = {
+        path: lf
+        for path, lf in _silver_plans(raw, now_ts).items()
+        if path in pending
+        and set(SILVER_MERGE_KEYS[path]).issubset(lf.collect_schema().names())
+    }
+    with stage("silver.collect") as metrics:
+        frames = dict(zip(plans, pl.collect_all(list(plans.values()))))
+        metrics.add_rows(rows_out=sum(df.height for df in frames.values()))
+
+    prop_df = frames.get(STG_PROP_PATH)
+    if prop_df is not None and prop_df.is_empty():
+        print("✅ No new records to process.")
+        for path in pending:
+            write_watermark(path, RAW_PATH, end_version, storage_options)
+        return
+
+    # No raw file in the range has this table's key columns, so it has no rows to
+    # merge; advance it rather than rereading the same range on every run
+    for path in pending:
+        if path not in plans:
+            write_watermark(path, RAW_PATH, end_version, storage_options)
+
+    results = merge_silver_tables(frames)
+    # Watermarks share one control table, so they are appended from this thread only
+    for path, result in results.items():
+        if "error" in result:
+            print(f"❌ Merge into {path} failed after {result['seconds']:.2f}s: {result['error']}")
+            continue
+        write_watermark(path, RAW_PATH, end_version, storage_options)
+        print(
+            f"✅ Merged into {path} in {result['seconds']:.2f}s: {result['inserted']} inserted, "
+            f"{result['updated']} updated, {result['unchanged']} unchanged"
         )
-        print(f"✅ Appended {df.shape[0]} rows to {path}")
+
+    failed = [path for path, result in results.items() if "error" in result]
+    if failed:
+        # Succeeded tables keep their new watermark; failed ones are retried next run
+        raise RuntimeError(f"Silver merge failed for {len(failed)} table(s): {failed}")
 
 
 if __name__ == "__main__":
-    ingest_raw(dt)
-    build_silver_incremental()
+    parser = argparse.ArgumentParser(description="Ingest raw NDJSON and build silver")
+    parser.add_argument("--from-version", type=int, default=None,
+                        help="reprocess raw files added after this Delta version")
+    parser.add_argument("--to-version", type=int, default=None,
+                        help="last raw Delta version to process (default: latest)")
+    parser.add_argument("--skip-ingest", action="store_true",
+                        help="only rebuild silver from the existing raw table")
+    parser.add_argument("--explain", action="store_true",
+                        help="print the optimized silver query plans and exit")
+    args = parser.parse_args()
+
+    if args.explain:
+        for path, plan in explain_silver_plans(args.from_version, args.to_version).items():
+            print(f"--- {path}\n{plan}\n")
+        raise SystemExit(0)
+
+    if not args.skip_ingest:
+        ingest_raw(dt)
+    build_silver_incremental(start_version=args.from_version, end_version=args.to_version)
@@ -0,0 +1,196 @@
+# delta_maintenance.py
+
+import argparse
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
+from deltalake import DeltaTable
+
+from pipelines.delta_lake import (
+    RAW_PARTITION_COL,
+    RAW_PATH,
+    STG_PROP_PATH,
+    STG_ROOMS_PATH,
+    STG_IMAGES_PATH,
+    STG_AGENT_PATH,
+    STG_LOCATION_PATH,
+    STG_ENERGY_PATH,
+    SILVER_PATHS,
+    storage_options,
+)
+from pipelines.delta_watermarks import WATERMARK_PATH, read_watermark
+
+TARGET_FILE_SIZE = 128 * 1024 * 1024
+# History kept by vacuum: time travel (delta_time_travel.py) and in-flight readers
+# only work for versions replaced less than this long ago
+RETENTION_HOURS = int(os.getenv("DELTA_RETENTION_HOURS", "168"))
+# Raw partitions (snapshot days) compacted per run; older days are left as they are
+RAW_COMPACT_DAYS = int(os.getenv("RAW_COMPACT_DAYS", "7"))
+
+PartitionFilters = List[Tuple[str, str, str]]
+
+# Z-order columns per table; tables mapped to [] are only compacted. Columns must be
+# top-level: delta-rs reads a dotted name such as the raw `...propertyData._id` as a
+# nested field. The raw table is only compacted, one recent partition at a time.
+MAINTENANCE_TABLES: Dict[str, List[str]] = {
+    RAW_PATH: [],
+    STG_PROP_PATH: ["id"],
+    STG_ROOMS_PATH: ["property_id"],
+    STG_IMAGES_PATH: ["property_id"],
+    STG_AGENT_PATH: [],
+    STG_LOCATION_PATH: ["postcode"],
+    STG_ENERGY_PATH: ["property_id"],
+    WATERMARK_PATH: [],
+}
+
+
+def table_stats(table: DeltaTable) -> Dict[str, int]:
+    """File count and total bytes of the active files of a Delta table version."""
+    actions = pl.DataFrame(table.get_add_actions(flatten=True))
+    return {
+        "version": table.version(),
+        "files": actions.height,
+        "bytes": int(actions["size_bytes"].sum()) if actions.height else 0,
+    }
+
+
+def recent_partitions(days: int = RAW_COMPACT_DAYS, today: Optional[date] = None) -> PartitionFilters:
+    """Partition filter selecting the raw snapshot days of the last `days` days."""
+    since = (today or date.today()) - timedelta(days=days)
+    return [(RAW_PARTITION_COL, ">=", since.isoformat())]
+
+
+def _silver_behind(raw_version: int) -> bool:
+    for path in SILVER_PATHS:
+        watermark = read_watermark(path, RAW_PATH, storage_options)
+        if watermark is None or watermark < raw_version:
+            return True
+    return False
+
+
+def maintain_table(
+    path: str,
+    zorder_columns: List[str],
+    target_size: int = TARGET_FILE_SIZE,
+    retention_hours: int = RETENTION_HOURS,
+    dry_run: bool = False,
+    partition_filters: Optional[PartitionFilters] = None,
+) -> Optional[Dict]:
+    """
+    Compacts (or Z-orders), checkpoints and vacuums one Delta table.
+
+    Z-ordering is used when any of `zorder_columns` are top-level, non-partition
+    columns of the table, otherwise the files are bin-packed towards `target_size`.
+    With `partition_filters` only the matching partitions are rewritten. Vacuum never
+    goes below the Delta retention check, so readers and time travel within
+    `retention_hours` keep working.
+
+    The MinIO storage options allow unsafe renames (no commit lock), so this must not
+    run while `delta_lake.py` is writing to the same tables.
+
+    Args:
+        path (str): Delta table path.
+        zorder_columns (List[str]): Columns to cluster on.
+        target_size (int): Target file size in bytes.
+        retention_hours (int): Vacuum retention window.
+        dry_run (bool): Only report what vacuum would delete; skip optimize.
+        partition_filters (Optional[PartitionFilters]): Partitions to rewrite, e.g.
+            `recent_partitions()`. Defaults to the whole table.
+
+    Returns:
+        Optional[Dict]: Before/after stats, or None if the table does not exist.
+    """
+    if not DeltaTable.is_deltatable(path, storage_options=storage_options):
+        print(f"⏭️  Skipping {path}: not a Delta table")
+        return None
+
+    table = DeltaTable(path, storage_options=storage_options)
+    before = table_stats(table)
+
+    if path == RAW_PATH and _silver_behind(table.version()):
+        # Compacted files are skipped by the incremental silver build, so raw files
+        # must not be rewritten before silver has consumed them.
+        print(f"⏭️  Skipping {path}: silver has not processed version {table.version()} yet")
+        return None
+
+    # delta-rs can only cluster on top-level, non-partition columns
+    fields = set(f.name for f in table.schema().fields) - set(table.metadata().partition_columns)
+    columns = [c for c in zorder_columns if c in fields and "." not in c]
+    if dry_run:
+        optimize_metrics = {}
+    elif columns:
+        optimize_metrics = table.optimize.z_order(
+            columns, partition_filters=partition_filters, target_size=target_size
+        )
+    else:
+        optimize_metrics = table.optimize.compact(
+            partition_filters=partition_filters, target_size=target_size
+        )
+
+    if not dry_run:
+        table.create_checkpoint()
+        table.cleanup_metadata()
+
+    vacuumed = table.vacuum(
+        retention_hours=retention_hours,
+        dry_run=dry_run,
+        enforce_retention_duration=True,
+    )
+
+    after = table_stats(DeltaTable(path, storage_options=storage_options))
+    report = {
+        "path": path,
+        "zorder": columns,
+        "before": before,
+        "after": after,
+        "files_added": optimize_metrics.get("numFilesAdded", 0),
+        "files_removed": optimize_metrics.get("numFilesRemoved", 0),
+        "vacuumed_files": len(vacuumed),
+    }
+    print(
+        f"✅ {path}: {before['files']} files / {before['bytes']} bytes -> "
+        f"{after['files']} files / {after['bytes']} bytes, "
+        f"{len(vacuumed)} files {'to vacuum' if dry_run else 'vacuumed'}"
+    )
+    return report
+
+
+def run_maintenance(
+    target_size: int = TARGET_FILE_SIZE,
+    retention_hours: int = RETENTION_HOURS,
+    dry_run: bool = False,
+) -> List[Dict]:
+    """
+    Runs `maintain_table` over every lake table; one failing table does not stop the rest.
+
+    The raw table only has its last `RAW_COMPACT_DAYS` partitions compacted, so past
+    days are not rewritten on every run.
+    """
+    reports = []
+    for path, columns in MAINTENANCE_TABLES.items():
+        try:
+            report = maintain_table(
+                path, columns, target_size, retention_hours, dry_run,
+                partition_filters=recent_partitions() if path == RAW_PATH else None,
+            )
+            if report:
+                reports.append(report)
+        except Exception as e:
+            print(f"❌ Maintenance failed for {path}: {e}")
+            reports.append({"path": path, "error": str(e)})
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact, Z-order, checkpoint and vacuum the lake tables")
+    parser.add_argument("--target-size", type=int, default=TARGET_FILE_SIZE,
+                        help="target file size in bytes")
+    parser.add_argument("--retention-hours", type=int, default=RETENTION_HOURS,
+                        help="vacuum retention window")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report only; do not rewrite or delete files")
+    args = parser.parse_args()
+
+    run_maintenance(args.target_size, args.retention_hours, args.dry_run)
@@ -0,0 +1,248 @@
+# delta_time_travel.py
+
+import argparse
+import bisect
+from contextlib import contextmanager
+from datetime import date, datetime, time, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+import polars as pl
+from deltalake import DeltaTable
+
+from pipelines.delta_lake import (
+    PROPERTY_DATA,
+    RAW_PARTITION_COL,
+    RAW_PATH,
+    SILVER_MERGE_KEYS,
+    STG_PROP_PATH,
+    STG_ROOMS_PATH,
+    STG_IMAGES_PATH,
+    STG_AGENT_PATH,
+    STG_LOCATION_PATH,
+    STG_ENERGY_PATH,
+    storage_options,
+)
+from pipelines.delta_maintenance import RETENTION_HOURS
+from pipelines.delta_merge import add_row_hash
+from pipelines.delta_watermarks import scan_delta_files
+
+# Short names accepted wherever a table is expected (a full path also works)
+TABLES: Dict[str, str] = {
+    "raw": RAW_PATH,
+    "property_details": STG_PROP_PATH,
+    "property_rooms": STG_ROOMS_PATH,
+    "property_images": STG_IMAGES_PATH,
+    "agents": STG_AGENT_PATH,
+    "locations": STG_LOCATION_PATH,
+    "property_energy": STG_ENERGY_PATH,
+}
+
+# Row key of each table for `diff_versions`: one raw row per listing and scrape day
+DIFF_KEYS: Dict[str, List[str]] = {
+    RAW_PATH: [f"{PROPERTY_DATA}._id", RAW_PARTITION_COL],
+    **SILVER_MERGE_KEYS,
+}
+
+# path -> (commit timestamps in ms, versions), both ascending
+_VERSION_INDEX: Dict[str, Tuple[List[int], List[int]]] = {}
+
+Timestamp = Union[datetime, date, str]
+Filters = Union[pl.Expr, Dict[str, object], None]
+
+
+def _resolve(table: str) -> str:
+    return TABLES.get(table, table)
+
+
+def _to_millis(timestamp: Timestamp) -> int:
+    """Naive datetimes are taken as UTC; a bare date means the end of that day."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if not isinstance(timestamp, datetime):
+        timestamp = datetime.combine(timestamp, time.max)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp() * 1000)
+
+
+def version_index(table: str) -> Tuple[List[int], List[int]]:
+    """
+    Returns the (commit timestamp, version) index of a Delta table.
+
+    The index is built from the commit history once and only re-read when the table
+    has moved past the newest cached version.
+
+    Args:
+        table (str): Short table name or Delta path.
+
+    Returns:
+        Tuple[List[int], List[int]]: Commit timestamps (ms) and their versions, ascending.
+    """
+    path = _resolve(table)
+    cached = _VERSION_INDEX.get(path)
+    latest = DeltaTable(path, storage_options=storage_options).version()
+    if cached and cached[1][-1] == latest:
+        return cached
+
+    history = DeltaTable(path, storage_options=storage_options).history()
+    commits = sorted((c["timestamp"], c["version"]) for c in history)
+    index = ([ts for ts, _ in commits], [v for _, v in commits])
+    _VERSION_INDEX[path] = index
+    return index
+
+
+def version_as_of(table: str, timestamp: Timestamp) -> int:
+    """
+    Maps a point in time to the Delta version that was current then.
+
+    Raises:
+        ValueError: If `timestamp` predates the oldest commit still in the log.
+    """
+    timestamps, versions = version_index(table)
+    pos = bisect.bisect_right(timestamps, _to_millis(timestamp)) - 1
+    if pos < 0:
+        raise ValueError(f"{_resolve(table)} has no version as of {timestamp}")
+    return versions[pos]
+
+
+def _replaced_before_retention(table: str, version: int) -> bool:
+    """True if `version` was superseded longer ago than vacuum keeps files for."""
+    timestamps, versions = version_index(table)
+    pos = bisect.bisect_right(versions, version)
+    if pos == len(versions):
+        return False
+    cutoff = datetime.now(timezone.utc).timestamp() * 1000 - RETENTION_HOURS * 3600 * 1000
+    return timestamps[pos] < cutoff
+
+
+@contextmanager
+def _retained(table: str, version: int):
+    """Turns a failed read of a vacuumed version into a ValueError that says so."""
+    try:
+        yield
+    except Exception as e:
+        if not _replaced_before_retention(table, version):
+            raise
+        raise ValueError(
+            f"Version {version} of {_resolve(table)} was replaced more than "
+            f"{RETENTION_HOURS} hours ago and its files have been vacuumed; "
+            f"raise DELTA_RETENTION_HOURS to keep more history"
+        ) from e
+
+
+def _filter_expr(filters: Filters) -> Optional[pl.Expr]:
+    if filters is None or isinstance(filters, pl.Expr):
+        return filters
+    return pl.all_horizontal([pl.col(c) == v for c, v in filters.items()])
+
+
+def read_silver_as_of(
+    table: str,
+    timestamp: Timestamp,
+    filters: Filters = None,
+    columns: Optional[List[str]] = None,
+) -> pl.DataFrame:
+    """
+    Reads a lake table as it was at `timestamp`.
+
+    Only the files of the matching version are scanned, and `filters`/`columns` are
+    pushed into the scan so file statistics prune what is read. Versions replaced
+    more than `DELTA_RETENTION_HOURS` (a week by default) ago may have been vacuumed
+    by `delta_maintenance.py` and can then no longer be read.
+
+    Args:
+        table (str): Short table name (see `TABLES`) or Delta path.
+        timestamp (Timestamp): Point in time; a date means the end of that day (UTC).
+        filters (Filters): Polars predicate, or `{column: value}` equality filters.
+        columns (Optional[List[str]]): Columns to return. Defaults to all.
+
+    Returns:
+        pl.DataFrame: The matching rows of that version.
+
+    Raises:
+        ValueError: If no version existed then, or its files have been vacuumed.
+
+    Example:
+        read_silver_as_of("property_details", "2025-07-19", {"id": "abc123"})
+    """
+    version = version_as_of(table, timestamp)
+    with _retained(table, version):
+        lf = pl.scan_delta(_resolve(table), version=version, storage_options=storage_options)
+        predicate = _filter_expr(filters)
+        if predicate is not None:
+            lf = lf.filter(predicate)
+        if columns:
+            lf = lf.select(columns)
+        return lf.collect()
+
+
+def diff_versions(
+    table: str,
+    from_version: int,
+    to_version: int,
+    keys: Optional[List[str]] = None,
+) -> Dict[str, pl.DataFrame]:
+    """
+    Row-level differences of a keyed Delta table between two versions.
+
+    Files present in both versions hold identical rows, so only the files removed
+    and added between the versions are read. Load stamps (`ingested_at`, ...) are
+    ignored when deciding whether a row changed. As with `read_silver_as_of`, versions
+    older than the vacuum retention may no longer be readable.
+
+    Args:
+        table (str): Short table name or Delta path.
+        from_version (int): Older version.
+        to_version (int): Newer version.
+        keys (Optional[List[str]]): Row key. Defaults to the table's entry in `DIFF_KEYS`.
+
+    Returns:
+        Dict[str, pl.DataFrame]: `added` and `changed` rows (as of `to_version`) and
+        `removed` rows (as of `from_version`).
+
+    Raises:
+        ValueError: If no `keys` are given and the table has no default key, or the
+            files of `from_version` have been vacuumed.
+    """
+    path = _resolve(table)
+    keys = keys or DIFF_KEYS.get(path)
+    if not keys:
+        raise ValueError(f"No default row key for {path}; pass keys=[...] to diff it")
+
+    with _retained(path, from_version):
+        old_table = DeltaTable(path, version=from_version, storage_options=storage_options)
+        new_table = DeltaTable(path, version=to_version, storage_options=storage_options)
+        old_files = set(pl.DataFrame(old_table.get_add_actions(flatten=True))["path"])
+        new_files = set(pl.DataFrame(new_table.get_add_actions(flatten=True))["path"])
+
+        old_rows = scan_delta_files(old_table, old_files - new_files).collect()
+        new_rows = scan_delta_files(new_table, new_files - old_files).collect()
+
+    # Hash only the columns both versions share so schema growth is not a change
+    common = [c for c in new_rows.columns if c in old_rows.columns]
+    old_hashed = add_row_hash(old_rows.select(common), keys).select(*keys, "_row_hash")
+    new_hashed = add_row_hash(new_rows.select(common), keys).select(*keys, "_row_hash")
+
+    changed_keys = (
+        new_hashed.join(old_hashed, on=keys, suffix="_old")
+        .filter(pl.col("_row_hash") != pl.col("_row_hash_old"))
+        .select(keys)
+    )
+    return {
+        "added": new_rows.join(old_rows.select(keys), on=keys, how="anti"),
+        "removed": old_rows.join(new_rows.select(keys), on=keys, how="anti"),
+        "changed": new_rows.join(changed_keys, on=keys, how="semi"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read a lake table as of a point in time")
+    parser.add_argument("table", help=f"one of {', '.join(TABLES)} or a Delta path")
+    parser.add_argument("timestamp", help="ISO date or datetime (UTC unless an offset is given)")
+    parser.add_argument("--filter", action="append", default=[], metavar="COLUMN=VALUE",
+                        help="equality filter; may be repeated")
+    args = parser.parse_args()
+
+    filters = dict(f.split("=", 1) for f in args.filter) or None
+    print(f"Version {version_as_of(args.table, args.timestamp)} of {_resolve(args.table)}")
+    print(read_silver_as_of(args.table, args.timestamp, filters))
@@ -0,0 +1,219 @@
+# delta_watermarks.py
+
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+import polars as pl
+import pyarrow.dataset as ds
+from deltalake import DeltaTable, write_deltalake
+
+# Small control table holding, per (target, source), the last source Delta version
+# that was successfully processed into the target.
+WATERMARK_PATH = "s3a://delta/delta_table/_control/silver_watermarks"
+
+
+def read_watermark(
+    target: str,
+    source_path: str,
+    storage_options: Dict[str, str],
+    watermark_path: str = WATERMARK_PATH,
+) -> Optional[int]:
+    """
+    Returns the last source version processed into `target`, or None if it never ran.
+
+    Args:
+        target (str): Target table path (or any stable target name).
+        source_path (str): Source Delta table path.
+        storage_options (Dict[str, str]): delta-rs storage options.
+        watermark_path (str): Control table location.
+
+    Returns:
+        Optional[int]: The watermark version.
+    """
+    if not DeltaTable.is_deltatable(watermark_path, storage_options=storage_options):
+        return None
+
+    version = (
+        pl.scan_delta(watermark_path, storage_options=storage_options)
+        .filter((pl.col("target") == target) & (pl.col("source_path") == source_path))
+        .select(pl.col("source_version").max())
+        .collect()
+        .item()
+    )
+    return version
+
+
+def write_watermark(
+    target: str,
+    source_path: str,
+    source_version: int,
+    storage_options: Dict[str, str],
+    watermark_path: str = WATERMARK_PATH,
+) -> None:
+    """Records that `source_path` up to `source_version` has been processed into `target`."""
+    row = pl.DataFrame(
+        {
+            "target": [target],
+            "source_path": [source_path],
+            "source_version": [source_version],
+            "updated_at": [datetime.now(timezone.utc).isoformat()],
+        },
+        schema={
+            "target": pl.Utf8,
+            "source_path": pl.Utf8,
+            "source_version": pl.Int64,
+            "updated_at": pl.Utf8,
+        },
+    )
+    write_deltalake(watermark_path, row, storage_options=storage_options, mode="append")
+
+
+# Commits whose new files only rewrite rows that were already in the table
+REWRITE_OPERATIONS = {"OPTIMIZE"}
+
+
+def _add_actions(table: DeltaTable) -> pl.DataFrame:
+    return pl.DataFrame(table.get_add_actions(flatten=True)).select("path", "size_bytes")
+
+
+def _file_partitions(table: DeltaTable) -> Dict[str, tuple]:
+    actions = pl.DataFrame(table.get_add_actions(flatten=True))
+    partition_cols = sorted(c for c in actions.columns if c.startswith("partition."))
+    return {row[0]: row[1:] for row in actions.select("path", *partition_cols).iter_rows()}
+
+
+def _new_data_files(
+    source_path: str,
+    storage_options: Dict[str, str],
+    start_version: int,
+    end_version: int,
+) -> Dict[str, int]:
+    """
+    Data files holding the rows written after `start_version` up to `end_version`.
+
+    Walks the commits in between, so it needs neither the per-file `data_change`
+    flag (gone from newer deltalake releases) nor the files to still be live:
+    files added by a data-changing commit count until a later data-changing
+    commit removes them. When compaction (`REWRITE_OPERATIONS`) folds them into
+    a new file they still count, and they are dropped with that file if it is
+    itself replaced later.
+
+    Returns:
+        Dict[str, int]: File path -> version that added it (and lists it).
+    """
+    operations = {
+        commit["version"]: commit.get("operation")
+        for commit in DeltaTable(source_path, storage_options=storage_options).history()
+    }
+    files = _file_partitions(
+        DeltaTable(source_path, version=start_version, storage_options=storage_options)
+    )
+    added_in: Dict[str, int] = {}
+    # Live file -> new data files whose rows it holds
+    holds: Dict[str, Set[str]] = {}
+    for version in range(start_version + 1, end_version + 1):
+        current = _file_partitions(
+            DeltaTable(source_path, version=version, storage_options=storage_options)
+        )
+        removed = files.keys() - current.keys()
+        added = current.keys() - files.keys()
+        if operations.get(version) in REWRITE_OPERATIONS:
+            carried: Dict[tuple, Set[str]] = {}
+            for path in removed:
+                carried.setdefault(files[path], set()).update(holds.pop(path, ()))
+            for path in added:
+                if carried.get(current[path]):
+                    holds[path] = carried[current[path]]
+        else:
+            for path in removed:
+                holds.pop(path, None)
+            for path in added:
+                holds[path] = {path}
+                added_in[path] = version
+        files = current
+    return {path: added_in[path] for held in holds.values() for path in held}
+
+
+def scan_delta_changes(
+    source_path: str,
+    storage_options: Dict[str, str],
+    start_version: Optional[int] = None,
+    end_version: Optional[int] = None,
+) -> pl.LazyFrame:
+    """
+    Scans only the rows written to a Delta table between two versions.
+
+    The data files added by each commit after `start_version` are read, even if
+    a later compaction has since folded them into bigger files; with
+    `start_version=None` every file of `end_version` is read. This suits
+    append/replace-style tables such as the raw layer, where new rows only ever
+    arrive in new files. Compacted-away files are read until `VACUUM` deletes
+    them, so watermarks must be advanced more often than the vacuum retention.
+
+    Args:
+        source_path (str): Delta table path.
+        storage_options (Dict[str, str]): delta-rs storage options.
+        start_version (Optional[int]): Exclusive lower bound (the previous watermark).
+        end_version (Optional[int]): Inclusive upper bound. Defaults to the latest version.
+
+    Returns:
+        pl.LazyFrame: Rows from the added files, in the `end_version` schema.
+    """
+    if start_version is None:
+        return pl.scan_delta(
+            source_path, version=end_version, storage_options=storage_options
+        )
+
+    table = DeltaTable(source_path, version=end_version, storage_options=storage_options)
+    files = _new_data_files(source_path, storage_options, start_version, table.version())
+    fragments = []
+    for version in sorted(set(files.values())):
+        listed = DeltaTable(source_path, version=version, storage_options=storage_options)
+        fragments += _fragments(listed, {path for path, v in files.items() if v == version})
+    return _scan_fragments(table, fragments)
+
+
+def scan_delta_files(table: DeltaTable, paths: Set[str]) -> pl.LazyFrame:
+    """
+    Scans a subset of the data files of a loaded Delta table version.
+
+    Args:
+        table (DeltaTable): Table loaded at the version to read.
+        paths (Set[str]): File paths as listed in the table's add actions.
+
+    Returns:
+        pl.LazyFrame: Rows of those files, in the table version's schema.
+    """
+    return _scan_fragments(table, _fragments(table, paths))
+
+
+def _fragments(table: DeltaTable, paths: Set[str]) -> list:
+    return [f for f in table.to_pyarrow_dataset().get_fragments() if f.path in paths]
+
+
+def _scan_fragments(table: DeltaTable, fragments: list) -> pl.LazyFrame:
+    # Fragments listed by older versions may lack newer columns; they read as null
+    dataset = table.to_pyarrow_dataset()
+    subset = ds.FileSystemDataset(
+        fragments, dataset.schema, dataset.format, dataset.filesystem
+    )
+    return pl.scan_pyarrow_dataset(subset)
+
+
+def bytes_added(
+    path: str, storage_options: Dict[str, str], since_version: Optional[int] = None
+) -> int:
+    """
+    Size of the data files in the latest version of a Delta table that were not in
+    `since_version` (all files when None), i.e. what the writes since then stored.
+    """
+    table = DeltaTable(path, storage_options=storage_options)
+    added = pl.DataFrame(table.get_add_actions(flatten=True)).select("path", "size_bytes")
+    if since_version is not None:
+        previous = DeltaTable(path, version=since_version, storage_options=storage_options)
+        added = added.filter(~pl.col("path").is_in(_add_actions(previous)["path"].implode()))
+    return int(added["size_bytes"].sum()) if added.height else 0
+
+
+def latest_version(path: str, storage_options: Dict[str, str]) -> int:
+    return DeltaTable(path, storage_options=storage_options).version()
@@ -1,128 +1,281 @@
-import duckdb
+import argparse
+import os
 import time
+from typing import Dict, List
+from urllib.parse import urlparse
 
+import duckdb
+from deltalake import DeltaTable
 
-# 1. Connect to DuckDB (file-based or in memory)
+from pipelines.delta_lake import (
+    SILVER_MERGE_KEYS,
+    STG_PROP_PATH,
+    STG_ROOMS_PATH,
+    storage_options,
+)
+from pipelines.instrumentation import stage
 
+# Warehouse file; dbt's profile points at the same database
+DUCKDB_PATH = os.getenv("DUCKDB_PATH", "data/warehouse.duckdb")
+
+# delta_scan reaches MinIO with the same endpoint and keys as the Python clients
+_endpoint = urlparse(os.getenv("MINIO_ENDPOINT_URL") or "http://localhost:9000")
+S3_ENDPOINT = _endpoint.netloc or _endpoint.path
+S3_USE_SSL = _endpoint.scheme == "https"
+S3_KEY_ID = os.getenv("MINIO_ACCESS_KEY_ID") or "minioadmin"
+S3_SECRET = os.getenv("MINIO_SECRET_ACCESS_KEY") or "minioadmin"
+
+WATERMARK_TABLE = "ingest_watermarks"
+
+PROPERTY_DATA = "result.pageContext.propertyData"
 
-def main():
-    con = duckdb.connect(
-        "/Users/abhijithm/Documents/Code/Scrapping/real_estate_pipeline/dbt/real_estate/my_data.duckdb"
-    )
 
-    # 2. Install and load Delta extension
+def _scan_path(path: str) -> str:
+    # delta_scan takes s3:// URLs; delta_lake.py writes through s3a://
+    return path.replace("s3a://", "s3://", 1)
+
+
+# Target table -> silver Delta source, its merge key and target column -> source column
+SOURCES = {
+    "property_details_mt": {
+        "path": _scan_path(STG_PROP_PATH),
+        "key": SILVER_MERGE_KEYS[STG_PROP_PATH],
+        "columns": {
+            "id": "id",
+            "listed_title": f"{PROPERTY_DATA}.title",
+            "location": f"{PROPERTY_DATA}.display_address",
+            "address": "full_address",
+            "bedroom": f"{PROPERTY_DATA}.bedroom",
+            "bathroom": f"{PROPERTY_DATA}.bathroom",
+            "reception": f"{PROPERTY_DATA}.reception",
+            "price": f"{PROPERTY_DATA}.price",
+            "floorarea_min": f"{PROPERTY_DATA}.floorarea_min",
+            "accomadation_summary": f"{PROPERTY_DATA}.accomadation_summary",
+            "status": f"{PROPERTY_DATA}.status",
+            "latitude": "latitude",
+            "longitude": "longitude",
+            "cell_id": "cell_id",
+            "ingested_at": "ingested_at",
+        },
+    },
+    "property_details_room_items_mt": {
+        "path": _scan_path(STG_ROOMS_PATH),
+        "key": SILVER_MERGE_KEYS[STG_ROOMS_PATH],
+        "columns": {
+            column: column
+            for column in [
+                "property_id", "room_index", "room_name", "dimensions", "dimensions_alt",
+                "room_description", "length_m", "width_m", "area_m2", "ingested_at",
+            ]
+        },
+    },
+}
+
+
+def connect(database: str = DUCKDB_PATH) -> duckdb.DuckDBPyConnection:
+    """Opens the warehouse with the Delta extension and the MinIO secret loaded."""
+    con = duckdb.connect(database)
+
+    # Install and load Delta extension
     con.sql("INSTALL 'delta';")
     con.sql("LOAD 'delta';")
 
-    # 3. Create or replace a temporary secret for MinIO via 'config' provider
+    # Create or replace a temporary secret for MinIO via 'config' provider
     con.sql(
-        """
+        f"""
     CREATE OR REPLACE SECRET minio_s3_secret (
         TYPE S3,
         PROVIDER config,
-        KEY_ID 'minioadmin',
-        SECRET 'minioadmin',
+        KEY_ID '{S3_KEY_ID}',
+        SECRET '{S3_SECRET}',
         REGION 'us-east-1',
-        ENDPOINT 'localhost:9000',
-        USE_SSL false,
+        ENDPOINT '{S3_ENDPOINT}',
+        USE_SSL {str(S3_USE_SSL).lower()},
         URL_STYLE path
     );
     """
     )
 
-    # 4. Define Delta table path on MinIO
-    property_details_room_items = (
-        "s3://delta/delta_table/silver/delta_clean/property_details_room_items"
-    )
-    property_details = "s3://delta/delta_table/silver/delta_clean/property_details"
+    return con
 
-    count_pre_ing_property_details = con.sql(
-        "select count(*) from property_details_mt;"
-    ).fetchone()[0]
-    count_pre_ing_property_details_room = con.sql(
-        "select count(*) from property_details_room_items_mt;"
-    ).fetchone()[0]
 
+def ensure_watermark_table(con: duckdb.DuckDBPyConnection) -> None:
+    """Creates the table holding each target's last loaded Delta version, if missing."""
     con.sql(
         f"""
-    INSERT INTO property_details_mt (
-    listed_title, id, location, bedroom, price, latitude, house_name,
-    house_number, country, postcode, longitude, bathroom, reception,
-    floorarea_min, accomadation_summary, status, address, ingested_at
-    )
-    SELECT
-    listed_title, id, location, bedroom, price, latitude, house_name,
-    house_number, country, postcode, longitude, bathroom, reception,
-    floorarea_min, accomadation_summary, status, address, ingested_at
-    FROM delta_scan('{property_details}')
-    ON CONFLICT (id)
-    DO UPDATE SET
-    listed_title = EXCLUDED.listed_title,
-    location = EXCLUDED.location,
-    bedroom = EXCLUDED.bedroom,
-    price = EXCLUDED.price,
-    latitude = EXCLUDED.latitude,
-    house_name = EXCLUDED.house_name,
-    house_number = EXCLUDED.house_number,
-    country = EXCLUDED.country,
-    postcode = EXCLUDED.postcode,
-    longitude = EXCLUDED.longitude,
-    bathroom = EXCLUDED.bathroom,
-    reception = EXCLUDED.reception,
-    floorarea_min = EXCLUDED.floorarea_min,
-    accomadation_summary = EXCLUDED.accomadation_summary,
-    status = EXCLUDED.status,
-    address = EXCLUDED.address,
-    ingested_at = EXCLUDED.ingested_at;
+    CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+        target_table VARCHAR PRIMARY KEY,
+        source_path VARCHAR,
+        delta_version BIGINT,
+        max_ingested_at VARCHAR,
+        updated_at TIMESTAMP
+    );
     """
     )
 
-    con.sql(
-        f"""
-    INSERT INTO property_details_room_items_mt (
-    id,
-    prop_id,
-    room_name,
-    dimensions,
-    dimensions_alt,
-    description,
-    ingested_at
-    )
-    SELECT
-    id,
-    prop_id,
-    room_name,
-    dimensions,
-    dimensions_alt,
-    description,
-    ingested_at
-    FROM delta_scan('{property_details_room_items}')
-    ON CONFLICT (id)
-    DO UPDATE SET
-    prop_id = EXCLUDED.prop_id,
-    room_name = EXCLUDED.room_name,
-    dimensions = EXCLUDED.dimensions,
-    dimensions_alt = EXCLUDED.dimensions_alt,
-    description = EXCLUDED.description,
-    ingested_at = EXCLUDED.ingested_at;
+
+def _select_list(columns: Dict[str, str]) -> str:
+    return ", ".join(f'"{source}" AS {target}' for target, source in columns.items())
+
+
+def ensure_target_table(
+    con: duckdb.DuckDBPyConnection, target: str, source_path: str, columns: Dict[str, str]
+) -> Dict[str, str]:
     """
+    Creates `target` from the source's column types, adding any column it lacks.
+
+    Silver tables only gain columns once some listing has them, so columns missing
+    from the source are left out until they appear.
+
+    Returns:
+        Dict[str, str]: The entries of `columns` present in the source, to load.
+    """
+    fields = {f.name for f in DeltaTable(source_path, storage_options=storage_options).schema().fields}
+    present = {target_col: source for target_col, source in columns.items() if source in fields}
+    described = con.execute(
+        f"DESCRIBE SELECT {_select_list(present)} FROM delta_scan('{source_path}')"
+    ).fetchall()
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {target} "
+        f"({', '.join(f'{name} {dtype}' for name, dtype, *_ in described)});"
     )
-    count_post_ing_property_details = con.sql(
-        "select count(*) from property_details_mt;"
-    ).fetchone()[0]
-    count_post_ing_property_details_room = con.sql(
-        "select count(*) from property_details_room_items_mt;"
-    ).fetchone()[0]
-
-    diff_prop = count_post_ing_property_details - count_pre_ing_property_details
-    diff_prop_rooms = (
-        count_post_ing_property_details_room - count_pre_ing_property_details_room
-    )
+    for name, dtype, *_ in described:
+        con.execute(f"ALTER TABLE {target} ADD COLUMN IF NOT EXISTS {name} {dtype};")
+    return present
+
+
+def read_ingest_watermark(con: duckdb.DuckDBPyConnection, target: str):
+    """Returns `(delta_version, max_ingested_at)` last loaded into `target`, or `(None, None)`."""
+    row = con.execute(
+        f"SELECT delta_version, max_ingested_at FROM {WATERMARK_TABLE} WHERE target_table = ?",
+        [target],
+    ).fetchone()
+    return row if row else (None, None)
+
+
+def load_incremental(
+    con: duckdb.DuckDBPyConnection,
+    target: str,
+    source_path: str,
+    key: List[str],
+    columns: Dict[str, str],
+    full_refresh: bool = False,
+) -> dict:
+    """
+    Upserts rows of a Delta table that are newer than the stored watermark.
+
+    The load is skipped when the Delta version has not moved since the last run.
+    Otherwise only rows with `ingested_at` past the watermark are staged (delta_scan
+    prunes files on their `ingested_at` stats), then applied with one UPDATE and one
+    INSERT whose row counts are reported directly. Staging, upsert and watermark are
+    committed in one transaction.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Warehouse connection from `connect`, with
+            `ensure_watermark_table` and `ensure_target_table` run.
+        target (str): DuckDB table to load into.
+        source_path (str): Delta table path.
+        key (List[str]): Columns identifying a row of `target`.
+        columns (Dict[str, str]): Target column -> source column to copy.
+        full_refresh (bool): Ignore the watermark and reload every row.
+
+    Returns:
+        dict: inserted / updated counts plus the Delta version loaded.
+    """
+    version = DeltaTable(source_path, storage_options=storage_options).version()
+    loaded_version, max_ingested_at = read_ingest_watermark(con, target)
+    if full_refresh:
+        loaded_version, max_ingested_at = None, None
+    if loaded_version == version:
+        return {"inserted": 0, "updated": 0, "delta_version": version, "skipped": True}
 
-    print("the warehouse is updated from delta")
-    print(f"property table added - {diff_prop} rows ")
-    print(f"property_rooms table added - {diff_prop_rooms} rows ")
+    column_list = ", ".join(columns)
+    where = "" if max_ingested_at is None else "WHERE ingested_at > ?"
+    params = [] if max_ingested_at is None else [max_ingested_at]
+    assignments = ",\n        ".join(f"{c} = s.{c}" for c in columns if c not in key)
+    key_list = ", ".join(key)
+    key_match = " AND ".join(f"t.{k} = s.{k}" for k in key)
+
+    con.execute("BEGIN TRANSACTION")
+    try:
+        # Latest row per key only: a key may have been updated more than once
+        con.execute(
+            f"""
+        CREATE OR REPLACE TEMP TABLE _stage AS
+        SELECT {_select_list(columns)}
+        FROM delta_scan('{source_path}')
+        {where}
+        QUALIFY row_number() OVER (PARTITION BY {key_list} ORDER BY ingested_at DESC) = 1;
+        """,
+            params,
+        )
+
+        updated = con.execute(
+            f"""
+        UPDATE {target} AS t SET
+        {assignments}
+        FROM _stage AS s
+        WHERE {key_match};
+        """
+        ).fetchone()[0]
+
+        inserted = con.execute(
+            f"""
+        INSERT INTO {target} ({column_list})
+        SELECT {column_list} FROM _stage AS s
+        WHERE NOT EXISTS (SELECT 1 FROM {target} AS t WHERE {key_match});
+        """
+        ).fetchone()[0]
+
+        con.execute(
+            f"""
+        INSERT OR REPLACE INTO {WATERMARK_TABLE}
+        SELECT ?, ?, ?, coalesce((SELECT max(ingested_at)::VARCHAR FROM _stage), ?), now();
+        """,
+            [target, source_path, version, max_ingested_at],
+        )
+        con.execute("DROP TABLE _stage")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+    return {"inserted": inserted, "updated": updated, "delta_version": version, "skipped": False}
+
+
+def main(full_refresh: bool = False):
+    con = connect()
+    started = time.perf_counter()
+    try:
+        ensure_watermark_table(con)
+        for target, source in SOURCES.items():
+            if not DeltaTable.is_deltatable(source["path"], storage_options=storage_options):
+                print(f"⏭️  {target}: {source['path']} does not exist yet")
+                continue
+            with stage("duckdb.load", table=target) as metrics:
+                columns = ensure_target_table(con, target, source["path"], source["columns"])
+                counts = load_incremental(
+                    con, target, source["path"], source["key"], columns, full_refresh
+                )
+                metrics.add_rows(rows_out=counts["inserted"] + counts["updated"])
+            if counts["skipped"]:
+                print(f"⏭️  {target} is up to date with Delta version {counts['delta_version']}")
+                continue
+            print(
+                f"✅ {target}: {counts['inserted']} inserted, {counts['updated']} updated "
+                f"(Delta version {counts['delta_version']})"
+            )
+    finally:
+        # The runner's dbt stages open the warehouse file next
+        con.close()
+
+    print(f"the warehouse is updated from delta in {time.perf_counter() - started:.2f}s")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Incrementally load silver Delta tables into DuckDB")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="ignore the stored watermarks and reload every row")
+    args = parser.parse_args()
+
+    main(full_refresh=args.full_refresh)
@@ -0,0 +1,168 @@
+# fetch_cache.py
+
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from pipelines.async_fetcher import FetchResult
+
+# Local SQLite file remembering what each property JSON looked like last time
+FETCH_CACHE_PATH = os.getenv(
+    "FETCH_CACHE_PATH", os.path.join("data", "fetch_cache.sqlite")
+)
+
+
+class FetchCache:
+    """
+    Persistent per-URL cache of HTTP validators and content hashes.
+
+    Used to send conditional requests (`If-None-Match` / `If-Modified-Since`) and to
+    recognise payloads that are byte-identical to the last fetch, so unchanged
+    listings can be skipped. Also counts hits and misses for the run report. Results
+    are `record`ed only after their payload is written, and updates are committed when
+    the context exits cleanly, so a failed record or upload is fetched again next run.
+
+    Args:
+        path (str): SQLite database file. Created on first use.
+    """
+
+    def __init__(self, path: str = FETCH_CACHE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fetch_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                property_id TEXT,
+                fetched_at TEXT,
+                last_seen_at TEXT
+            )
+            """
+        )
+        self.stats = {"not_modified": 0, "unchanged": 0, "changed": 0, "new": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only remember this run's payloads if they were stored; otherwise the
+        # next run must fetch them again
+        if exc_type is None:
+            self.commit()
+        self.close()
+        return False
+
+    def close(self) -> None:
+        """Closes the database, discarding anything not yet committed."""
+        self._conn.close()
+
+    def get(self, url: str) -> Optional[Dict[str, str]]:
+        row = self._conn.execute(
+            "SELECT etag, last_modified, content_hash, property_id FROM fetch_cache WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("etag", "last_modified", "content_hash", "property_id"), row))
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Request headers that let the server answer 304 if `url` is unchanged."""
+        entry = self.get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def classify(self, result: FetchResult) -> str:
+        """
+        Says whether a fetch result's payload needs processing, without recording it.
+
+        Args:
+            result (FetchResult): A result fetched with `conditional_headers`.
+
+        Returns:
+            str: `not_modified` (304), `unchanged` (same content hash), `changed`,
+            `new`, or `failed`. Only `changed` and `new` payloads need processing.
+        """
+        if not (result.ok or result.not_modified):
+            return "failed"
+        entry = self.get(result.url)
+        if result.not_modified:
+            status = "not_modified"
+        elif entry and entry["content_hash"] == result.content_hash:
+            status = "unchanged"
+        else:
+            status = "changed" if entry else "new"
+        self.stats[status] += 1
+        return status
+
+    def record(self, result: FetchResult, status: str) -> None:
+        """
+        Remembers a result once its payload (or seen marker) has been written.
+
+        Args:
+            result (FetchResult): The fetched result.
+            status (str): What `classify` returned for it.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        if status in ("not_modified", "unchanged"):
+            self._conn.execute(
+                """
+                UPDATE fetch_cache
+                SET etag = coalesce(?, etag), last_modified = coalesce(?, last_modified),
+                    last_seen_at = ?
+                WHERE url = ?
+                """,
+                (
+                    result.validators.get("ETag"),
+                    result.validators.get("Last-Modified"),
+                    now,
+                    result.url,
+                ),
+            )
+            return
+
+        property_id = None
+        if isinstance(result.payload, dict):
+            property_id = (
+                result.payload.get("result", {})
+                .get("pageContext", {})
+                .get("propertyData", {})
+                .get("_id")
+            )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fetch_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                result.url,
+                result.validators.get("ETag"),
+                result.validators.get("Last-Modified"),
+                result.content_hash,
+                property_id,
+                now,
+                now,
+            ),
+        )
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def report(self) -> Dict[str, float]:
+        """Hit (304 or identical payload) and miss counts and rates for this run."""
+        hits = self.stats["not_modified"] + self.stats["unchanged"]
+        misses = self.stats["changed"] + self.stats["new"]
+        total = hits + misses
+        return {
+            **self.stats,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "miss_rate": misses / total if total else 0.0,
+        }
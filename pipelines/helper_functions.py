@@ -1,8 +1,13 @@
 # helper_function.py
 
 import json
+import gzip
 import os
 import datetime
+import posixpath
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import List, Dict
 import polars as pl
@@ -12,7 +17,11 @@ import uuid
 
 from pipelines.minio_upload import (
     create_minio_client,
+    load_manifest,
+    manifest_objects,
+    zstandard,
 )  # use your existing shared function
+from pipelines.instrumentation import instrument_s3_client, instrumented
 
 load_dotenv()
 
@@ -25,12 +34,28 @@ JSON_SUFFIX = os.getenv("JSON_SUFFIX")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 OBJECT_NAME_TEMPLATE = os.getenv("OBJECT_NAME_TEMPLATE")
 
+# Local directory the NDJSON objects are spooled to before Polars parses them
+NDJSON_SPOOL_DIR = os.getenv(
+    "NDJSON_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "web2warehouse_ndjson")
+)
+SPOOL_CHUNK_SIZE = 1024 * 1024
+# Shards of a sharded scrape run downloaded concurrently
+SHARD_READ_WORKERS = int(os.getenv("SHARD_READ_WORKERS", "8"))
+
 
 endpoint_url = os.getenv("MINIO_ENDPOINT_URL")
 access_key_id = os.getenv("MINIO_ACCESS_KEY_ID")
 secret_access_key = os.getenv("MINIO_SECRET_ACCESS_KEY")
 
-s3 = create_minio_client(endpoint_url, access_key_id, secret_access_key)
+s3 = instrument_s3_client(create_minio_client(endpoint_url, access_key_id, secret_access_key))
+
+
+def _read_object_lines(object_key: str) -> List[Dict]:
+    response = s3.get_object(Bucket=BUCKET_NAME, Key=object_key)
+    content = decompress_body(
+        response["Body"].read(), response.get("ContentEncoding")
+    ).decode("utf-8")
+    return [json.loads(line) for line in content.strip().splitlines()]
 
 
 def read_ndjson_from_minio(date):
@@ -38,10 +63,154 @@ def read_ndjson_from_minio(date):
     # print(f'object_key - {object_key}')
 
     try:
-        response = s3.get_object(Bucket=BUCKET_NAME, Key=object_key)
-        content = response["Body"].read().decode("utf-8")
-        json_lines = [json.loads(line) for line in content.strip().splitlines()]
-        return json_lines
+        shard_keys = day_shard_keys(date)
+        if shard_keys is None:
+            return _read_object_lines(object_key)
+        with ThreadPoolExecutor(max_workers=SHARD_READ_WORKERS) as pool:
+            return [row for rows in pool.map(_read_object_lines, shard_keys) for row in rows]
+    except s3.exceptions.NoSuchKey:
+        raise FileNotFoundError(f"Object not found: {object_key}")
+    except Exception as e:
+        raise RuntimeError(f"Failed to read from MinIO: {e}")
+
+
+def day_shard_keys(date):
+    """
+    Object keys of a day's NDJSON shards, in write order.
+
+    Returns None for days written as a single object (before sharded scraping).
+    """
+    prefix = posixpath.dirname(OBJECT_NAME_TEMPLATE.format(date=date))
+    manifest = load_manifest(s3, BUCKET_NAME, prefix)
+    if manifest is None:
+        return None
+    if not manifest.get("complete"):
+        print(f"⚠️  Scrape run under {prefix}/ is incomplete; reading its finished shards")
+    return manifest_objects(manifest)
+
+
+def decompress_body(body: bytes, content_encoding: str = None) -> bytes:
+    """
+    Decodes an object body written by `NDJSONMultipartWriter` with compression.
+
+    Args:
+        body (bytes): Raw object bytes.
+        content_encoding (str): The object's `ContentEncoding` ("gzip", "zstd" or None).
+
+    Returns:
+        bytes: The uncompressed NDJSON payload.
+    """
+    if content_encoding == "gzip":
+        return gzip.decompress(body)
+    if content_encoding == "zstd":
+        if zstandard is None:
+            raise ImportError("reading zstd objects requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return body
+
+
+def open_decompressed_stream(stream, content_encoding: str = None):
+    """Wraps a binary stream so reads return uncompressed bytes, without buffering the whole body."""
+    if content_encoding == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if content_encoding == "zstd":
+        if zstandard is None:
+            raise ImportError("reading zstd objects requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    return stream
+
+
+def ndjson_stream_to_frame(
+    stream,
+    spool_path: str,
+    content_encoding: str = None,
+    schema: pl.Schema = None,
+    lazy: bool = False,
+):
+    """
+    Spools an NDJSON byte stream to a local file and parses it with Polars' native reader.
+
+    The stream is copied chunk by chunk (decompressing on the fly), so no per-record
+    Python objects are created and the body is never held in memory as a whole.
+
+    Args:
+        stream: Binary file-like object, e.g. an S3 `StreamingBody`.
+        spool_path (str): Local file the stream is written to. Must outlive a LazyFrame.
+        content_encoding (str): "gzip", "zstd" or None.
+        schema (pl.Schema): Optional pinned schema; skips inference and fixes dtypes.
+        lazy (bool): Return a `pl.LazyFrame` scanning the spooled file instead of a DataFrame.
+
+    Returns:
+        pl.DataFrame | pl.LazyFrame: The parsed records.
+    """
+    os.makedirs(os.path.dirname(spool_path) or ".", exist_ok=True)
+    with open(spool_path, "wb") as f:
+        shutil.copyfileobj(
+            open_decompressed_stream(stream, content_encoding), f, SPOOL_CHUNK_SIZE
+        )
+
+    if os.path.getsize(spool_path) == 0:
+        df = pl.DataFrame(schema=schema)
+        return df.lazy() if lazy else df
+
+    # Listings differ in how many images/rooms they have, so infer over every row
+    # unless the schema is pinned.
+    options = {"schema": schema} if schema is not None else {"infer_schema_length": None}
+    if lazy:
+        return pl.scan_ndjson(spool_path, **options)
+    return pl.read_ndjson(spool_path, **options)
+
+
+def _read_object_frame(object_key: str, schema: pl.Schema = None, lazy: bool = False):
+    spool_path = os.path.join(NDJSON_SPOOL_DIR, object_key.replace("/", "__"))
+    response = s3.get_object(Bucket=BUCKET_NAME, Key=object_key)
+    return ndjson_stream_to_frame(
+        response["Body"],
+        spool_path,
+        content_encoding=response.get("ContentEncoding"),
+        schema=schema,
+        lazy=lazy,
+    )
+
+
+@instrumented("read_ndjson")
+def read_ndjson_frame_from_minio(date, schema: pl.Schema = None, lazy: bool = False):
+    """
+    Streams the day's NDJSON from MinIO straight into Polars.
+
+    Unlike `read_ndjson_from_minio`, this never decodes the body into Python dicts.
+    Each object is spooled to `NDJSON_SPOOL_DIR` (one file per object, overwritten on
+    the next read), which Polars then memory-maps and parses natively. Days written
+    as shards are read shard by shard in parallel (`SHARD_READ_WORKERS`) and
+    concatenated, so listings whose shards differ in columns still line up.
+
+    Args:
+        date: Date used to format `OBJECT_NAME_TEMPLATE`.
+        schema (pl.Schema): Optional pinned schema.
+        lazy (bool): Return a LazyFrame instead of a DataFrame.
+
+    Returns:
+        pl.DataFrame | pl.LazyFrame: The day's records.
+    """
+    object_key = OBJECT_NAME_TEMPLATE.format(date=date)
+
+    try:
+        shard_keys = day_shard_keys(date)
+        if shard_keys is None:
+            return _read_object_frame(object_key, schema=schema, lazy=lazy)
+        if not shard_keys:
+            df = pl.DataFrame(schema=schema)
+            return df.lazy() if lazy else df
+
+        with ThreadPoolExecutor(max_workers=SHARD_READ_WORKERS) as pool:
+            frames = list(
+                pool.map(lambda key: _read_object_frame(key, schema, lazy), shard_keys)
+            )
+        frames = [f for f in frames if f.collect_schema().len()]
+        if not frames:
+            df = pl.DataFrame(schema=schema)
+            return df.lazy() if lazy else df
+        return pl.concat(frames, how="diagonal_relaxed")
     except s3.exceptions.NoSuchKey:
         raise FileNotFoundError(f"Object not found: {object_key}")
     except Exception as e:
@@ -62,17 +231,102 @@ def create_bucket(bucket_name: str):
         print(f"Error creating bucket '{bucket_name}': {e}")
 
 
-def flatten_json(y, prefix=""):
-    out = {}
+# List fields kept as Arrow list<struct> columns when scraping in nested mode,
+# instead of one dotted column per element (images.0.srcUrl, images.1.srcUrl, ...).
+IMAGES_COL = "result.pageContext.propertyData.images"
+ROOM_DETAILS_COL = "result.pageContext.propertyData.room_details"
+NESTED_LIST_PATHS = (IMAGES_COL, ROOM_DETAILS_COL)
+
+
+def _ancestor_paths(paths) -> frozenset:
+    """Every proper dotted prefix of `paths` ("a.b.c" -> "", "a", "a.b")."""
+    ancestors = {""}
+    for path in paths:
+        parts = path.split(".")
+        ancestors.update(".".join(parts[:i]) for i in range(1, len(parts)))
+    return frozenset(ancestors)
 
-    if isinstance(y, dict):
-        for k, v in y.items():
-            out.update(flatten_json(v, prefix + k + "."))
-    elif isinstance(y, list):
-        for i, v in enumerate(y):
-            out.update(flatten_json(v, prefix + str(i) + "."))
-    else:
-        out[prefix[:-1]] = y
+
+def flatten_json(
+    y,
+    prefix="",
+    keep_paths=(),
+    keep_lists=False,
+    max_depth=None,
+    include=None,
+    exclude=(),
+):
+    """
+    Flattens nested JSON into a single-level dict with dotted keys.
+
+    Walks the document with an explicit stack of iterators and writes every leaf
+    straight into one output dict, so the cost is linear in the number of leaves
+    (no intermediate dicts per level, no recursion limit). Empty objects and lists
+    produce no keys. Containers are matched by exact type (`dict`/`list`, as
+    `json.loads` produces). With the default policies the output, including key
+    order, is the same as the original recursive implementation.
+
+    Args:
+        y: The JSON value to flatten.
+        prefix (str): Key prefix, ending in "." when not empty.
+        keep_paths (tuple): Dotted key paths whose values are kept as-is instead of
+            being flattened, e.g. `NESTED_LIST_PATHS`.
+        keep_lists (bool): Keep every list as an array value instead of `key.0`, `key.1`, ...
+        max_depth (int): Keep values nested deeper than this many keys as-is.
+        include (Iterable[str]): Only emit these key paths and everything below them.
+        exclude (Iterable[str]): Drop these key paths and everything below them.
+
+    Returns:
+        dict: The flattened record.
+    """
+    root_key = prefix[:-1]
+    kind = type(y)
+    if (keep_paths and root_key in keep_paths) or not (kind is dict or kind is list):
+        return {root_key: y}
+
+    policy = bool(keep_paths or keep_lists or exclude or max_depth is not None or include is not None)
+    keep_paths = frozenset(keep_paths)
+    exclude = frozenset(exclude)
+    if include is not None:
+        include = frozenset(include)
+        include_ancestors = _ancestor_paths(include)
+    included = include is None or root_key in include
+
+    out = {}
+    stack = [(iter(y.items() if kind is dict else enumerate(y)), prefix, included)]
+    while stack:
+        items, pre, included = stack[-1]
+        for k, v in items:
+            key = f"{pre}{k}"
+            kind = type(v)
+            child_included = included
+            if policy:
+                if key in exclude:
+                    continue
+                if not included:
+                    if key in include:
+                        child_included = True
+                    elif key not in include_ancestors:
+                        continue
+                if child_included and (
+                    key in keep_paths
+                    or (kind is list and keep_lists)
+                    or ((kind is dict or kind is list) and max_depth is not None and len(stack) >= max_depth)
+                ):
+                    out[key] = v
+                    continue
+            if kind is dict:
+                if v:
+                    stack.append((iter(v.items()), f"{key}.", child_included))
+                    break
+            elif kind is list:
+                if v:
+                    stack.append((iter(enumerate(v)), f"{key}.", child_included))
+                    break
+            elif child_included:
+                out[key] = v
+        else:
+            stack.pop()
 
     return out
 
@@ -106,12 +360,11 @@ def flatten_property_data_polars(df: pl.DataFrame) -> pl.DataFrame:
             ]
         ).drop("address")
 
-    # Step 2: Clean accommodation summary using apply
+    # Step 2: Clean accommodation summary (same rules as clean_accommodation_summary)
     if "accomadation_summary" in df.columns:
         df = df.with_columns(
             [
-                pl.col("accomadation_summary")
-                .apply(clean_accommodation_summary)
+                accommodation_summary_expr("accomadation_summary", strip_chars="• ")
                 .alias("accomadation_summary")
             ]
         )
@@ -148,6 +401,37 @@ def flatten_and_concatenate_address_fields(
     return df_with_concat_address.drop(address_cols)
 
 
+def accommodation_summary_expr(column: str, strip_chars: str = "•") -> pl.Expr:
+    """
+    Vectorised equivalent of `clean_accommodation_summary`, evaluated by Polars' native engine.
+
+    Splits the text on line breaks, drops blank lines, strips `strip_chars` and then
+    surrounding whitespace from each line and joins the lines with ", ". Empty and blank
+    strings become "", while nulls stay null (the row-wise `map_elements` version never
+    saw them, so they were never turned into "").
+
+    Args:
+        column (str): The multiline string column to clean.
+        strip_chars (str): Characters stripped from both ends of each line before the
+            whitespace strip.
+
+    Returns:
+        pl.Expr: The cleaned string expression.
+    """
+    return (
+        pl.col(column)
+        .str.replace_all("\r", "\n", literal=True)
+        .str.split("\n")
+        .list.eval(
+            pl.element()
+            .filter(pl.element().str.strip_chars() != "")
+            .str.strip_chars(strip_chars)
+            .str.strip_chars()
+        )
+        .list.join(", ")
+    )
+
+
 def clean_accommodation_summary_column(
     df: pl.DataFrame,
     column: str = "result.pageContext.propertyData.accomadation_summary",
@@ -163,30 +447,17 @@ def clean_accommodation_summary_column(
     Returns:
         pl.DataFrame: A DataFrame with the cleaned summary column.
     """
-    return df.with_columns(
-        pl.col(column)
-        .map_elements(
-            lambda summary: (
-                ", ".join(
-                    line.strip("•").strip()
-                    for line in summary.replace("\r", "\n").split("\n")
-                    if line.strip()
-                )
-                if summary
-                else ""
-            ),
-            return_dtype=pl.Utf8,
-        )
-        .alias(column)
-    )
+    return df.with_columns(accommodation_summary_expr(column).alias(column))
 
 
 # ------------------------------------------------------
 # Helper functions for Silver-layer extraction
 # ------------------------------------------------------
-# NOTE: All helpers assume *flattened* column names like
-#   result.pageContext.propertyData.images.0.srcUrl
-#   result.pageContext.propertyData.room_details.3.name
+# NOTE: The room/image helpers accept both raw layouts:
+#   * flattened:  result.pageContext.propertyData.images.0.srcUrl
+#   * nested:     result.pageContext.propertyData.images  (list<struct>)
+# Flattened columns are reassembled into a list<struct> so both layouts go
+# through the same native explode. Raw tables may hold a mix of both.
 # ------------------------------------------------------
 
 # ---------- Room Details ----------
@@ -196,18 +467,20 @@ def clean_accommodation_summary_column(
 import polars as pl
 import re
 
-"""Helper functions to transform the *flattened* property JSON into tidy Silver-layer tables.
+"""Helper functions to transform the property JSON into tidy Silver-layer tables.
 Each function accepts a Polars `DataFrame` (`df`) and returns another `DataFrame` ready to
 be appended to a Delta Lake table.
 
 Assumptions
 -----------
 * Column names follow the dotted paths you shared, e.g.
-  `result.pageContext.propertyData.room_details.3.name`.
+  `result.pageContext.propertyData.room_details.3.name`, or hold the whole list as
+  `result.pageContext.propertyData.room_details` when scraped in nested mode.
 * `result.pageContext.propertyData._id` is the surrogate key for every property (`property_id`).
 * `latitude`/`longitude` columns already exist (added earlier in the pipeline).
 
-All code is Polars ≥ 0.20-style; `DataFrame.unpivot` replaces the deprecated `melt` API.
+All helpers accept a `DataFrame` or a `LazyFrame`, so `build_silver_incremental` can
+plan every silver output from one lazy scan.
 """
 
 # ------------------------------------------------------------------
@@ -218,134 +491,307 @@ IMAGE_SUBFIELDS: list[str] = [
     "last-modified", "createdAt", "updatedAt",
 ]
 
-# ------------------------------------------------------------------
-# 1. explode_room_details
-# ------------------------------------------------------------------
+ROOM_RENAMES: dict[str, str] = {
+    "name": "room_name",
+    "dimensions": "dimensions",
+    "dimensionsAlt": "dimensions_alt",
+    "description": "room_description",
+}
 
-def explode_room_details(df: pl.DataFrame) -> pl.DataFrame:
-    """Return one row per `property_id` × `room_index` with tidy room fields."""
+IMAGE_RENAMES: dict[str, str] = {
+    "srcUrl": "src_url",
+    "url": "full_url",
+    "caption": "caption",
+    "order": "image_order",
+    "etag": "etag",
+    "reapit_etag": "reapit_etag",
+    "last-modified": "last_modified",
+    "createdAt": "created_at",
+    "updatedAt": "updated_at",
+}
 
-    # Columns that belong to room_details
-    room_cols = [
-        c for c in df.columns
-        if c.startswith("result.pageContext.propertyData.room_details.")
-    ]
-    if not room_cols:
-        return pl.DataFrame([])
 
-    long = (
+def _has_nested_list(schema: pl.Schema, column: str) -> bool:
+    return column in schema and isinstance(schema[column], pl.List)
+
+
+def _flattened_to_list(schema: pl.Schema, column: str, fields: list[str] = None) -> pl.Expr:
+    """
+    Rebuilds dotted `<column>.<idx>.<field>` columns into one list<struct> expression.
+
+    Missing index/field combinations become nulls and every value is cast to a string,
+    matching what the former unpivot/pivot path produced. Returns None when the
+    flattened columns are absent.
+    """
+    pattern = re.compile(re.escape(column) + r"\.(\d+)\.(.+)$")
+    by_index: dict[int, dict[str, str]] = {}
+    field_order: dict[str, None] = {}
+    for name in schema.names():
+        match = pattern.match(name)
+        if match and (fields is None or match.group(2) in fields):
+            by_index.setdefault(int(match.group(1)), {})[match.group(2)] = name
+            field_order.setdefault(match.group(2))
+    if not by_index:
+        return None
+
+    structs = []
+    for idx in range(max(by_index) + 1):
+        cols = by_index.get(idx, {})
+        structs.append(
+            pl.struct(
+                [
+                    (pl.col(cols[f]).cast(pl.Utf8) if f in cols else pl.lit(None, pl.Utf8)).alias(f)
+                    for f in field_order
+                ]
+            )
+        )
+    return pl.concat_list(structs)
+
+
+def _explode_list(
+    df: pl.DataFrame | pl.LazyFrame,
+    items: pl.Expr,
+    index_name: str,
+    fields: list[str] = None,
+    drop_empty: bool = False,
+):
+    """
+    Explodes a list<struct> expression into one row per element with its list position.
+
+    `_raw_row` keeps the position of the source row, so callers can restore raw order.
+    """
+    exploded = (
         df.select(
             pl.col("result.pageContext.propertyData._id").alias("property_id"),
-            *room_cols,
-        )
-        .unpivot(
-            on=room_cols,
-            index="property_id",
-            variable_name="attribute",
-            value_name="value",
-        )
-        .with_columns(
-            [
-                # extract numeric index (0,1,2, …) from “…room_details.<idx>.field”
-                pl.col("attribute")
-                .str.extract(r"room_details\.(\d+)\.")
-                .cast(pl.Int64)
-                .alias("room_index"),
-                # extract the trailing field name (name/dimensions/description/…)
-                pl.col("attribute")
-                .str.extract(r"room_details\.\d+\.(.*)$")
-                .alias("field"),
-            ]
+            items.alias("_item"),
+            pl.int_ranges(0, items.list.len(), dtype=pl.Int64).alias(index_name),
+            pl.int_range(pl.len(), dtype=pl.UInt32).alias("_raw_row"),
         )
-        .filter(pl.col("value").is_not_null())
+        .explode(["_item", index_name])
+        .filter(pl.col("_item").is_not_null())
+        .unnest("_item")
+    )
+    names = exploded.collect_schema().names()
+    present = [
+        c for c in (fields or names)
+        if c in names and c not in ("property_id", index_name, "_raw_row")
+    ]
+    if drop_empty and present:
+        # Positions only present because another listing had more elements
+        exploded = exploded.filter(pl.any_horizontal(pl.col(present).is_not_null()))
+    # Values are cast to strings so both raw layouts land in the same silver schema.
+    return exploded.select(
+        "property_id", index_name, "_raw_row", *[pl.col(c).cast(pl.Utf8) for c in present]
     )
 
-    wide = (
-        long
-        .pivot(
-            index=["property_id", "room_index"],
-            columns="field", # type: ignore
-            values="value",
-            aggregate_function="first",  # if duplicates exist, keep first non-null
-        )
-        .rename(
-            {
-                "name": "room_name",
-                "dimensions": "dimensions",
-                "dimensionsAlt": "dimensions_alt",
-                "description": "room_description",
-            }
-        )
-        .sort(["property_id", "room_index"])
+
+def _explode_list_column(
+    df: pl.DataFrame | pl.LazyFrame,
+    column: str,
+    index_name: str,
+    renames: dict[str, str],
+    fields: list[str] = None,
+):
+    """Explodes `column` from either raw layout (or both, concatenated) and renames the fields."""
+    schema = df.collect_schema()
+    frames = []
+    if _has_nested_list(schema, column):
+        frames.append(_explode_list(df, pl.col(column), index_name, fields))
+    flattened = _flattened_to_list(schema, column, fields)
+    if flattened is not None:
+        frames.append(_explode_list(df, flattened, index_name, fields, drop_empty=True))
+
+    if not frames:
+        empty = pl.DataFrame([])
+        return empty.lazy() if isinstance(df, pl.LazyFrame) else empty
+
+    combined = frames[0] if len(frames) == 1 else pl.concat(frames, how="diagonal_relaxed")
+    # Raw rows arrive oldest snapshot first; keeping that order within each key lets
+    # the merge's last-row-wins dedup pick the newest snapshot, whichever layout it used.
+    return (
+        combined.rename(renames, strict=False)
+        .sort(["property_id", index_name, "_raw_row"])
+        .drop("_raw_row")
     )
-    return wide
+
 
 # ------------------------------------------------------------------
-# 2. explode_images
+# 1. explode_room_details
 # ------------------------------------------------------------------
 
-def explode_images(df: pl.DataFrame) -> pl.DataFrame:
-    """Return one row per `property_id` × `image_index` with image metadata."""
+FEET_TO_M = 0.3048
+INCHES_TO_M = 0.0254
+
+# One side of an imperial dimension: 14'9", 14' 9", 14ft 9in, 14'
+_IMPERIAL_SIDE = r"(\d+)\s*(?:'|’|ft|feet)\s*(?:(\d+(?:\.\d+)?)\s*(?:\"|”|''|in(?:ch(?:es)?)?)?)?"
+# One side of a metric dimension: 4.50m, 4,5 m, 450cm, 4.50
+_METRIC_SIDE = r"(\d+(?:[.,]\d+)?)\s*(mm|cm|m(?:etres?|eters?)?)?"
+_IMPERIAL_MARK = r"\d\s*(?:'|’|ft\b|feet)"
+_SEPARATOR = r"\s*(?:x|by)\s*"
+
+
+def _metric_side_m(value: pl.Expr, unit: pl.Expr) -> pl.Expr:
+    """Metres from a captured number and unit; unit-less integers of 100+ are centimetres."""
+    number = value.str.replace(",", ".").cast(pl.Float64, strict=False)
+    return (
+        pl.when(unit == "mm").then(number / 1000)
+        .when(unit == "cm").then(number / 100)
+        .when(unit.is_null() & ~value.str.contains(r"[.,]") & (number >= 100)).then(number / 100)
+        .otherwise(number)
+    )
+
+
+def _imperial_side_m(feet: pl.Expr, inches: pl.Expr) -> pl.Expr:
+    return (
+        feet.cast(pl.Float64, strict=False) * FEET_TO_M
+        + inches.cast(pl.Float64, strict=False).fill_null(0.0) * INCHES_TO_M
+    )
+
+
+def _clean_dimension_text(column: str) -> pl.Expr:
+    return (
+        pl.col(column).cast(pl.Utf8).str.to_lowercase()
+        .str.replace_all("×", "x")
+        # Brackets repeat the size in the other unit: 3.20m (10'6") x 2.5m (8'2")
+        .str.replace_all(r"\([^)]*\)?", " ")
+    )
 
-    img_cols = [
-        c for c in df.columns
-        if c.startswith("result.pageContext.propertyData.images.")
+
+def _dimension_sides(prefix: str) -> list[pl.Expr]:
+    """Length and width in metres from the extracted groups of one dimension string."""
+    imperial, metric = pl.col(f"{prefix}_imperial"), pl.col(f"{prefix}_metric")
+    is_imperial = pl.col(f"{prefix}_is_imperial")
+
+    # A unit written on one side only ("4.5 x 3.2m") applies to both
+    length_unit = metric.struct.field("lu").fill_null(metric.struct.field("wu"))
+    width_unit = metric.struct.field("wu").fill_null(metric.struct.field("lu"))
+    length_unit = length_unit.str.slice(0, 2).replace({"me": "m"})
+    width_unit = width_unit.str.slice(0, 2).replace({"me": "m"})
+
+    length_m = (
+        pl.when(is_imperial)
+        .then(_imperial_side_m(imperial.struct.field("lf"), imperial.struct.field("li")))
+        .otherwise(_metric_side_m(metric.struct.field("lv"), length_unit))
+    )
+    width_m = (
+        pl.when(is_imperial)
+        .then(_imperial_side_m(imperial.struct.field("wf"), imperial.struct.field("wi")))
+        .otherwise(_metric_side_m(metric.struct.field("wv"), width_unit))
+    )
+    return [length_m.alias(f"{prefix}_length"), width_m.alias(f"{prefix}_width")]
+
+
+def _dimension_status(prefix: str, raw: str) -> list[pl.Expr]:
+    """`unit` and `status` (`ok`, `partial`, `unparsed` or `missing`) of one string."""
+    length_m, width_m = pl.col(f"{prefix}_length"), pl.col(f"{prefix}_width")
+    text = pl.col(raw).cast(pl.Utf8)
+    unit = (
+        pl.when(length_m.is_null()).then(None)
+        .when(pl.col(f"{prefix}_is_imperial")).then(pl.lit("imperial"))
+        .otherwise(pl.lit("metric"))
+    )
+    status = (
+        pl.when(text.is_null() | (text.str.strip_chars() == "")).then(pl.lit("missing"))
+        .when(length_m.is_null()).then(pl.lit("unparsed"))
+        .when(width_m.is_null()).then(pl.lit("partial"))
+        .otherwise(pl.lit("ok"))
+    )
+    return [unit.alias(f"{prefix}_unit"), status.alias(f"{prefix}_status")]
+
+
+def add_room_dimensions(
+    df: pl.DataFrame | pl.LazyFrame,
+    dimensions: str = "dimensions",
+    dimensions_alt: str = "dimensions_alt",
+):
+    """
+    Vectorized parsing of room dimension strings into metres.
+
+    Handles metric (`4.50m x 3.20m`, `450 x 320cm`) and imperial (`14'9" x 10'6"`,
+    `14ft 9in x 10ft 6in`) sizes; values in brackets are ignored. The alternative
+    string is used when the main one cannot be parsed in full. Each regex runs once
+    per string into a helper column, and the fields are picked from those.
+
+    Args:
+        df (pl.DataFrame | pl.LazyFrame): Rooms with both dimension columns.
+        dimensions (str): Column holding the primary dimension string.
+        dimensions_alt (str): Column holding the alternative-unit string.
+
+    Returns:
+        pl.DataFrame | pl.LazyFrame: `df` plus `length_m`, `width_m`, `area_m2`,
+        `dimension_unit` and `dimension_parse_status`.
+    """
+    sides = {"_dim_main": dimensions, "_dim_alt": dimensions_alt}
+    imperial = f"{_IMPERIAL_SIDE}(?:{_SEPARATOR}{_IMPERIAL_SIDE})?"
+    metric = f"{_METRIC_SIDE}(?:{_SEPARATOR}{_METRIC_SIDE})?"
+    temporary = [
+        f"{p}{suffix}"
+        for p in sides
+        for suffix in ("", "_is_imperial", "_imperial", "_metric", "_length", "_width", "_unit", "_status")
     ]
-    if not img_cols:
-        return pl.DataFrame([])
 
-    long = (
-        df.select(
-            pl.col("result.pageContext.propertyData._id").alias("property_id"),
-            *img_cols,
-        )
-        .unpivot(
-            on=img_cols,
-            index="property_id",
-            variable_name="attribute",
-            value_name="value",
-        )
+    use_alt = (pl.col("_dim_main_status") != "ok") & (pl.col("_dim_alt_status") == "ok")
+
+    def pick(field: str) -> pl.Expr:
+        return pl.when(use_alt).then(pl.col(f"_dim_alt_{field}")).otherwise(pl.col(f"_dim_main_{field}"))
+
+    return (
+        df.with_columns(_clean_dimension_text(raw).alias(p) for p, raw in sides.items())
         .with_columns(
-            [
-                pl.col("attribute")
-                .str.extract(r"images\.(\d+)\.")
-                .cast(pl.Int64)
-                .alias("image_index"),
-                pl.col("attribute")
-                .str.extract(r"images\.\d+\.(.*)$")
-                .alias("field"),
-            ]
+            expr
+            for p in sides
+            for expr in (
+                pl.col(p).str.contains(_IMPERIAL_MARK).alias(f"{p}_is_imperial"),
+                pl.col(p).str.extract_groups(imperial)
+                .struct.rename_fields(["lf", "li", "wf", "wi"]).alias(f"{p}_imperial"),
+                pl.col(p).str.extract_groups(metric)
+                .struct.rename_fields(["lv", "lu", "wv", "wu"]).alias(f"{p}_metric"),
+            )
         )
-        .filter(
-            (pl.col("value").is_not_null())
-            & (pl.col("field").is_in(IMAGE_SUBFIELDS))
+        .with_columns(expr for p in sides for expr in _dimension_sides(p))
+        .with_columns(expr for p, raw in sides.items() for expr in _dimension_status(p, raw))
+        .with_columns(
+            pick("length").round(2).alias("length_m"),
+            pick("width").round(2).alias("width_m"),
+            (pick("length") * pick("width")).round(2).alias("area_m2"),
+            pick("unit").alias("dimension_unit"),
+            pick("status").alias("dimension_parse_status"),
         )
+        .drop(temporary)
     )
 
-    wide = (
-        long
-        .pivot(
-            index=["property_id", "image_index"],
-            columns="field", # type: ignore
-            values="value",
-            aggregate_function="first",
-        )
-        .rename(
-            {
-                "srcUrl": "src_url",
-                "url": "full_url",
-                "caption": "caption",
-                "order": "image_order",
-                "etag": "etag",
-                "reapit_etag": "reapit_etag",
-                "last-modified": "last_modified",
-                "createdAt": "created_at",
-                "updatedAt": "updated_at",
-            }
-        )
-        .sort(["property_id", "image_index"])
+
+def explode_room_details(df: pl.DataFrame | pl.LazyFrame):
+    """Return one row per `property_id` × `room_index` with tidy room fields.
+
+    Dimension strings are parsed into `length_m`, `width_m` and `area_m2` here, once
+    per room, instead of in every query downstream.
+
+    Works on a DataFrame or a LazyFrame and returns the same kind.
+    """
+    rooms = _explode_list_column(df, ROOM_DETAILS_COL, "room_index", ROOM_RENAMES)
+    schema = rooms.collect_schema()
+    if "property_id" not in schema:
+        return rooms
+    missing = [
+        pl.lit(None, dtype=pl.Utf8).alias(c)
+        for c in ("dimensions", "dimensions_alt")
+        if c not in schema
+    ]
+    return add_room_dimensions(rooms.with_columns(missing))
+
+# ------------------------------------------------------------------
+# 2. explode_images
+# ------------------------------------------------------------------
+
+def explode_images(df: pl.DataFrame | pl.LazyFrame):
+    """Return one row per `property_id` × `image_index` with image metadata.
+
+    Works on a DataFrame or a LazyFrame and returns the same kind.
+    """
+    return _explode_list_column(
+        df, IMAGES_COL, "image_index", IMAGE_RENAMES, IMAGE_SUBFIELDS
     )
-    return wide
 
 # ------------------------------------------------------------------
 # 3. extract_agent_dim
@@ -360,15 +806,27 @@ def extract_agent_dim(df: pl.DataFrame) -> pl.DataFrame:
             pl.col("result.pageContext.propertyData.crm_negotiator_id.Email").alias("agent_email"),
         )
         .filter(pl.col("agent_id").is_not_null())
-        .unique(subset=["agent_id"])
+        # Latest snapshot's details win, as in the merge
+        .unique(subset=["agent_id"], keep="last", maintain_order=True)
     )
 
 # ------------------------------------------------------------------
 # 4. extract_location_dim
 # ------------------------------------------------------------------
 
+LOCATION_KEY_FIELDS: list[str] = [
+    "house_number", "address_line1", "address_line2", "address_line3",
+    "address_line4", "country", "postcode",
+]
+
+
 def extract_location_dim(df: pl.DataFrame) -> pl.DataFrame:
-    """Unique set of locations with lat/lon."""
+    """Unique set of locations with lat/lon.
+
+    * `location_key` is the normalised address (lower-cased, "|"-separated, nulls as
+      empty strings) and identifies a location across runs.
+    * `cell_id` is the spatial cell of the point (see `cell_id_expr`).
+    """
     return (
         df.select(
             pl.col("result.pageContext.propertyData.address.house_number").alias("house_number"),
@@ -380,7 +838,18 @@ def extract_location_dim(df: pl.DataFrame) -> pl.DataFrame:
             pl.col("result.pageContext.propertyData.address.postcode").alias("postcode"),
             pl.col("latitude"),
             pl.col("longitude"),
-        ).unique()
+        )
+        .unique(keep="last", maintain_order=True)
+        .with_columns(
+            pl.concat_str(
+                [
+                    pl.col(c).cast(pl.Utf8).str.strip_chars().str.to_lowercase().fill_null("")
+                    for c in LOCATION_KEY_FIELDS
+                ],
+                separator="|",
+            ).alias("location_key"),
+            cell_id_expr(),
+        )
     )
 
 # ------------------------------------------------------------------
@@ -407,4 +876,55 @@ def extract_energy_metrics(df: pl.DataFrame) -> pl.DataFrame:
             pl.col("result.pageContext.propertyData.extras.created_on").alias("recorded_at"),
         )
         .filter(pl.col("property_id").is_not_null())
-    )
\ No newline at end of file
+    )
+# ------------------------------------------------------------------
+# 6. spatial cell ids
+# ------------------------------------------------------------------
+
+# Bits per axis of a full-precision cell (about 0.6 m of longitude). A cell at level
+# L < CELL_LEVELS is the full id with the last 2 * (CELL_LEVELS - L) bits dropped.
+CELL_LEVELS = 26
+_CELL_MAX = 2**CELL_LEVELS - 1
+# Magic masks that spread a 32-bit integer over the even bits of a 64-bit one
+_SPREAD_STEPS = (
+    (2**16, 0x0000FFFF0000FFFF),
+    (2**8, 0x00FF00FF00FF00FF),
+    (2**4, 0x0F0F0F0F0F0F0F0F),
+    (2**2, 0x3333333333333333),
+    (2**1, 0x5555555555555555),
+)
+
+
+def _spread_bits(x):
+    """Moves bit i of `x` to bit 2i. Works on Python ints and on Int64 expressions."""
+    for shift, mask in _SPREAD_STEPS:
+        x = (x | (x * shift)) & mask
+    return x
+
+
+def interleave_cell(x, y):
+    """Z-order (Morton) code of grid coordinates: x on the even bits, y on the odd ones."""
+    return _spread_bits(x) | (_spread_bits(y) * 2)
+
+
+def cell_id_expr(latitude: str = "latitude", longitude: str = "longitude") -> pl.Expr:
+    """
+    Hierarchical spatial cell id of every row, computed vectorized.
+
+    Latitude and longitude are quantized to a 2^26 x 2^26 grid and their bits
+    interleaved, like a geohash kept as an integer. Points close together share a
+    long common prefix, so sorting by `cell_id` keeps neighbours together and any
+    coarser cell is one contiguous `cell_id` range. Rows without coordinates get null.
+
+    Args:
+        latitude (str): Latitude column (degrees).
+        longitude (str): Longitude column (degrees).
+
+    Returns:
+        pl.Expr: Int64 `cell_id` column.
+    """
+    x = ((pl.col(longitude).cast(pl.Float64, strict=False) + 180) / 360 * 2**CELL_LEVELS)
+    y = ((pl.col(latitude).cast(pl.Float64, strict=False) + 90) / 180 * 2**CELL_LEVELS)
+    x = x.floor().clip(0, _CELL_MAX).cast(pl.Int64)
+    y = y.floor().clip(0, _CELL_MAX).cast(pl.Int64)
+    return interleave_cell(x, y).alias("cell_id")
@@ -0,0 +1,339 @@
+# instrumentation.py
+
+import cProfile
+import fcntl
+import functools
+import json
+import os
+import re
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# Where stage records (stages.jsonl), the Prometheus textfile and profiles go
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join("data", "metrics"))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Point node_exporter's textfile collector here (defaults to METRICS_DIR/pipeline.prom)
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE") or os.path.join(METRICS_DIR, "pipeline.prom")
+# Comma-separated stage names (or "all") to profile, and how: "cprofile" or "py-spy"
+PROFILE_STAGES = {s for s in os.getenv("PROFILE_STAGES", "").split(",") if s}
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+RSS_SAMPLE_SECONDS = 0.05
+
+COUNTERS = ("rows_in", "rows_out", "bytes_read", "bytes_written")
+
+_lock = threading.Lock()
+# Stages currently open in any thread; bytes are credited to those of the thread
+# that moved them
+_active: List["StageMetrics"] = []
+# Last record of every stage (and label set) in this process, for the Prometheus textfile
+_latest: Dict[tuple, Dict] = {}
+
+_SAMPLE_LINE = re.compile(r"^(pipeline_stage_\w+)\{(.*)\} (\S+)$")
+
+
+def _current_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _max_rss() -> int:
+    """Peak RSS of the process so far, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageMetrics:
+    """
+    Counters of one running stage. Rows and bytes are added by the stage itself,
+    except S3 traffic through an instrumented client, which is counted automatically.
+    """
+
+    def __init__(self, name: str, labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.labels = labels or {}
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.peak_rss = _current_rss() or 0
+        self.thread_id = threading.get_ident()
+        self._stop = threading.Event()
+
+    def add(self, counter: str, value: int) -> None:
+        with _lock:
+            self.counts[counter] += int(value or 0)
+
+    def add_rows(self, rows_in: int = 0, rows_out: int = 0) -> None:
+        self.add("rows_in", rows_in)
+        self.add("rows_out", rows_out)
+
+    def _sample_rss(self) -> None:
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            rss = _current_rss()
+            if rss is None:
+                return
+            self.peak_rss = max(self.peak_rss, rss)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _read_prometheus_samples() -> Dict[str, Dict[str, str]]:
+    """Samples already in the textfile, as metric -> label string -> value."""
+    samples: Dict[str, Dict[str, str]] = {}
+    try:
+        with open(PROMETHEUS_TEXTFILE) as f:
+            for line in f:
+                match = _SAMPLE_LINE.match(line.rstrip("\n"))
+                if match:
+                    metric, labels, value = match.groups()
+                    samples.setdefault(metric, {})[labels] = value
+    except FileNotFoundError:
+        pass
+    return samples
+
+
+def _write_prometheus() -> None:
+    metrics = {
+        "wall_seconds": "Wall-clock time of the stage's last run.",
+        "cpu_seconds": "CPU time of the stage's last run (its own thread for per-thread stages).",
+        "rows_in": "Rows the stage read in its last run.",
+        "rows_out": "Rows the stage wrote in its last run.",
+        "bytes_read": "Bytes read from MinIO (boto3) in the stage's last run.",
+        "bytes_written": "Bytes written to MinIO (boto3 and Delta data files) in the stage's last run.",
+        "peak_rss_bytes": "Peak resident memory during the stage's last run.",
+        "success": "1 if the stage's last run succeeded.",
+        "last_run_timestamp_seconds": "When the stage last finished.",
+    }
+    os.makedirs(os.path.dirname(PROMETHEUS_TEXTFILE) or ".", exist_ok=True)
+    # Stages run in separate processes (runner, standalone modules) share one file:
+    # keep their samples and only replace the ones of stages this process ran
+    with open(f"{PROMETHEUS_TEXTFILE}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        samples = _read_prometheus_samples()
+        for record in _latest.values():
+            labels = ",".join(
+                f'{k}="{_escape_label(v)}"'
+                for k, v in [("stage", record["stage"]), *sorted(record["labels"].items())]
+            )
+            for metric in metrics:
+                samples.setdefault(f"pipeline_stage_{metric}", {})[labels] = record[metric]
+
+        lines = []
+        for metric, help_text in metrics.items():
+            name = f"pipeline_stage_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{{{labels}}} {value}" for labels, value in samples.get(name, {}).items()]
+
+        # Written aside and renamed so the collector never reads half a file
+        tmp_path = f"{PROMETHEUS_TEXTFILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, PROMETHEUS_TEXTFILE)
+
+
+def emit(record: Dict) -> None:
+    """Appends a stage record to `stages.jsonl` and refreshes the Prometheus textfile."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with _lock:
+        with open(os.path.join(METRICS_DIR, "stages.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+        _latest[(record["stage"], *sorted(record["labels"].items()))] = record
+        _write_prometheus()
+
+
+def _profile_path(name: str, suffix: str) -> str:
+    directory = os.path.join(METRICS_DIR, "profiles")
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return os.path.join(directory, f"{name}-{stamp}.{suffix}")
+
+
+@contextmanager
+def _profiler(name: str):
+    """cProfile (.prof, for snakeviz/pstats) or py-spy (flame graph .svg) around a stage."""
+    if not (PROFILE_STAGES & {name, "all"}):
+        yield
+        return
+
+    if PROFILE_MODE == "py-spy" and shutil.which("py-spy"):
+        path = _profile_path(name, "svg")
+        spy = subprocess.Popen(
+            ["py-spy", "record", "--pid", str(os.getpid()), "--output", path, "--threads"],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            yield
+        finally:
+            # py-spy writes its output when interrupted
+            spy.send_signal(signal.SIGINT)
+            spy.wait()
+            print(f"Flame graph of {name} written to {path}")
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = _profile_path(name, "prof")
+        profiler.dump_stats(path)
+        print(f"Profile of {name} written to {path}")
+
+
+@contextmanager
+def stage(name: str, thread_cpu: bool = False, **labels: str):
+    """
+    Measures a pipeline stage.
+
+    Records wall time, CPU time, peak RSS (sampled while the stage runs), rows
+    in/out as reported with `metrics.add_rows`, and the bytes this thread moves through
+    S3 clients passed to `instrument_s3_client` or reports with `count_bytes`. On exit
+    the record is appended to `METRICS_DIR/stages.jsonl` and the Prometheus textfile
+    is rewritten, whether the stage succeeded or not. Stages listed in
+    `PROFILE_STAGES` are also profiled.
+
+    CPU time is the whole process's by default, which includes native worker
+    threads (Polars, delta-rs, DuckDB). Stages that run side by side on a thread
+    pool pass `thread_cpu=True` so each counts only its own thread's CPU time and
+    the records can be added up.
+
+    Args:
+        name (str): Stage name, e.g. `silver.merge`.
+        thread_cpu (bool): Measure the CPU time of the calling thread only.
+        **labels (str): Extra labels, e.g. `table="property_details"`.
+
+    Yields:
+        StageMetrics: Counters to add rows/bytes to.
+
+    Example:
+        with stage("ingest_raw") as metrics:
+            df = read(...)
+            metrics.add_rows(rows_in=df.height)
+    """
+    metrics = StageMetrics(name, labels)
+    if not METRICS_ENABLED:
+        yield metrics
+        return
+
+    sampler = threading.Thread(target=metrics._sample_rss, daemon=True)
+    sampler.start()
+    with _lock:
+        _active.append(metrics)
+    started_at = datetime.now(timezone.utc)
+    cpu_clock = time.thread_time if thread_cpu else time.process_time
+    wall, cpu = time.perf_counter(), cpu_clock()
+    success = False
+    try:
+        with _profiler(name):
+            yield metrics
+        success = True
+    finally:
+        wall, cpu = time.perf_counter() - wall, cpu_clock() - cpu
+        metrics._stop.set()
+        sampler.join()
+        with _lock:
+            _active.remove(metrics)
+        emit(
+            {
+                "stage": name,
+                "labels": labels,
+                "started_at": started_at.isoformat(),
+                "wall_seconds": round(wall, 6),
+                "cpu_seconds": round(cpu, 6),
+                **metrics.counts,
+                "peak_rss_bytes": max(metrics.peak_rss, _current_rss() or 0) or _max_rss(),
+                "success": int(success),
+                "last_run_timestamp_seconds": round(time.time(), 3),
+            }
+        )
+
+
+def instrumented(name: Optional[str] = None):
+    """
+    Decorator form of `stage`. Rows out are taken from the return value when it has
+    a length (a DataFrame's `height`, a list's `len`).
+    """
+
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as metrics:
+                result = fn(*args, **kwargs)
+                rows = getattr(result, "height", None)
+                if rows is None and isinstance(result, (list, tuple)):
+                    rows = len(result)
+                if rows is not None:
+                    metrics.add_rows(rows_out=rows)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def _credit(counter: str, value: int) -> None:
+    if not value:
+        return
+    thread_id = threading.get_ident()
+    with _lock:
+        for metrics in _active:
+            if metrics.thread_id == thread_id:
+                metrics.counts[counter] += value
+
+
+def count_bytes(bytes_read: int = 0, bytes_written: int = 0) -> None:
+    """
+    Credits bytes moved outside boto3 (e.g. Delta files written by delta-rs) to the
+    stages open on the calling thread.
+    """
+    _credit("bytes_read", int(bytes_read or 0))
+    _credit("bytes_written", int(bytes_written or 0))
+
+
+def instrument_s3_client(client):
+    """
+    Counts the bytes a boto3 S3 client sends and receives towards the stages open
+    on the calling thread.
+
+    PutObject/UploadPart bodies count as written, the `ContentLength` of GetObject
+    responses as read. Delta tables are written by delta-rs, not boto3; their writers
+    report the data files they add with `count_bytes`.
+
+    Returns:
+        The same client, for chaining.
+    """
+
+    def on_upload(params, **kwargs):
+        body = params.get("Body")
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if isinstance(body, (bytes, bytearray)):
+            size = len(body)
+        elif hasattr(body, "seek") and hasattr(body, "tell"):
+            position = body.tell()
+            size = body.seek(0, os.SEEK_END) - position
+            body.seek(position)
+        else:
+            size = 0
+        _credit("bytes_written", size)
+
+    def on_get(parsed, **kwargs):
+        _credit("bytes_read", parsed.get("ContentLength") or 0)
+
+    for operation in ("PutObject", "UploadPart"):
+        client.meta.events.register(f"provide-client-params.s3.{operation}", on_upload)
+    client.meta.events.register("after-call.s3.GetObject", on_get)
+    return client
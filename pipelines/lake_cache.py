@@ -0,0 +1,195 @@
+# lake_cache.py
+
+import argparse
+import os
+from typing import Dict, List, Optional
+
+import duckdb
+import polars as pl
+from deltalake import DeltaTable
+
+from pipelines.delta_lake import storage_options
+from pipelines.duckdb_ingestion import connect
+
+# Upper bound on the Delta bytes copied into the warehouse; least recently used
+# tables (see `touch`) are evicted (their view falls back to delta_scan) beyond it.
+LAKE_CACHE_MAX_BYTES = int(os.getenv("LAKE_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+CACHE_SCHEMA = "lake_cache"
+META_TABLE = f"{CACHE_SCHEMA}._meta"
+
+# `lake` view -> Delta table, as created by sql/bootstrap_duckdb.sql
+LAKE_TABLES: Dict[str, str] = {
+    "raw_property_json": "s3://delta/delta_table/raw/property_json",
+    "ext_property_flat": "s3://delta/delta_table/silver/property_details",
+    "ext_room_items": "s3://delta/delta_table/silver/property_rooms",
+    "ext_image_items": "s3://delta/delta_table/silver/property_images",
+    "ext_agent_dim": "s3://delta/delta_table/silver/agents",
+    "ext_location_dim": "s3://delta/delta_table/silver/locations",
+    "ext_energy_metrics": "s3://delta/delta_table/silver/property_energy",
+}
+
+
+def _ensure_meta(con: duckdb.DuckDBPyConnection) -> None:
+    con.sql(f"CREATE SCHEMA IF NOT EXISTS {CACHE_SCHEMA};")
+    con.sql("CREATE SCHEMA IF NOT EXISTS lake;")
+    con.sql(
+        f"""
+    CREATE TABLE IF NOT EXISTS {META_TABLE} (
+        view_name VARCHAR PRIMARY KEY,
+        source_path VARCHAR,
+        delta_version BIGINT,
+        size_bytes BIGINT,
+        refreshed_at TIMESTAMP,
+        last_used_at TIMESTAMP
+    );
+    """
+    )
+
+
+def _point_view(con: duckdb.DuckDBPyConnection, view: str, source: str) -> None:
+    con.sql(f"CREATE OR REPLACE VIEW lake.{view} AS SELECT * FROM {source};")
+
+
+def _remote_state(path: str) -> Dict[str, int]:
+    """Current version and active-file bytes of a Delta table."""
+    table = DeltaTable(path, storage_options=storage_options)
+    actions = pl.DataFrame(table.get_add_actions(flatten=True))
+    size = int(actions["size_bytes"].sum()) if actions.height else 0
+    return {"version": table.version(), "size_bytes": size}
+
+
+def evict(con: duckdb.DuckDBPyConnection, view: str) -> None:
+    """Drops the cached copy of `view` and points the view back at the remote table."""
+    con.execute(f"DROP TABLE IF EXISTS {CACHE_SCHEMA}.{view};")
+    con.execute(f"DELETE FROM {META_TABLE} WHERE view_name = ?", [view])
+    _point_view(con, view, f"delta_scan('{LAKE_TABLES[view]}')")
+
+
+def touch(con: duckdb.DuckDBPyConnection, views: List[str]) -> None:
+    """
+    Marks the cached copies of `views` as read, for the LRU eviction.
+
+    DuckDB cannot report which views a query read, so readers of the lake views
+    call this (or `python -m pipelines.lake_cache --touch <views>`) for the tables
+    they use. A bulk refresh of every view does not count as a read.
+    """
+    if views:
+        con.execute(
+            f"UPDATE {META_TABLE} SET last_used_at = now() WHERE view_name IN "
+            f"({', '.join('?' for _ in views)})",
+            list(views),
+        )
+
+
+def _enforce_budget(con: duckdb.DuckDBPyConnection, max_bytes: int) -> List[str]:
+    rows = con.execute(
+        f"SELECT view_name, size_bytes FROM {META_TABLE} ORDER BY last_used_at DESC"
+    ).fetchall()
+    evicted, total = [], 0
+    for view, size in rows:
+        total += size
+        if total > max_bytes:
+            evict(con, view)
+            evicted.append(view)
+    return evicted
+
+
+def refresh_cache(
+    con: duckdb.DuckDBPyConnection,
+    views: Optional[List[str]] = None,
+    max_bytes: int = LAKE_CACHE_MAX_BYTES,
+) -> Dict[str, str]:
+    """
+    Keeps local DuckDB copies of the lake tables in step with their Delta versions.
+
+    Each requested view is copied into `lake_cache.<view>` only when the remote Delta
+    version differs from the cached one, then `lake.<view>` is repointed at the copy,
+    so dbt sources and Superset read it without any change. Views requested by name
+    are marked as used (see `touch`); a refresh of every view keeps their last-used
+    times. When the cached Delta bytes exceed `max_bytes` the least recently used
+    copies are evicted and their views read from MinIO again.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Warehouse connection from `connect`.
+        views (Optional[List[str]]): Views to refresh and mark as used. Defaults to
+            every lake table, none of them marked.
+        max_bytes (int): Cache budget in (compressed) Delta bytes.
+
+    Returns:
+        Dict[str, str]: View -> `hit`, `refreshed`, `too_large`, `missing` or `evicted`.
+    """
+    _ensure_meta(con)
+    status = {}
+    touch(con, views)
+
+    for view in views or list(LAKE_TABLES):
+        path = LAKE_TABLES[view]
+        if not DeltaTable.is_deltatable(path, storage_options=storage_options):
+            status[view] = "missing"
+            continue
+
+        remote = _remote_state(path)
+        cached = con.execute(
+            f"SELECT delta_version, last_used_at FROM {META_TABLE} WHERE view_name = ?",
+            [view],
+        ).fetchone()
+
+        if remote["size_bytes"] > max_bytes:
+            evict(con, view)
+            status[view] = "too_large"
+            continue
+
+        if cached and cached[0] == remote["version"]:
+            status[view] = "hit"
+            continue
+
+        con.execute("BEGIN TRANSACTION")
+        try:
+            con.execute(
+                f"CREATE OR REPLACE TABLE {CACHE_SCHEMA}.{view} AS "
+                f"SELECT * FROM delta_scan('{path}');"
+            )
+            # A new copy of a cached view keeps its last read
+            con.execute(
+                f"INSERT OR REPLACE INTO {META_TABLE} "
+                f"VALUES (?, ?, ?, ?, now(), coalesce(?::TIMESTAMP, now()))",
+                [view, path, remote["version"], remote["size_bytes"], cached and cached[1]],
+            )
+            _point_view(con, view, f"{CACHE_SCHEMA}.{view}")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        status[view] = "refreshed"
+
+    for view in _enforce_budget(con, max_bytes):
+        status[view] = "evicted"
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the local DuckDB cache of the lake tables")
+    parser.add_argument("--tables", nargs="*", choices=list(LAKE_TABLES), default=None,
+                        help="lake views to refresh (default: all)")
+    parser.add_argument("--max-bytes", type=int, default=LAKE_CACHE_MAX_BYTES,
+                        help="cache budget in Delta bytes")
+    parser.add_argument("--evict-all", action="store_true",
+                        help="drop every cached copy and read from MinIO again")
+    parser.add_argument("--touch", nargs="+", choices=list(LAKE_TABLES), default=None,
+                        help="only mark these views as read, e.g. after a dashboard refresh")
+    args = parser.parse_args()
+
+    con = connect()
+    if args.touch:
+        _ensure_meta(con)
+        touch(con, args.touch)
+        print(f"✅ Marked {', '.join(args.touch)} as used")
+    elif args.evict_all:
+        _ensure_meta(con)
+        for view in args.tables or list(LAKE_TABLES):
+            evict(con, view)
+        print("✅ Lake views point at MinIO again")
+    else:
+        for view, state in refresh_cache(con, args.tables, args.max_bytes).items():
+            print(f"{view}: {state}")
@@ -0,0 +1,205 @@
+# listing_discovery.py
+
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import httpx
+from dotenv import load_dotenv
+
+from pipelines.async_fetcher import fetch_text_concurrently, summarize_latencies
+
+load_dotenv()
+
+BASE_URL = os.getenv("BASE_URL")
+
+# Listing pages are few and heavy, so be gentler than the detail-page fetcher
+DISCOVERY_CONCURRENCY = int(os.getenv("DISCOVERY_CONCURRENCY", "4"))
+DISCOVERY_RATE_PER_SEC = float(os.getenv("DISCOVERY_RATE_PER_SEC", "1"))
+# Headless browsers started for pages whose cards are not in the served HTML
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+
+CARD_CLASS = "property-card"
+NAME_CLASS = "property-name"
+CARD_LINK_SELECTOR = f".{CARD_CLASS} .{NAME_CLASS} a"
+
+# Elements that never have a closing tag
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "source", "track", "wbr",
+}
+
+
+class PropertyCardLinkParser(HTMLParser):
+    """
+    Collects the `href` of every `.property-card .property-name a` in a page.
+
+    Mirrors the CSS selector the Selenium scraper used, on the server-rendered HTML.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.links: List[str] = []
+        # (tag, in_card, in_name) for every open element
+        self._stack: List[tuple] = []
+
+    def _context(self):
+        return self._stack[-1][1:] if self._stack else (False, False)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        in_card, in_name = self._context()
+        classes = (attrs.get("class") or "").split()
+        in_name = in_name or (in_card and NAME_CLASS in classes)
+        in_card = in_card or CARD_CLASS in classes
+
+        if tag == "a" and in_name and attrs.get("href"):
+            self.links.append(attrs["href"])
+        if tag not in _VOID_TAGS:
+            self._stack.append((tag, in_card, in_name))
+
+    def handle_startendtag(self, tag, attrs):
+        # <a/> and friends: record the link, but nothing is opened
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        # Tolerate unclosed children by popping back to the matching element
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                del self._stack[i:]
+                return
+
+
+def parse_card_links(html: str, page_url: str) -> List[str]:
+    """
+    Extracts property detail links from a listing page's HTML.
+
+    Args:
+        html (str): Listing page HTML.
+        page_url (str): URL the page was fetched from, to resolve relative links.
+
+    Returns:
+        List[str]: Absolute links in page order, without duplicates.
+    """
+    parser = PropertyCardLinkParser()
+    parser.feed(html)
+    parser.close()
+    links = [urljoin(page_url, href) for href in parser.links]
+    return list(dict.fromkeys(links))
+
+
+def _headless_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    return webdriver.Chrome(options=options)
+
+
+def browser_card_links(urls: List[str], pool_size: int = BROWSER_POOL_SIZE) -> Dict[str, List[str]]:
+    """
+    Renders listing pages in a pool of headless Chrome instances and reads their card links.
+
+    Only used for pages whose cards are rendered client-side. Each browser is started
+    once and reused for every page it is handed.
+
+    Args:
+        urls (List[str]): Listing page URLs.
+        pool_size (int): Number of browsers to run in parallel.
+
+    Returns:
+        Dict[str, List[str]]: Page URL -> card links (empty if the page failed).
+    """
+    if not urls:
+        return {}
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    drivers = queue.Queue()
+    started = []
+    for _ in range(max(1, min(pool_size, len(urls)))):
+        driver = _headless_driver()
+        started.append(driver)
+        drivers.put(driver)
+
+    def render(url: str) -> List[str]:
+        driver = drivers.get()
+        try:
+            driver.get(url)
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, f".{CARD_CLASS}"))
+            )
+            cards = driver.find_elements(By.CSS_SELECTOR, CARD_LINK_SELECTOR)
+            return [c.get_attribute("href") for c in cards if c.get_attribute("href")]
+        except Exception as e:
+            print(f"Error rendering {url}: {e}")
+            return []
+        finally:
+            drivers.put(driver)
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(started)) as pool:
+            return dict(zip(urls, pool.map(render, urls)))
+    finally:
+        for driver in started:
+            driver.quit()
+
+
+def discover_listing_links(
+    start_page: int = 1,
+    end_page: int = 3,
+    base_url: Optional[str] = None,
+    concurrency: int = DISCOVERY_CONCURRENCY,
+    rate_per_sec: float = DISCOVERY_RATE_PER_SEC,
+    browser_fallback: bool = True,
+    browser_pool_size: int = BROWSER_POOL_SIZE,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> List[str]:
+    """
+    Finds property detail links across listing pages without a browser where possible.
+
+    Pages are fetched concurrently over plain HTTP (rate limited, with retries) and the
+    card links parsed from the HTML. Pages that fail or show no cards, e.g. because
+    they are rendered client-side, are retried in a pool of headless browsers.
+
+    Args:
+        start_page (int): First listing page.
+        end_page (int): Last listing page (inclusive).
+        base_url (Optional[str]): Listing URL template with a `{page}` placeholder.
+            Defaults to `BASE_URL`.
+        concurrency (int): Maximum in-flight page requests.
+        rate_per_sec (float): Sustained page request rate.
+        browser_fallback (bool): Render pages without cards in headless Chrome.
+        browser_pool_size (int): Headless browsers to run for the fallback.
+        transport (httpx.AsyncBaseTransport): Optional transport override, e.g. for a stub server.
+
+    Returns:
+        List[str]: Links in page order, without duplicates.
+    """
+    base_url = base_url or BASE_URL
+    page_urls = [base_url.format(page=page) for page in range(start_page, end_page + 1)]
+    results = fetch_text_concurrently(
+        page_urls, concurrency=concurrency, rate_per_sec=rate_per_sec, transport=transport
+    )
+    print(f"Listing page fetch stats: {summarize_latencies(results)}")
+
+    links_by_page = {
+        r.url: parse_card_links(r.payload, r.url) if r.ok else [] for r in results
+    }
+    missing = [url for url, links in links_by_page.items() if not links]
+    if missing and browser_fallback:
+        print(f"Rendering {len(missing)} page(s) without cards in headless Chrome...")
+        links_by_page.update(browser_card_links(missing, browser_pool_size))
+    elif missing:
+        print(f"No property cards found on {len(missing)} page(s): {missing}")
+
+    all_links = [link for url in page_urls for link in links_by_page[url]]
+    return list(dict.fromkeys(all_links))
@@ -0,0 +1,59 @@
+# migrate_raw_partitioned.py
+"""One-off migration of the per-day raw tables (raw/delta_YYYY-MM-DD) into the
+single `snapshot_date`-partitioned raw table at `delta_lake.RAW_PATH`.
+
+Each day is written with `write_raw_partition`, which replaces that day's
+partition, so the migration can be re-run safely. The old tables are left in
+place; delete them once the new table has been checked.
+"""
+
+import argparse
+import re
+from datetime import date
+
+import polars as pl
+
+from pipelines.delta_lake import storage_options, write_raw_partition
+from pipelines.helper_functions import s3
+
+LAKE_BUCKET = "delta"
+LEGACY_RAW_PREFIX = "delta_table/raw/"
+LEGACY_RAW_PATTERN = re.compile(r"delta_(\d{4}-\d{2}-\d{2})/$")
+
+
+def list_legacy_raw_tables() -> dict:
+    """Returns {snapshot_date: s3a path} for every per-day raw table in the lake bucket."""
+    tables = {}
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(
+        Bucket=LAKE_BUCKET, Prefix=LEGACY_RAW_PREFIX, Delimiter="/"
+    ):
+        for prefix in page.get("CommonPrefixes", []):
+            match = LEGACY_RAW_PATTERN.search(prefix["Prefix"])
+            if match:
+                tables[date.fromisoformat(match.group(1))] = (
+                    f"s3a://{LAKE_BUCKET}/{prefix['Prefix'].rstrip('/')}"
+                )
+    return dict(sorted(tables.items()))
+
+
+def migrate(dry_run: bool = False):
+    tables = list_legacy_raw_tables()
+    print(f"Found {len(tables)} per-day raw tables")
+
+    for snapshot_date, path in tables.items():
+        df = pl.read_delta(path, storage_options=storage_options)
+        null_cols = [c for c, dt in zip(df.columns, df.dtypes) if dt == pl.Null]
+        df = df.drop(null_cols)
+        if dry_run:
+            print(f"Would migrate {df.height} rows from {path}")
+            continue
+        write_raw_partition(df, snapshot_date)
+        print(f"✅ Migrated {df.height} rows from {path} into snapshot_date={snapshot_date}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be migrated")
+    args = parser.parse_args()
+    migrate(args.dry_run)
@@ -2,7 +2,15 @@
 
 import boto3
 from botocore.client import Config
+import json
 import os
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for compression="zstd"
+    zstandard = None
 
 
 def create_minio_client(
@@ -62,3 +70,292 @@ def upload_file(client: "boto3.client", file_path: str, bucket_name: str) -> Non
     object_name = os.path.basename(file_path)
     client.upload_file(file_path, bucket_name, object_name)
     print(f"Uploaded '{object_name}' to bucket '{bucket_name}'.")
+
+
+# Minimum part size accepted by S3/MinIO for every part except the last one.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+CONTENT_ENCODINGS = ("gzip", "zstd")
+
+
+def _make_compressor(compression: Optional[str]):
+    if compression is None:
+        return None
+    if compression == "gzip":
+        # wbits=31 -> gzip container, so the object is a regular .gz stream
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package")
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f"Unsupported compression '{compression}', expected one of {CONTENT_ENCODINGS}")
+
+
+class NDJSONMultipartWriter:
+    """
+    Streams records to a single S3/MinIO object as NDJSON using multipart upload.
+
+    Records are encoded as they are written and buffered only until `part_size`
+    bytes are ready, so peak memory is bounded by one part regardless of how
+    many records are written. Payloads smaller than one part fall back to a
+    single `put_object`. On error the multipart upload is aborted.
+
+    Compressed objects keep the same key and advertise the codec through
+    `ContentEncoding` so readers can decompress transparently.
+
+    Example:
+        with NDJSONMultipartWriter(client, "staging", key, compression="gzip") as writer:
+            for record in records:
+                writer.write(record)
+    """
+
+    def __init__(
+        self,
+        client: "boto3.client",
+        bucket_name: str,
+        object_name: str,
+        part_size: int = 8 * 1024 * 1024,
+        compression: Optional[str] = None,
+    ):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.client = client
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.part_size = part_size
+        self.compression = compression
+        self.records_written = 0
+        self.bytes_uploaded = 0
+
+        self._compressor = _make_compressor(compression)
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict] = []
+
+    def __enter__(self) -> "NDJSONMultipartWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _extra_args(self) -> Dict[str, str]:
+        args = {"ContentType": "application/x-ndjson"}
+        if self.compression:
+            args["ContentEncoding"] = self.compression
+        return args
+
+    def write(self, record: Dict) -> None:
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        if self._compressor is not None:
+            line = self._compressor.compress(line)
+        self._buffer += line
+        self.records_written += 1
+        if len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+
+    def _upload_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=self.object_name, **self._extra_args()
+            )
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.object_name,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self.bytes_uploaded += len(data)
+
+    def close(self) -> None:
+        if self._compressor is not None:
+            self._buffer += self._compressor.flush()
+            self._compressor = None
+
+        if self._upload_id is None:
+            # Everything fits in one part: a plain PUT is cheaper than multipart
+            self.client.put_object(
+                Bucket=self.bucket_name,
+                Key=self.object_name,
+                Body=bytes(self._buffer),
+                ContentLength=len(self._buffer),
+                **self._extra_args(),
+            )
+            self.bytes_uploaded += len(self._buffer)
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.object_name,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buffer = bytearray()
+
+    def abort(self) -> None:
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.object_name, UploadId=self._upload_id
+            )
+            self._upload_id = None
+        self._buffer = bytearray()
+
+
+MANIFEST_NAME = "_manifest.json"
+SHARD_NAME_TEMPLATE = "{stream}-{index:05d}.ndjson"
+
+
+def load_manifest(client: "boto3.client", bucket_name: str, prefix: str) -> Optional[Dict]:
+    """Returns the shard manifest stored under `prefix`, or None if there is none."""
+    try:
+        response = client.get_object(Bucket=bucket_name, Key=f"{prefix}/{MANIFEST_NAME}")
+    except client.exceptions.NoSuchKey:
+        return None
+    return json.loads(response["Body"].read())
+
+
+def manifest_objects(manifest: Dict, stream: str = "part") -> List[str]:
+    """Object names of one stream's shards, in write order."""
+    return [s["object_name"] for s in manifest["shards"] if s["stream"] == stream]
+
+
+class ShardedNDJSONWriter:
+    """
+    Writes a resumable run as a series of NDJSON shards plus a manifest.
+
+    Records go to `<prefix>/part-00000.ndjson`, `part-00001.ndjson`, ... (other
+    streams, e.g. "seen", get their own shards). `checkpoint()` closes the current
+    shards once `shard_size` items are done and rewrites `<prefix>/_manifest.json`
+    with the shard list and every completed item, so a crashed run loses at most one
+    shard of work. A new writer over the same prefix resumes from the manifest.
+
+    Args:
+        client (boto3.client): MinIO S3 client.
+        bucket_name (str): Target bucket.
+        prefix (str): Key prefix of the run, e.g. `raw/scraped_data_2025-07-18`.
+        shard_size (int): Items completed per shard.
+        part_size (int): Multipart part size of each shard.
+        compression (Optional[str]): "gzip", "zstd" or None.
+        resume (bool): Continue from an existing manifest instead of starting over.
+
+    Example:
+        with ShardedNDJSONWriter(client, "staging", prefix) as writer:
+            for link in writer.pending(links):
+                writer.write(fetch(link))
+                writer.mark_done(link)
+                writer.checkpoint()
+    """
+
+    def __init__(
+        self,
+        client: "boto3.client",
+        bucket_name: str,
+        prefix: str,
+        shard_size: int = 500,
+        part_size: int = 8 * 1024 * 1024,
+        compression: Optional[str] = None,
+        resume: bool = True,
+    ):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip("/")
+        self.shard_size = shard_size
+        self.part_size = part_size
+        self.compression = compression
+
+        manifest = load_manifest(client, bucket_name, self.prefix) if resume else None
+        self.manifest = manifest or {"shards": [], "completed": [], "complete": False}
+        self.manifest["complete"] = False
+        self._completed = set(self.manifest["completed"])
+        self._pending_done: List[str] = []
+        self._writers: Dict[str, NDJSONMultipartWriter] = {}
+        self.records_written = 0
+        self.bytes_uploaded = 0
+
+    def __enter__(self) -> "ShardedNDJSONWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def pending(self, items: List[str]) -> List[str]:
+        """`items` not yet completed by this or an earlier run, in order."""
+        return [item for item in items if item not in self._completed]
+
+    def write(self, record: Dict, stream: str = "part") -> None:
+        writer = self._writers.get(stream)
+        if writer is None:
+            index = sum(1 for s in self.manifest["shards"] if s["stream"] == stream)
+            writer = NDJSONMultipartWriter(
+                self.client,
+                self.bucket_name,
+                f"{self.prefix}/{SHARD_NAME_TEMPLATE.format(stream=stream, index=index)}",
+                part_size=self.part_size,
+                compression=self.compression,
+            )
+            self._writers[stream] = writer
+        writer.write(record)
+        if stream == "part":
+            self.records_written += 1
+
+    def mark_done(self, item: str) -> None:
+        """Marks an item as handled; it is persisted with the next shard."""
+        self._pending_done.append(item)
+
+    def checkpoint(self, force: bool = False) -> bool:
+        """Closes the current shards if `shard_size` items are done. Returns True if it did."""
+        if not self._pending_done or (len(self._pending_done) < self.shard_size and not force):
+            return False
+
+        for stream, writer in self._writers.items():
+            writer.close()
+            self.bytes_uploaded += writer.bytes_uploaded if stream == "part" else 0
+            self.manifest["shards"].append(
+                {
+                    "stream": stream,
+                    "object_name": writer.object_name,
+                    "records": writer.records_written,
+                    "bytes": writer.bytes_uploaded,
+                    "compression": self.compression,
+                }
+            )
+        self._writers = {}
+        self.manifest["completed"].extend(self._pending_done)
+        self._completed.update(self._pending_done)
+        self._pending_done = []
+        self._save_manifest()
+        return True
+
+    def _save_manifest(self) -> None:
+        body = json.dumps(self.manifest).encode("utf-8")
+        self.client.put_object(
+            Bucket=self.bucket_name,
+            Key=f"{self.prefix}/{MANIFEST_NAME}",
+            Body=body,
+            ContentLength=len(body),
+            ContentType="application/json",
+        )
+
+    def close(self) -> None:
+        self.checkpoint(force=True)
+        self.manifest["complete"] = True
+        self._save_manifest()
+
+    def abort(self) -> None:
+        # Items of the open shards were never recorded, so a rerun fetches them again
+        for writer in self._writers.values():
+            writer.abort()
+        self._writers = {}
+        self._pending_done = []
@@ -0,0 +1,394 @@
+# price_cube.py
+
+import argparse
+import math
+import os
+from datetime import date
+from typing import Dict, Optional, Sequence, Tuple
+
+import duckdb
+import polars as pl
+
+from pipelines.duckdb_ingestion import connect
+
+# Relative error of the percentile sketches (0.01 = within 1% of the true value).
+# Changing it rebuilds the cube on the next refresh.
+PRICE_SKETCH_ACCURACY = float(os.getenv("PRICE_SKETCH_ACCURACY", "0.01"))
+
+CUBE_SCHEMA = "marts"
+CUBE_TABLE = f"{CUBE_SCHEMA}.price_cube"
+SKETCH_TABLE = f"{CUBE_SCHEMA}.price_cube_sketch"
+CONTRIBUTIONS_TABLE = f"{CUBE_SCHEMA}.price_cube_contributions"
+STATE_TABLE = f"{CUBE_SCHEMA}.price_cube_state"
+
+# dbt models the cube is maintained from
+SNAPSHOT_MODEL = '"int".int_property_snapshot'
+BASE_MODEL = '"int".int_property_base'
+
+DIMENSIONS = ["postcode", "town", "building_type"]
+METRICS = ["price", "price_per_bedroom"]
+
+
+def sketch_gamma(accuracy: float = PRICE_SKETCH_ACCURACY) -> float:
+    """Bucket growth factor of a log-bucketed (DDSketch-style) sketch with this relative accuracy."""
+    return (1 + accuracy) / (1 - accuracy)
+
+
+def _ensure_tables(con: duckdb.DuckDBPyConnection) -> None:
+    dims = ",\n        ".join(f"{d} VARCHAR NOT NULL" for d in DIMENSIONS)
+    keys = ", ".join(DIMENSIONS)
+    con.sql(f"CREATE SCHEMA IF NOT EXISTS {CUBE_SCHEMA};")
+    con.sql(
+        f"""
+    CREATE TABLE IF NOT EXISTS {CUBE_TABLE} (
+        {dims},
+        month DATE NOT NULL,
+        listings BIGINT,
+        price_sum DOUBLE,
+        bedroom_listings BIGINT,
+        price_per_bedroom_sum DOUBLE,
+        PRIMARY KEY ({keys}, month)
+    );
+    CREATE TABLE IF NOT EXISTS {SKETCH_TABLE} (
+        {dims},
+        month DATE NOT NULL,
+        metric VARCHAR NOT NULL,
+        bucket INTEGER NOT NULL,
+        listings BIGINT,
+        PRIMARY KEY ({keys}, month, metric, bucket)
+    );
+    CREATE TABLE IF NOT EXISTS {CONTRIBUTIONS_TABLE} (
+        property_id VARCHAR,
+        month DATE,
+        {", ".join(f"{d} VARCHAR" for d in DIMENSIONS)},
+        bedrooms INTEGER,
+        price DOUBLE
+    );
+    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+        processed_through DATE,
+        sketch_accuracy DOUBLE,
+        refreshed_at TIMESTAMP
+    );
+    """
+    )
+
+
+def _read_state(con: duckdb.DuckDBPyConnection) -> Tuple[Optional[date], Optional[float]]:
+    row = con.execute(f"SELECT processed_through, sketch_accuracy FROM {STATE_TABLE}").fetchone()
+    return row if row else (None, None)
+
+
+def _stage_affected(con, processed_through: Optional[date], current: date, full_refresh: bool) -> int:
+    """Properties whose contributions may have changed since `processed_through`."""
+    dims_changed = " OR ".join(f"c.{d} IS DISTINCT FROM b.{d}" for d in DIMENSIONS)
+    if full_refresh or processed_through is None:
+        query = f"""
+        SELECT property_id FROM {SNAPSHOT_MODEL}
+        UNION SELECT property_id FROM {CONTRIBUTIONS_TABLE}
+        """
+        params = []
+    else:
+        # New snapshot rows, listings whose postcode/town/type changed, and open
+        # listings once a new month starts (they count towards it too)
+        query = f"""
+        SELECT property_id FROM {SNAPSHOT_MODEL} WHERE processed_through > ?
+        UNION
+        SELECT c.property_id FROM {CONTRIBUTIONS_TABLE} c
+        JOIN _base b ON b.property_id = c.property_id
+        WHERE {dims_changed} OR c.bedrooms IS DISTINCT FROM b.bedrooms
+        UNION
+        SELECT property_id FROM {SNAPSHOT_MODEL}
+        WHERE valid_to IS NULL AND date_trunc('month', ?::DATE) > date_trunc('month', ?::DATE)
+        """
+        params = [processed_through, current, processed_through]
+    con.execute(f"CREATE OR REPLACE TEMP TABLE _affected AS {query}", params)
+    return con.execute("SELECT count(*) FROM _affected").fetchone()[0]
+
+
+def _stage_contributions(con: duckdb.DuckDBPyConnection, current: date) -> None:
+    """
+    One row per affected property and month it was listed in, with its last price that month.
+
+    Open intervals count up to `current`, the newest snapshot processed.
+    """
+    dims = ", ".join(f"coalesce(b.{d}, 'unknown') AS {d}" for d in DIMENSIONS)
+    con.execute(
+        f"""
+    CREATE OR REPLACE TEMP TABLE _new_contributions AS
+    WITH intervals AS (
+        SELECT
+            property_id,
+            try_cast(price AS DOUBLE) AS price,
+            valid_from::DATE AS valid_from,
+            coalesce(valid_to::DATE, ?::DATE) AS valid_until
+        FROM {SNAPSHOT_MODEL}
+        WHERE property_id IN (SELECT property_id FROM _affected)
+    ),
+    months AS (
+        SELECT
+            property_id,
+            price,
+            valid_from,
+            unnest(generate_series(
+                date_trunc('month', valid_from)::TIMESTAMP,
+                date_trunc('month', valid_until)::TIMESTAMP,
+                INTERVAL 1 MONTH
+            ))::DATE AS month
+        FROM intervals
+        WHERE price > 0 AND valid_from <= valid_until
+    ),
+    latest AS (
+        SELECT * FROM months
+        QUALIFY row_number() OVER (PARTITION BY property_id, month ORDER BY valid_from DESC) = 1
+    )
+    SELECT l.property_id, l.month, {dims}, b.bedrooms, l.price
+    FROM latest l
+    LEFT JOIN _base b ON b.property_id = l.property_id;
+    """,
+        [current],
+    )
+
+
+def _apply_deltas(con: duckdb.DuckDBPyConnection, accuracy: float) -> Dict[str, int]:
+    """Adds new contributions to the cube and subtracts the ones they replace."""
+    columns = ", ".join(["property_id", "month", *DIMENSIONS, "bedrooms", "price"])
+    con.execute(
+        f"""
+    CREATE OR REPLACE TEMP TABLE _deltas AS
+    WITH old AS (
+        SELECT {columns} FROM {CONTRIBUTIONS_TABLE}
+        WHERE property_id IN (SELECT property_id FROM _affected)
+    )
+    SELECT *, 1 AS sign FROM (SELECT * FROM _new_contributions EXCEPT ALL SELECT * FROM old)
+    UNION ALL
+    SELECT *, -1 AS sign FROM (SELECT * FROM old EXCEPT ALL SELECT * FROM _new_contributions);
+    """
+    )
+
+    keys = ", ".join(DIMENSIONS)
+    log_gamma = math.log(sketch_gamma(accuracy))
+    con.execute(
+        f"""
+    INSERT INTO {CUBE_TABLE}
+    SELECT
+        {keys}, month,
+        sum(sign),
+        sum(sign * price),
+        coalesce(sum(sign) FILTER (WHERE bedrooms > 0), 0),
+        coalesce(sum(sign * price / bedrooms) FILTER (WHERE bedrooms > 0), 0)
+    FROM _deltas
+    GROUP BY ALL
+    ON CONFLICT DO UPDATE SET
+        listings = listings + excluded.listings,
+        price_sum = price_sum + excluded.price_sum,
+        bedroom_listings = bedroom_listings + excluded.bedroom_listings,
+        price_per_bedroom_sum = price_per_bedroom_sum + excluded.price_per_bedroom_sum;
+    """
+    )
+    con.execute(
+        f"""
+    INSERT INTO {SKETCH_TABLE}
+    WITH observations AS (
+        SELECT {keys}, month, 'price' AS metric, price AS value, sign FROM _deltas
+        UNION ALL
+        SELECT {keys}, month, 'price_per_bedroom', price / bedrooms, sign FROM _deltas
+        WHERE bedrooms > 0
+    )
+    SELECT {keys}, month, metric, ceil(ln(value) / {log_gamma})::INTEGER AS bucket, sum(sign)
+    FROM observations
+    GROUP BY ALL
+    ON CONFLICT DO UPDATE SET listings = listings + excluded.listings;
+    """
+    )
+    con.execute(f"DELETE FROM {SKETCH_TABLE} WHERE listings = 0;")
+    con.execute(f"DELETE FROM {CUBE_TABLE} WHERE listings = 0;")
+
+    con.execute(
+        f"DELETE FROM {CONTRIBUTIONS_TABLE} WHERE property_id IN (SELECT property_id FROM _affected);"
+    )
+    con.execute(f"INSERT INTO {CONTRIBUTIONS_TABLE} SELECT * FROM _new_contributions;")
+    added, removed = con.execute(
+        "SELECT count(*) FILTER (WHERE sign = 1), count(*) FILTER (WHERE sign = -1) FROM _deltas"
+    ).fetchone()
+    return {"added": added, "retracted": removed}
+
+
+def refresh_price_cube(
+    con: duckdb.DuckDBPyConnection,
+    full_refresh: bool = False,
+    accuracy: float = PRICE_SKETCH_ACCURACY,
+) -> Dict[str, object]:
+    """
+    Brings the postcode × town × building_type × month price cube up to date.
+
+    Each listing contributes once per month it was on the market, with its last price
+    that month. Only properties with new snapshot rows (or changed attributes) since
+    the last refresh are recomputed; their old contributions are subtracted from the
+    cube and the new ones added. Percentiles come from log-bucketed sketches whose
+    bucket counts add and subtract the same way, so any slice of the cube can be
+    merged without reading row-level data. Everything is applied in one transaction.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Warehouse connection from `connect`.
+        full_refresh (bool): Recompute every property's contributions.
+        accuracy (float): Relative error of the percentile sketches.
+
+    Returns:
+        Dict[str, object]: affected properties, added/retracted contributions and the
+        snapshot date processed through.
+    """
+    _ensure_tables(con)
+    processed_through, stored_accuracy = _read_state(con)
+    current = con.execute(f"SELECT max(processed_through) FROM {SNAPSHOT_MODEL}").fetchone()[0]
+    if current is None:
+        return {"affected": 0, "added": 0, "retracted": 0, "processed_through": None}
+    if stored_accuracy is not None and stored_accuracy != accuracy:
+        print(f"⚠️  Sketch accuracy changed ({stored_accuracy} -> {accuracy}); rebuilding the cube")
+        full_refresh = True
+
+    con.execute("BEGIN TRANSACTION")
+    try:
+        if full_refresh:
+            for table in (CUBE_TABLE, SKETCH_TABLE, CONTRIBUTIONS_TABLE):
+                con.execute(f"DELETE FROM {table};")
+        con.execute(
+            f"""
+        CREATE OR REPLACE TEMP TABLE _base AS
+        SELECT
+            prop_id AS property_id,
+            {", ".join(f"coalesce({d}, 'unknown') AS {d}" for d in DIMENSIONS)},
+            try_cast(bedrooms AS INTEGER) AS bedrooms
+        FROM {BASE_MODEL}
+        QUALIFY row_number() OVER (PARTITION BY prop_id ORDER BY path) = 1;
+        """
+        )
+        affected = _stage_affected(con, processed_through, current, full_refresh)
+        if affected:
+            _stage_contributions(con, current)
+            counts = _apply_deltas(con, accuracy)
+        else:
+            counts = {"added": 0, "retracted": 0}
+        con.execute(f"DELETE FROM {STATE_TABLE};")
+        con.execute(f"INSERT INTO {STATE_TABLE} VALUES (?, ?, now())", [current, accuracy])
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return {"affected": affected, **counts, "processed_through": current}
+
+
+def _where(filters: Optional[Dict[str, object]], months: Optional[Tuple[object, object]]):
+    clauses, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in DIMENSIONS:
+            raise ValueError(f"Unknown cube dimension: {column}")
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+        params.extend(values)
+    if months:
+        clauses.append("month BETWEEN ?::DATE AND ?::DATE")
+        params.extend(months)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query_price_cube(
+    con: duckdb.DuckDBPyConnection,
+    by: Sequence[str] = ("postcode",),
+    filters: Optional[Dict[str, object]] = None,
+    months: Optional[Tuple[object, object]] = None,
+    quantiles: Sequence[float] = (0.5, 0.9),
+    accuracy: float = PRICE_SKETCH_ACCURACY,
+) -> pl.DataFrame:
+    """
+    Answers a slice of the price cube: counts, averages and approximate percentiles.
+
+    Cube cells and their sketches are merged within each group, so no row-level data
+    is read. Percentiles are within `accuracy` (relative) of the exact value.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Warehouse connection.
+        by (Sequence[str]): Grouping columns: any of `DIMENSIONS` and `month`.
+        filters (Optional[Dict[str, object]]): Dimension -> value or list of values.
+        months (Optional[Tuple[object, object]]): Inclusive first and last month.
+        quantiles (Sequence[float]): Percentiles to estimate, e.g. (0.5, 0.9).
+        accuracy (float): Accuracy the cube was built with.
+
+    Returns:
+        pl.DataFrame: One row per group with `listings`, `avg_price`,
+        `avg_price_per_bedroom`, and `p50_price`, `p50_price_per_bedroom`, ...
+
+    Example:
+        query_price_cube(con, by=["postcode", "month"], filters={"building_type": "Apartment"})
+    """
+    unknown = [c for c in by if c not in DIMENSIONS + ["month"]]
+    if unknown:
+        raise ValueError(f"Unknown cube dimension(s): {unknown}")
+    where, params = _where(filters, months)
+    group = ", ".join(by)
+    select_group = f"{group}, " if by else ""
+    partition = f"PARTITION BY {', '.join([*by, 'metric'])}"
+    join = f"USING ({group})" if by else "ON true"
+    gamma = sketch_gamma(accuracy)
+
+    # A bucket i holds values in (gamma^(i-1), gamma^i]; 2 * gamma^i / (gamma + 1)
+    # is within `accuracy` of all of them
+    percentiles = []
+    for metric in METRICS:
+        for q in quantiles:
+            name = f"p{round(q * 100):g}_{metric}"
+            percentiles.append(
+                f"2 * pow({gamma}, min(bucket) FILTER (WHERE metric = '{metric}' "
+                f"AND running > {q} * (total - 1))) / ({gamma} + 1) AS {name}"
+            )
+
+    query = f"""
+    WITH cells AS (
+        SELECT
+            {select_group}
+            sum(listings)::BIGINT AS listings,
+            sum(price_sum) / sum(listings) AS avg_price,
+            sum(price_per_bedroom_sum) / nullif(sum(bedroom_listings), 0) AS avg_price_per_bedroom
+        FROM {CUBE_TABLE}
+        {where}
+        {"GROUP BY " + group if by else ""}
+    ),
+    buckets AS (
+        SELECT {select_group} metric, bucket, sum(listings) AS n
+        FROM {SKETCH_TABLE}
+        {where}
+        GROUP BY ALL
+    ),
+    ranked AS (
+        SELECT
+            *,
+            sum(n) OVER ({partition} ORDER BY bucket) AS running,
+            sum(n) OVER ({partition}) AS total
+        FROM buckets
+    ),
+    sketches AS (
+        SELECT {select_group} {", ".join(percentiles)}
+        FROM ranked
+        {"GROUP BY " + group if by else ""}
+    )
+    SELECT * FROM cells JOIN sketches {join}
+    {"ORDER BY " + group if by else ""}
+    """
+    return con.execute(query, params + params).pl()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain and query the postcode price cube")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="recompute the cube from every snapshot")
+    parser.add_argument("--by", nargs="*", default=None, metavar="DIMENSION",
+                        help=f"print a slice grouped by these ({', '.join(DIMENSIONS)}, month)")
+    args = parser.parse_args()
+
+    con = connect()
+    result = refresh_price_cube(con, full_refresh=args.full_refresh)
+    print(
+        f"✅ Price cube through {result['processed_through']}: {result['affected']} properties "
+        f"recomputed, {result['added']} contributions added, {result['retracted']} retracted"
+    )
+    if args.by is not None:
+        print(query_price_cube(con, by=args.by))
@@ -0,0 +1,459 @@
+# runner.py
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import posixpath
+import subprocess
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from pipelines.instrumentation import stage as measure_stage
+
+load_dotenv()
+
+# Fingerprints of the inputs each stage last succeeded with
+RUNNER_STATE_PATH = os.getenv("RUNNER_STATE_PATH", os.path.join("data", "runner_state.json"))
+RUNNER_WORKERS = int(os.getenv("RUNNER_WORKERS", "4"))
+
+SCRAPE_START_PAGE = int(os.getenv("SCRAPE_START_PAGE", "1"))
+SCRAPE_END_PAGE = int(os.getenv("SCRAPE_END_PAGE", "3"))
+
+DBT_PROJECT_DIR = os.getenv("DBT_PROJECT_DIR", os.path.join("dbt", "real_estate"))
+DBT_PROFILES_DIR = os.getenv("DBT_PROFILES_DIR", DBT_PROJECT_DIR)
+
+SHARED, EXCLUSIVE = "shared", "exclusive"
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline.
+
+    `inputs` returns the state the stage reads (object ETags, Delta versions, file
+    hashes...). When its fingerprint matches the last successful run the stage is
+    skipped; a stage without `inputs` always runs. `resources` maps a resource name to
+    `shared` or `exclusive`: stages holding a resource exclusively never overlap
+    with other stages using it.
+    """
+
+    name: str
+    run: Callable[[], object]
+    deps: List[str] = field(default_factory=list)
+    inputs: Optional[Callable[[], Dict]] = None
+    resources: Dict[str, str] = field(default_factory=dict)
+
+
+def fingerprint(inputs: Dict) -> str:
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def load_state(path: str = RUNNER_STATE_PATH) -> Dict[str, Dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state: Dict[str, Dict], path: str = RUNNER_STATE_PATH) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _topological_order(stages: Dict[str, Stage]) -> List[str]:
+    order, visiting, done = [], set(), set()
+
+    def visit(name: str):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a dependency cycle through {name}")
+        if name not in stages:
+            raise ValueError(f"Unknown stage: {name}")
+        visiting.add(name)
+        for dep in stages[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in stages:
+        visit(name)
+    return order
+
+
+def select_stages(
+    stages: Dict[str, Stage],
+    start: Optional[str] = None,
+    only: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Stages to run, in dependency order.
+
+    Args:
+        stages (Dict[str, Stage]): The pipeline.
+        start (Optional[str]): Run this stage and everything downstream of it.
+        only (Optional[List[str]]): Run just these stages.
+
+    Returns:
+        List[str]: Selected stage names. Unselected dependencies count as satisfied.
+    """
+    order = _topological_order(stages)
+    if only:
+        unknown = [name for name in only if name not in stages]
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {unknown}")
+        return [name for name in order if name in only]
+    if start:
+        if start not in stages:
+            raise ValueError(f"Unknown stage: {start}")
+        selected = {start}
+        for name in order:
+            if any(dep in selected for dep in stages[name].deps):
+                selected.add(name)
+        return [name for name in order if name in selected]
+    return order
+
+
+def _can_start(stage: Stage, running: List[Stage]) -> bool:
+    for resource, mode in stage.resources.items():
+        for other in running:
+            other_mode = other.resources.get(resource)
+            if other_mode and EXCLUSIVE in (mode, other_mode):
+                return False
+    return True
+
+
+def _execute(stage: Stage, state: Dict[str, Dict], force: bool) -> Dict:
+    """Runs one stage unless its inputs are unchanged. Called on a worker thread."""
+    started = time.perf_counter()
+    fp = None
+    if stage.inputs is not None:
+        try:
+            fp = fingerprint(stage.inputs())
+        except Exception as e:
+            print(f"⚠️  Could not fingerprint {stage.name} ({e}); running it")
+        previous = state.get(stage.name, {})
+        if fp is not None and not force and previous.get("fingerprint") == fp:
+            return {"status": "skipped", "fingerprint": fp, "seconds": 0.0}
+
+    print(f"🚀 {stage.name}")
+    try:
+        with measure_stage("pipeline", step=stage.name):
+            stage.run()
+    except Exception as e:
+        # Only the message reaches the summary; keep the stack for debugging
+        print(f"❌ {stage.name} raised:\n{traceback.format_exc()}")
+        return {"status": "failed", "error": str(e), "seconds": time.perf_counter() - started}
+    return {"status": "ok", "fingerprint": fp, "seconds": time.perf_counter() - started}
+
+
+def run_pipeline(
+    stages: Dict[str, Stage],
+    selected: List[str],
+    force: bool = False,
+    max_workers: int = RUNNER_WORKERS,
+    state_path: str = RUNNER_STATE_PATH,
+) -> Dict[str, Dict]:
+    """
+    Runs the selected stages, each as soon as its dependencies have finished.
+
+    Independent stages run in parallel on a thread pool (respecting `resources`).
+    A stage whose dependency failed is not run. The fingerprint of every stage that
+    succeeded is saved as soon as it finishes, so a rerun after a failure picks up
+    where this one stopped.
+
+    Args:
+        stages (Dict[str, Stage]): The pipeline.
+        selected (List[str]): Stages to run, from `select_stages`.
+        force (bool): Run selected stages even if their inputs are unchanged.
+        max_workers (int): Stages running at once.
+        state_path (str): JSON file holding the stage fingerprints.
+
+    Returns:
+        Dict[str, Dict]: Stage -> `status` (`ok`, `skipped`, `failed`, `blocked`),
+        `seconds` and, for failures, `error`.
+    """
+    state = load_state(state_path)
+    results: Dict[str, Dict] = {}
+    pending = list(selected)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="stage") as pool:
+        while pending or running:
+            for name in list(pending):
+                deps = [d for d in stages[name].deps if d in selected]
+                if any(results.get(d, {}).get("status") in ("failed", "blocked") for d in deps):
+                    results[name] = {"status": "blocked", "seconds": 0.0}
+                    pending.remove(name)
+                    print(f"⏭️  {name}: blocked by a failed dependency")
+                elif (
+                    all(d in results for d in deps)
+                    and len(running) < max(1, max_workers)
+                    and _can_start(stages[name], [stages[n] for n in running.values()])
+                ):
+                    running[pool.submit(_execute, stages[name], state, force)] = name
+                    pending.remove(name)
+
+            if not running:
+                # Nothing could start, so nothing ever will
+                if pending:
+                    raise RuntimeError(f"Stages cannot be scheduled: {pending}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result = future.result()
+                results[name] = result
+                if result["status"] == "skipped":
+                    print(f"⏭️  {name}: inputs unchanged")
+                elif result["status"] == "failed":
+                    print(f"❌ {name} failed after {result['seconds']:.2f}s: {result['error']}")
+                else:
+                    print(f"✅ {name} finished in {result['seconds']:.2f}s")
+                    if result["fingerprint"] is not None:
+                        state[name] = {
+                            "fingerprint": result["fingerprint"],
+                            "finished_at": datetime.now(timezone.utc).isoformat(),
+                            "seconds": round(result["seconds"], 3),
+                        }
+                        save_state(state, state_path)
+    return results
+
+
+# ------------------------------------------------------------------
+# Inputs of the pipeline stages
+# ------------------------------------------------------------------
+
+def delta_versions(paths: List[str]) -> Dict[str, Optional[int]]:
+    """Current version of each Delta table, None where it does not exist yet."""
+    from deltalake import DeltaTable
+
+    from pipelines.delta_lake import storage_options
+
+    versions = {}
+    for path in paths:
+        if DeltaTable.is_deltatable(path, storage_options=storage_options):
+            versions[path] = DeltaTable(path, storage_options=storage_options).version()
+        else:
+            versions[path] = None
+    return versions
+
+
+def files_digest(patterns: List[str]) -> str:
+    """SHA-256 over the paths and contents of every file matching `patterns`."""
+    digest = hashlib.sha256()
+    paths = {p for pattern in patterns for p in glob.glob(pattern, recursive=True)}
+    for path in sorted(p for p in paths if os.path.isfile(p)):
+        digest.update(path.encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def day_objects(day: date) -> List[List[str]]:
+    """Keys and ETags of the day's scraped NDJSON objects in MinIO."""
+    from pipelines.helper_functions import BUCKET_NAME, OBJECT_NAME_TEMPLATE, s3
+
+    prefix = posixpath.dirname(OBJECT_NAME_TEMPLATE.format(date=day)) + "/"
+    objects = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        objects.extend([obj["Key"], obj["ETag"]] for obj in page.get("Contents", []))
+    return sorted(objects)
+
+
+def _dbt_models(*folders: str) -> List[str]:
+    project = [os.path.join(DBT_PROJECT_DIR, name) for name in ("dbt_project.yml", "macros/**/*.sql")]
+    return project + [os.path.join(DBT_PROJECT_DIR, "models", folder, "**", "*") for folder in folders]
+
+
+def _lake_versions() -> Dict[str, Optional[int]]:
+    from pipelines.lake_cache import LAKE_TABLES
+
+    return delta_versions(list(LAKE_TABLES.values()))
+
+
+# ------------------------------------------------------------------
+# Stage bodies
+# ------------------------------------------------------------------
+# Pipeline modules are imported inside the stages: importing them opens MinIO
+# clients, and `--only dbt_marts` should not need any of that.
+
+def _scrape():
+    from pipelines.scrape_props import scrape_and_upload_ndjson, scrape_props_links_across_pages
+
+    links = scrape_props_links_across_pages(start_page=SCRAPE_START_PAGE, end_page=SCRAPE_END_PAGE)
+    print(f"Total property links found: {len(links)}")
+    scrape_and_upload_ndjson(links)
+
+
+def _ingest_raw():
+    from pipelines.delta_lake import ingest_raw
+
+    ingest_raw(date.today())
+
+
+def _build_silver():
+    from pipelines.delta_lake import build_silver_incremental
+
+    build_silver_incremental()
+
+
+def _duckdb_load():
+    from pipelines.duckdb_ingestion import main
+
+    main()
+
+
+def _with_warehouse(fn):
+    from pipelines.duckdb_ingestion import connect
+
+    con = connect()
+    try:
+        return fn(con)
+    finally:
+        # dbt opens the warehouse file next and needs it unlocked
+        con.close()
+
+
+def _lake_cache():
+    from pipelines.lake_cache import refresh_cache
+
+    for view, status in _with_warehouse(refresh_cache).items():
+        print(f"{view}: {status}")
+
+
+def _price_cube():
+    from pipelines.price_cube import refresh_price_cube
+
+    print(_with_warehouse(refresh_price_cube))
+
+
+def _dbt(selector: str) -> Callable[[], None]:
+    def run():
+        subprocess.run(
+            [
+                "dbt", "run",
+                "--project-dir", DBT_PROJECT_DIR,
+                "--profiles-dir", DBT_PROFILES_DIR,
+                "--select", selector,
+            ],
+            check=True,
+        )
+
+    return run
+
+
+def default_stages() -> Dict[str, Stage]:
+    """
+    The scrape -> raw -> silver -> warehouse -> dbt pipeline.
+
+    `duckdb_load` and `lake_cache` both only need silver and share the warehouse, so
+    they run side by side. The dbt stages and `price_cube` follow one another: dbt
+    runs in its own process and needs the DuckDB file to itself.
+    """
+    from pipelines.delta_lake import RAW_PATH
+    from pipelines.duckdb_ingestion import SOURCES
+
+    warehouse_shared = {"warehouse": SHARED}
+    # dbt runs as its own process and needs the DuckDB file to itself
+    warehouse_exclusive = {"warehouse": EXCLUSIVE}
+    stages = [
+        Stage(
+            "scrape", _scrape,
+            inputs=lambda: {"date": date.today(), "pages": [SCRAPE_START_PAGE, SCRAPE_END_PAGE]},
+        ),
+        Stage(
+            "ingest_raw", _ingest_raw, deps=["scrape"],
+            inputs=lambda: {"date": date.today(), "objects": day_objects(date.today())},
+        ),
+        Stage(
+            "build_silver", _build_silver, deps=["ingest_raw"],
+            inputs=lambda: delta_versions([RAW_PATH]),
+        ),
+        # Upserts new silver rows into the warehouse's *_mt tables
+        Stage(
+            "duckdb_load", _duckdb_load, deps=["build_silver"],
+            inputs=lambda: delta_versions([source["path"] for source in SOURCES.values()]),
+            resources=warehouse_shared,
+        ),
+        Stage(
+            "lake_cache", _lake_cache, deps=["build_silver"],
+            inputs=_lake_versions,
+            resources=warehouse_shared,
+        ),
+        Stage(
+            "dbt_staging", _dbt("tag:staging"), deps=["lake_cache"],
+            inputs=lambda: {"models": files_digest(_dbt_models("staging"))},
+            resources=warehouse_exclusive,
+        ),
+        Stage(
+            "dbt_intermediate", _dbt("tag:intermediate"), deps=["dbt_staging"],
+            inputs=lambda: {
+                "models": files_digest(_dbt_models("staging", "intermediate")),
+                "lake": _lake_versions(),
+            },
+            resources=warehouse_exclusive,
+        ),
+        Stage(
+            "dbt_marts", _dbt("tag:mart"), deps=["dbt_intermediate"],
+            inputs=lambda: {
+                "models": files_digest(_dbt_models("staging", "intermediate", "marts")),
+                "lake": _lake_versions(),
+            },
+            resources=warehouse_exclusive,
+        ),
+        Stage(
+            "price_cube", _price_cube, deps=["dbt_intermediate"],
+            # Reads the intermediate models, so it reruns when they change too
+            inputs=lambda: {
+                "models": files_digest(_dbt_models("staging", "intermediate")),
+                "lake": _lake_versions(),
+            },
+            resources=warehouse_shared,
+        ),
+    ]
+    return {stage.name: stage for stage in stages}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline, skipping stages whose inputs are unchanged")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--from", dest="start", metavar="STAGE",
+                       help="run this stage and everything downstream of it")
+    group.add_argument("--only", nargs="+", metavar="STAGE", help="run just these stages")
+    parser.add_argument("--force", action="store_true",
+                        help="run the selected stages even if their inputs are unchanged")
+    parser.add_argument("--workers", type=int, default=RUNNER_WORKERS,
+                        help="stages running at once")
+    parser.add_argument("--list", action="store_true", help="print the stages and exit")
+    args = parser.parse_args()
+
+    pipeline = default_stages()
+    selected = select_stages(pipeline, start=args.start, only=args.only)
+    if args.list:
+        for name in selected:
+            deps = ", ".join(pipeline[name].deps) or "-"
+            print(f"{name:<18} after: {deps}")
+        raise SystemExit(0)
+
+    started = time.perf_counter()
+    results = run_pipeline(pipeline, selected, force=args.force, max_workers=args.workers)
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(f"⏱️  Pipeline finished in {time.perf_counter() - started:.2f}s: {counts}")
+    if any(r["status"] in ("failed", "blocked") for r in results.values()):
+        raise SystemExit(1)
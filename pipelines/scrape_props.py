@@ -1,34 +1,70 @@
 import os
-import time
-import json
-import requests
-import io
+import asyncio
 import datetime
+import posixpath
+from contextlib import ExitStack
 
 from typing import List, Dict
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from dotenv import load_dotenv
 
-from pipelines.minio_upload import create_minio_client
-from pipelines.helper_functions import transform_to_json_url, flatten_json
+from pipelines.minio_upload import (
+    create_minio_client,
+    load_manifest,
+    manifest_objects,
+    ShardedNDJSONWriter,
+)
+from pipelines.helper_functions import (
+    transform_to_json_url,
+    flatten_json,
+    NESTED_LIST_PATHS,
+)
+from pipelines.async_fetcher import iter_fetch_json, summarize_latencies
+from pipelines.fetch_cache import FETCH_CACHE_PATH, FetchCache
+from pipelines.instrumentation import instrument_s3_client, stage
+from pipelines.listing_discovery import discover_listing_links
 
 load_dotenv()
 
 
 BASE_URL = os.getenv("BASE_URL")
 BUCKET_NAME = "staging"
+# Single-object layout of older days; new runs write part-*.ndjson shards and a
+# _manifest.json under the same dated prefix
 OBJECT_NAME_TEMPLATE = "raw/scraped_data_{date}/scraped_data_{date}.ndjson"
 
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "16"))
+FETCH_RATE_PER_SEC = float(os.getenv("FETCH_RATE_PER_SEC", "8"))
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "3"))
+
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+# "gzip", "zstd" or unset for plain NDJSON
+UPLOAD_COMPRESSION = os.getenv("UPLOAD_COMPRESSION") or None
+
+# Keep images/room_details as list<struct> columns instead of one column per element
+RAW_NESTED_LISTS = os.getenv("RAW_NESTED_LISTS", "false").lower() == "true"
+
+# Remember validators and content hashes of every listing (see fetch_cache.py)
+FETCH_CACHE_ENABLED = os.getenv("FETCH_CACHE_ENABLED", "true").lower() == "true"
+# Leave listings unchanged since the last run out of the day's data (conditional
+# requests, identical payloads dropped). Off by default: each day's raw partition then
+# holds every listing, and ingest_raw replaces the partition with what was written.
+FETCH_SKIP_UNCHANGED = os.getenv("FETCH_SKIP_UNCHANGED", "false").lower() == "true"
+# Record skipped listings in small seen-*.ndjson shards next to the day's data
+WRITE_SEEN_MARKERS = os.getenv("WRITE_SEEN_MARKERS", "false").lower() == "true"
+
+# Listings per shard: the most work a crashed run can lose
+SCRAPE_SHARD_SIZE = int(os.getenv("SCRAPE_SHARD_SIZE", "500"))
+# Continue today's run from its manifest; set to false to scrape the day afresh
+SCRAPE_RESUME = os.getenv("SCRAPE_RESUME", "true").lower() == "true"
+
 
 endpoint_url = os.getenv("MINIO_ENDPOINT_URL")
 access_key_id = os.getenv("MINIO_ACCESS_KEY_ID")
 secret_access_key = os.getenv("MINIO_SECRET_ACCESS_KEY")
 
-minio_client = create_minio_client(endpoint_url, access_key_id, secret_access_key)
+minio_client = instrument_s3_client(
+    create_minio_client(endpoint_url, access_key_id, secret_access_key)
+)
 
 # Ensure output directory exists
 # os.makedirs(SCRAPED_DATA_DIR, exist_ok=True)
@@ -39,85 +75,131 @@ date = datetime.date.today()
 
 
 def scrape_props_links_across_pages(start_page=1, end_page=3) -> List[str]:
-    options = Options()
-    # options.add_argument("--headless=new")  # Uncomment to run headless
-    driver = webdriver.Chrome(options=options)
-    all_links = []
-
-    try:
-        for page in range(start_page, end_page + 1):
-            print(f"Scraping page {page}...")
-            driver.get(BASE_URL.format(page=page))
-
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".property-card"))
-            )
-
-            time.sleep(2)  # Allow lazy-loaded content
-
-            cards = driver.find_elements(
-                By.CSS_SELECTOR, ".property-card .property-name a"
-            )
-            page_links = [
-                card.get_attribute("href")
-                for card in cards
-                if card.get_attribute("href")
-            ]
-            all_links.extend(page_links)
-
-            if page != end_page:
-                print("waiting 10 seconds before the next page...")
-                time.sleep(10)
-
-    except Exception as e:
-        print(f"Error scraping pages: {e}")
-    finally:
-        driver.quit()
-
-    return all_links
-
-
-def scrape_and_upload_ndjson(links: List[str]):
+    # Plain HTTP with a headless browser pool only for pages that need rendering
+    return discover_listing_links(start_page=start_page, end_page=end_page, base_url=BASE_URL)
+
+
+def scrape_and_upload_ndjson(
+    links: List[str],
+    concurrency: int = FETCH_CONCURRENCY,
+    rate_per_sec: float = FETCH_RATE_PER_SEC,
+    max_retries: int = FETCH_MAX_RETRIES,
+    part_size: int = UPLOAD_PART_SIZE,
+    compression: str = UPLOAD_COMPRESSION,
+    nested_lists: bool = RAW_NESTED_LISTS,
+    use_cache: bool = FETCH_CACHE_ENABLED,
+    skip_unchanged: bool = FETCH_SKIP_UNCHANGED,
+    seen_markers: bool = WRITE_SEEN_MARKERS,
+    shard_size: int = SCRAPE_SHARD_SIZE,
+    resume: bool = SCRAPE_RESUME,
+):
     # , start_page: int, end_page: int
-    buffer = io.StringIO()
-
-    for i, link in enumerate(links):
-        try:
-            json_url = transform_to_json_url(link)
-            response = requests.get(json_url, timeout=10)
-
-            if response.status_code == 200:
-                raw_data = response.json()
-                cleaned_data = flatten_json(raw_data)
-
-                if cleaned_data:
-                    buffer.write(json.dumps(cleaned_data) + "\n")
-                    print(f"{i+1}/{len(links)}: Written to buffer")
-
-            else:
-                print(
-                    f"Failed to fetch {json_url} – Status Code: {response.status_code}"
-                )
-
-        except Exception as e:
-            print(f"Error processing link {link}: {e}")
-
-    # Convert buffer to BytesIO for MinIO upload
-    byte_data = io.BytesIO(buffer.getvalue().encode("utf-8"))
-    object_name = OBJECT_NAME_TEMPLATE.format(date=date)
-
-    # Upload to MinIO
-    minio_client.put_object(
-        Bucket=BUCKET_NAME,
-        Key=object_name,
-        Body=byte_data,
-        ContentLength=byte_data.getbuffer().nbytes,
-        ContentType="application/x-ndjson",
+    prefix = posixpath.dirname(OBJECT_NAME_TEMPLATE.format(date=date))
+    keep_paths = NESTED_LIST_PATHS if nested_lists else ()
+    results = []
+    skip_unchanged = skip_unchanged and use_cache
+    if skip_unchanged and not resume and load_manifest(minio_client, BUCKET_NAME, prefix):
+        # The day is being rewritten, and the cache already holds its first run:
+        # skipping would leave those listings out of the new shards.
+        print(f"⚠️  Restarting {prefix}/ from scratch; writing unchanged listings too")
+        skip_unchanged = False
+
+    with ExitStack() as stack:
+        # Outermost, so the final shard uploads are part of the stage
+        metrics = stack.enter_context(stage("scrape"))
+        # Entered before the writer so its last changes are only committed once the shards are
+        cache = stack.enter_context(FetchCache(FETCH_CACHE_PATH)) if use_cache else None
+        writer = stack.enter_context(
+            ShardedNDJSONWriter(
+                minio_client,
+                BUCKET_NAME,
+                prefix,
+                shard_size=shard_size,
+                part_size=part_size,
+                compression=compression,
+                resume=resume,
+            )
+        )
+        todo = writer.pending(links)
+        metrics.add_rows(rows_in=len(todo))
+        if len(todo) < len(links):
+            print(f"Resuming: {len(links) - len(todo)} of {len(links)} links already done")
+
+        json_urls = [transform_to_json_url(link) for link in todo]
+        # One client and event loop for the whole run; results stream back in link
+        # order, so the NDJSON output is deterministic and only a window of
+        # `4 * concurrency` payloads is held in memory at a time
+        fetched = iter_fetch_json(
+            json_urls,
+            concurrency=concurrency,
+            rate_per_sec=rate_per_sec,
+            max_retries=max_retries,
+            request_headers=(
+                {url: cache.conditional_headers(url) for url in json_urls}
+                if skip_unchanged
+                else None
+            ),
+        )
+
+        async def consume():
+            async for result in fetched:
+                i, link = result.index, todo[result.index]
+                try:
+                    status = cache.classify(result) if cache else None
+                    if skip_unchanged and status in ("not_modified", "unchanged"):
+                        # Unchanged listings are only recorded as seen, not stored again
+                        if seen_markers:
+                            writer.write(
+                                {
+                                    "json_url": result.url,
+                                    "property_id": cache.get(result.url)["property_id"],
+                                    "seen_on": str(date),
+                                },
+                                stream="seen",
+                            )
+                        writer.mark_done(link)
+                        cache.record(result, status)
+                        print(f"{i+1}/{len(todo)}: Unchanged, skipped")
+
+                    elif result.ok:
+                        cleaned_data = flatten_json(result.payload, keep_paths=keep_paths)
+
+                        if cleaned_data:
+                            writer.write(cleaned_data)
+                            print(f"{i+1}/{len(todo)}: Written to stream")
+                        writer.mark_done(link)
+                        if cache:
+                            # Only now: a record that failed above is fetched again next run
+                            cache.record(result, status)
+
+                    elif result.error:
+                        print(f"Failed to fetch {result.url} – {result.error}")
+                    else:
+                        print(
+                            f"Failed to fetch {result.url} – Status Code: {result.status_code}"
+                        )
+
+                except Exception as e:
+                    print(f"Error processing link {link}: {e}")
+
+                result.payload = None  # keep the stats, release the payload
+                results.append(result)
+
+                if writer.checkpoint() and cache:
+                    cache.commit()
+
+        asyncio.run(consume())
+        metrics.add_rows(rows_out=writer.records_written)
+
+    print(f"Fetch latency stats: {summarize_latencies(results)}")
+    if cache:
+        print(f"Fetch cache stats: {cache.report()}")
+    print(
+        f"🚀 NDJSON shards uploaded to MinIO bucket '{BUCKET_NAME}' under '{prefix}/' "
+        f"({writer.records_written} records, {writer.bytes_uploaded} bytes, "
+        f"{len(manifest_objects(writer.manifest))} shards in total)"
     )
 
-    print(f"🚀 NDJSON file uploaded to MinIO bucket '{BUCKET_NAME}' as '{object_name}'")
-
-
 if __name__ == "__main__":
     start_page = 24
     end_page = 24
@@ -0,0 +1,197 @@
+# spatial.py
+
+import argparse
+import math
+from typing import List, Optional, Tuple
+
+import polars as pl
+
+from pipelines.delta_lake import STG_PROP_PATH, storage_options
+from pipelines.helper_functions import CELL_LEVELS, cell_id_expr, interleave_cell
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Most cells a query region is covered with; the level is chosen to stay below it
+MAX_COVER_CELLS = 64
+
+
+def _grid(latitude: float, longitude: float) -> Tuple[int, int]:
+    """Full-precision grid coordinates of a point, as `cell_id_expr` computes them."""
+    cell_max = 2**CELL_LEVELS - 1
+    x = math.floor((longitude + 180) / 360 * 2**CELL_LEVELS)
+    y = math.floor((latitude + 90) / 180 * 2**CELL_LEVELS)
+    return min(max(x, 0), cell_max), min(max(y, 0), cell_max)
+
+
+def haversine_km(latitude: str, longitude: str, lat: float, lon: float) -> pl.Expr:
+    """Great-circle distance in km from every row to one point, vectorized."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = pl.col(latitude).radians(), pl.col(longitude).radians()
+    a = ((lat2 - lat1) / 2).sin() ** 2 + math.cos(lat1) * lat2.cos() * ((lon2 - lon1) / 2).sin() ** 2
+    return (a.sqrt().arcsin() * 2 * EARTH_RADIUS_KM).alias("distance_km")
+
+
+def cover_ranges(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+    max_cells: int = MAX_COVER_CELLS,
+) -> List[Tuple[int, int]]:
+    """
+    Covers a bounding box with cells and returns their `cell_id` ranges.
+
+    Uses the finest level at which the box spans at most `max_cells` cells. Each
+    cell is a half-open `[lo, hi)` range of full-precision ids; adjacent ranges are
+    merged. The box must not cross the antimeridian.
+
+    Returns:
+        List[Tuple[int, int]]: Sorted, non-overlapping `cell_id` ranges.
+    """
+    x0, y0 = _grid(min_lat, min_lon)
+    x1, y1 = _grid(max_lat, max_lon)
+
+    for level in range(CELL_LEVELS, -1, -1):
+        drop = CELL_LEVELS - level
+        cx0, cx1, cy0, cy1 = x0 >> drop, x1 >> drop, y0 >> drop, y1 >> drop
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= max_cells:
+            break
+
+    span = 4**drop
+    starts = sorted(
+        interleave_cell(cx, cy) * span
+        for cx in range(cx0, cx1 + 1)
+        for cy in range(cy0, cy1 + 1)
+    )
+    ranges = []
+    for lo in starts:
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1] = (ranges[-1][0], lo + span)
+        else:
+            ranges.append((lo, lo + span))
+    return ranges
+
+
+class SpatialIndex:
+    """
+    Radius, bounding-box and nearest-neighbour queries over points with a `cell_id`.
+
+    Rows are kept sorted by `cell_id`, so every cell covering a query region is one
+    contiguous slice found by binary search. Queries read only those slices and then
+    filter them exactly, instead of computing distances to every row.
+
+    Args:
+        df (pl.DataFrame): Points with latitude/longitude columns. `cell_id` is
+            computed where missing; rows without coordinates are dropped.
+        latitude (str): Latitude column.
+        longitude (str): Longitude column.
+    """
+
+    def __init__(self, df: pl.DataFrame, latitude: str = "latitude", longitude: str = "longitude"):
+        self.latitude = latitude
+        self.longitude = longitude
+        cells = cell_id_expr(latitude, longitude)
+        if "cell_id" in df.columns:
+            # Rows written before cell ids existed have none yet
+            cells = pl.col("cell_id").fill_null(cells).alias("cell_id")
+        df = df.with_columns(cells)
+        self.frame = df.filter(pl.col("cell_id").is_not_null()).sort("cell_id")
+        self._cells = self.frame["cell_id"]
+
+    def __len__(self) -> int:
+        return self.frame.height
+
+    def _candidates(self, ranges: List[Tuple[int, int]]) -> pl.DataFrame:
+        starts = self._cells.search_sorted(pl.Series([lo for lo, _ in ranges]), side="left")
+        ends = self._cells.search_sorted(pl.Series([hi for _, hi in ranges]), side="left")
+        rows = pl.int_ranges(starts, ends, dtype=pl.UInt32, eager=True).explode().drop_nulls()
+        return self.frame[rows]
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> pl.DataFrame:
+        """Points inside a bounding box (inclusive)."""
+        candidates = self._candidates(cover_ranges(min_lat, min_lon, max_lat, max_lon))
+        return candidates.filter(
+            pl.col(self.latitude).is_between(min_lat, max_lat),
+            pl.col(self.longitude).is_between(min_lon, max_lon),
+        )
+
+    def radius(self, lat: float, lon: float, km: float) -> pl.DataFrame:
+        """
+        Points within `km` of a location, nearest first.
+
+        Returns:
+            pl.DataFrame: Matching rows with a `distance_km` column.
+        """
+        dlat = km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(lat))
+        dlon = 180.0 if cos_lat * 180 * KM_PER_DEGREE <= km else km / (KM_PER_DEGREE * cos_lat)
+        candidates = self._candidates(
+            cover_ranges(max(lat - dlat, -90), max(lon - dlon, -180),
+                         min(lat + dlat, 90), min(lon + dlon, 180))
+        )
+        return (
+            candidates.with_columns(haversine_km(self.latitude, self.longitude, lat, lon))
+            .filter(pl.col("distance_km") <= km)
+            .sort("distance_km")
+        )
+
+    def nearest(self, lat: float, lon: float, k: int = 10) -> pl.DataFrame:
+        """
+        The `k` points nearest to a location, nearest first.
+
+        Searches a radius sized from the index density and doubles it until it holds
+        at least `k` points; the `k` nearest are then guaranteed to be inside it.
+
+        Returns:
+            pl.DataFrame: Up to `k` rows with a `distance_km` column.
+        """
+        if not len(self):
+            return self.radius(lat, lon, 0.0)
+        lat_span = self.frame[self.latitude].max() - self.frame[self.latitude].min()
+        lon_span = self.frame[self.longitude].max() - self.frame[self.longitude].min()
+        area_km2 = max(lat_span * lon_span * KM_PER_DEGREE**2, 1e-6)
+        km = max(math.sqrt(k * area_km2 / (math.pi * len(self))), 0.05)
+
+        while True:
+            found = self.radius(lat, lon, km)
+            if found.height >= k or km >= math.pi * EARTH_RADIUS_KM:
+                return found.head(k)
+            km *= 2
+
+
+def load_property_index(columns: Optional[List[str]] = None, table: str = STG_PROP_PATH) -> SpatialIndex:
+    """
+    Builds a `SpatialIndex` over the silver property table.
+
+    Args:
+        columns (Optional[List[str]]): Extra columns to carry, e.g. `["price", "bedroom"]`.
+        table (str): Delta path holding `id`, `latitude`, `longitude` (and `cell_id`).
+
+    Returns:
+        SpatialIndex: Index over every property with coordinates.
+    """
+    lf = pl.scan_delta(table, storage_options=storage_options)
+    wanted = ["id", "latitude", "longitude"]
+    wanted += [c for c in columns or [] if c not in wanted]
+    if "cell_id" in lf.collect_schema().names():
+        wanted.append("cell_id")
+    df = lf.select(wanted).with_columns(
+        pl.col("latitude").cast(pl.Float64, strict=False),
+        pl.col("longitude").cast(pl.Float64, strict=False),
+    )
+    return SpatialIndex(df.collect())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query silver properties by location")
+    parser.add_argument("lat", type=float)
+    parser.add_argument("lon", type=float)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--radius-km", type=float, help="properties within this distance")
+    group.add_argument("--nearest", type=int, help="this many nearest properties")
+    parser.add_argument("--columns", nargs="*", default=["price", "bedroom", "postcode"])
+    args = parser.parse_args()
+
+    index = load_property_index(args.columns)
+    if args.radius_km is not None:
+        print(index.radius(args.lat, args.lon, args.radius_km))
+    else:
+        print(index.nearest(args.lat, args.lon, args.nearest))
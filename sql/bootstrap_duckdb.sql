@@ -22,11 +22,14 @@ CREATE PERSISTENT SECRET minio (
 
 --------------------------------------------------------------------
 -- 2. External Delta views
+--    `make refresh_lake_cache` repoints these at local copies in the
+--    lake_cache schema (refreshed when the Delta version changes).
 --------------------------------------------------------------------
 
 CREATE SCHEMA IF NOT EXISTS lake;
--- CREATE OR REPLACE VIEW raw_property_json AS
--- SELECT * FROM delta_scan('s3://delta/delta_table/raw/delta_2025-07-18');
+-- Single raw table partitioned by snapshot_date; filter on it to prune days
+CREATE OR REPLACE VIEW lake.raw_property_json AS
+SELECT * FROM delta_scan('s3://delta/delta_table/raw/property_json');
 
 CREATE OR REPLACE VIEW lake.ext_property_flat  AS
 SELECT * FROM delta_scan('s3://delta/delta_table/silver/property_details');
@@ -0,0 +1,110 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+
+from pipelines import async_fetcher
+from pipelines.async_fetcher import fetch_json_concurrently, iter_fetch_json
+
+URL = "https://www.example.ie/page-data/property/a1b2c3/page-data.json"
+PAYLOAD = {"result": {"pageContext": {"propertyData": {"_id": "a1b2c3"}}}}
+
+
+def replay(*responses: httpx.Response):
+    """Transport answering each request with the next response, recording the requests."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses[min(len(requests), len(responses)) - 1]
+
+    return httpx.MockTransport(handler), requests
+
+
+def fetch(transport, **kwargs):
+    options = {"rate_per_sec": 1000, "backoff_base": 0.001, "transport": transport}
+    return fetch_json_concurrently([URL], **{**options, **kwargs})[0]
+
+
+def test_429_is_retried_with_retry_after_capped(monkeypatch):
+    monkeypatch.setattr(async_fetcher, "MAX_RETRY_AFTER", 0.01)
+    transport, requests = replay(
+        httpx.Response(429, headers={"Retry-After": "3600"}),
+        httpx.Response(200, json=PAYLOAD),
+    )
+    result = fetch(transport, timeout=1.0)
+
+    assert result.ok
+    assert result.payload == PAYLOAD
+    assert result.attempts == len(requests) == 2
+
+
+def test_retry_after_is_capped():
+    response = httpx.Response(429, headers={"Retry-After": "86400"})
+    assert async_fetcher._retry_delay(response, 0, 0.5) == async_fetcher.MAX_RETRY_AFTER
+
+
+def test_5xx_is_retried_until_success():
+    transport, requests = replay(
+        httpx.Response(503), httpx.Response(502), httpx.Response(200, json=PAYLOAD)
+    )
+    result = fetch(transport)
+
+    assert result.ok
+    assert result.attempts == len(requests) == 3
+
+
+def test_5xx_gives_up_after_max_retries():
+    transport, requests = replay(httpx.Response(500))
+    result = fetch(transport, max_retries=2)
+
+    assert not result.ok
+    assert result.status_code == 500
+    assert result.attempts == len(requests) == 3
+
+
+def test_304_is_not_modified_and_not_retried():
+    transport, requests = replay(httpx.Response(304, headers={"ETag": '"v1"'}))
+    result = fetch(transport, request_headers={URL: {"If-None-Match": '"v1"'}})
+
+    assert result.not_modified
+    assert result.validators == {"ETag": '"v1"'}
+    assert requests[0].headers["If-None-Match"] == '"v1"'
+    assert result.attempts == len(requests) == 1
+
+
+@pytest.mark.parametrize("status", [404, 410])
+def test_client_errors_are_not_retried(status):
+    transport, requests = replay(httpx.Response(status))
+    result = fetch(transport)
+
+    assert result.status_code == status
+    assert result.attempts == len(requests) == 1
+
+
+def test_invalid_json_is_terminal():
+    transport, requests = replay(httpx.Response(200, text="<html>maintenance</html>"))
+    result = fetch(transport)
+
+    assert not result.ok
+    assert result.error.startswith("Invalid JSON")
+    assert result.attempts == len(requests) == 1
+
+
+def test_iter_fetch_json_yields_in_input_order():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(random.uniform(0, 0.01))
+        return httpx.Response(200, json={"path": request.url.path})
+
+    async def collect():
+        urls = [f"https://www.example.ie/{i}" for i in range(30)]
+        return [
+            result.payload["path"]
+            async for result in iter_fetch_json(
+                urls, concurrency=4, window=6, rate_per_sec=1000,
+                transport=httpx.MockTransport(handler),
+            )
+        ]
+
+    assert asyncio.run(collect()) == [f"/{i}" for i in range(30)]
@@ -0,0 +1,57 @@
+from datetime import date
+
+import polars as pl
+import pytest
+from deltalake import DeltaTable, write_deltalake
+
+from pipelines import delta_maintenance
+from pipelines.delta_maintenance import MAINTENANCE_TABLES, maintain_table, recent_partitions
+
+TODAY = date(2025, 7, 20)
+ID_COLUMN = "result.pageContext.propertyData._id"
+
+
+@pytest.fixture(autouse=True)
+def local_storage(monkeypatch):
+    # The module's MinIO options would be applied to the local test tables
+    monkeypatch.setattr(delta_maintenance, "storage_options", {})
+
+
+def small_raw_table(path: str) -> None:
+    """Three one-row appends into each of an old and a recent snapshot_date partition."""
+    for day in (date(2025, 6, 1), date(2025, 7, 19)):
+        for i in range(3):
+            df = pl.DataFrame({ID_COLUMN: [f"{day}-{i}"], "snapshot_date": [day]})
+            write_deltalake(path, df, mode="append", partition_by=["snapshot_date"])
+
+
+def files_per_day(path: str) -> dict:
+    actions = pl.DataFrame(DeltaTable(path).get_add_actions(flatten=True))
+    return dict(actions.group_by("partition.snapshot_date").len().rows())
+
+
+def test_maintain_table_compacts_only_recent_partitions(tmp_path):
+    path = str(tmp_path / "raw")
+    small_raw_table(path)
+
+    report = maintain_table(path, [], partition_filters=recent_partitions(7, today=TODAY))
+
+    assert report["files_removed"] == 3
+    assert files_per_day(path) == {date(2025, 6, 1): 3, date(2025, 7, 19): 1}
+    assert pl.read_delta(path).height == 6
+
+
+def test_maintain_table_compacts_when_no_zorder_column_is_usable(tmp_path):
+    path = str(tmp_path / "raw")
+    small_raw_table(path)
+
+    # A dotted name and a partition column both make delta-rs' z_order fail
+    report = maintain_table(path, [ID_COLUMN, "snapshot_date"])
+
+    assert report["zorder"] == []
+    assert files_per_day(path) == {date(2025, 6, 1): 1, date(2025, 7, 19): 1}
+
+
+def test_zorder_columns_are_top_level():
+    # delta-rs reads a dotted column name as a path into a struct
+    assert all("." not in column for columns in MAINTENANCE_TABLES.values() for column in columns)
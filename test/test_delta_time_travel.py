@@ -0,0 +1,38 @@
+import polars as pl
+import pytest
+from deltalake import DeltaTable, write_deltalake
+
+from pipelines import delta_time_travel
+from pipelines.delta_time_travel import diff_versions
+
+
+@pytest.fixture(autouse=True)
+def local_storage(monkeypatch):
+    # The module's MinIO options would be applied to the local test tables
+    monkeypatch.setattr(delta_time_travel, "storage_options", {})
+
+
+def two_versions(path: str) -> None:
+    write_deltalake(path, pl.DataFrame({"id": ["a", "b"], "price": [1, 2]}))
+    write_deltalake(path, pl.DataFrame({"id": ["a", "c"], "price": [5, 3]}), mode="overwrite")
+
+
+def test_diff_versions_reports_added_removed_and_changed(tmp_path):
+    path = str(tmp_path / "table")
+    two_versions(path)
+
+    diff = diff_versions(path, 0, 1, keys=["id"])
+
+    assert diff["added"]["id"].to_list() == ["c"]
+    assert diff["removed"]["id"].to_list() == ["b"]
+    assert diff["changed"].rows() == [("a", 5)]
+
+
+def test_reading_a_vacuumed_version_names_the_retention(tmp_path, monkeypatch):
+    path = str(tmp_path / "table")
+    two_versions(path)
+    DeltaTable(path).vacuum(retention_hours=0, enforce_retention_duration=False, dry_run=False)
+    monkeypatch.setattr(delta_time_travel, "RETENTION_HOURS", 0)
+
+    with pytest.raises(ValueError, match="DELTA_RETENTION_HOURS"):
+        diff_versions(path, 0, 1, keys=["id"])
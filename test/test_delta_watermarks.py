@@ -0,0 +1,65 @@
+import polars as pl
+import pytest
+from deltalake import DeltaTable, write_deltalake
+
+from pipelines.delta_watermarks import latest_version, scan_delta_changes
+
+
+@pytest.fixture
+def compacted_table(tmp_path):
+    """Two appends, a watermark, two more appends and then a compaction."""
+    path = str(tmp_path / "raw")
+    for i in (1, 2):
+        write_deltalake(path, pl.DataFrame({"id": [i]}).to_arrow(), mode="append")
+    watermark = latest_version(path, {})
+    for i in (3, 4):
+        write_deltalake(path, pl.DataFrame({"id": [i]}).to_arrow(), mode="append")
+    DeltaTable(path).optimize.compact()
+    return path, watermark
+
+
+def new_ids(path, watermark):
+    return sorted(scan_delta_changes(path, {}, watermark).collect()["id"])
+
+
+def test_changes_skip_compacted_files(compacted_table):
+    assert new_ids(*compacted_table) == [3, 4]
+
+
+def test_changes_survive_compaction_without_data_change_flags(compacted_table, monkeypatch):
+    # Newer deltalake releases list add actions without a data_change column
+    get_add_actions = DeltaTable.get_add_actions
+
+    def without_data_change(self, flatten=False):
+        return pl.DataFrame(get_add_actions(self, flatten)).drop("data_change").to_arrow()
+
+    monkeypatch.setattr(DeltaTable, "get_add_actions", without_data_change)
+    assert new_ids(*compacted_table) == [3, 4]
+
+
+def test_compacted_then_replaced_partition(tmp_path):
+    path = str(tmp_path / "raw")
+
+    def write(ids, day, mode="append"):
+        df = pl.DataFrame({"id": ids, "day": [day] * len(ids)})
+        predicate = f"day = '{day}'" if mode == "overwrite" else None
+        write_deltalake(path, df.to_arrow(), mode=mode, predicate=predicate, partition_by=["day"])
+
+    write([1], "d1")
+    watermark = latest_version(path, {})
+    write([2], "d1")
+    write([3], "d2")
+    DeltaTable(path).optimize.compact()
+    assert new_ids(path, watermark) == [2, 3]
+    # Re-ingesting d1 replaces its compacted file and the rows it carried
+    write([4], "d1", mode="overwrite")
+    assert new_ids(path, watermark) == [3, 4]
+
+
+def test_changes_after_appends(tmp_path):
+    path = str(tmp_path / "raw")
+    write_deltalake(path, pl.DataFrame({"id": [1]}).to_arrow())
+    watermark = latest_version(path, {})
+    write_deltalake(path, pl.DataFrame({"id": [2]}).to_arrow(), mode="append")
+    assert new_ids(path, watermark) == [2]
+    assert new_ids(path, latest_version(path, {})) == []
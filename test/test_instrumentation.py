@@ -0,0 +1,78 @@
+import json
+import threading
+import time
+
+import polars as pl
+import pytest
+from deltalake import write_deltalake
+
+from pipelines import instrumentation
+from pipelines.delta_watermarks import bytes_added, latest_version
+from pipelines.instrumentation import count_bytes, stage
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(instrumentation, "METRICS_ENABLED", True)
+    monkeypatch.setattr(instrumentation, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(instrumentation, "PROMETHEUS_TEXTFILE", str(tmp_path / "pipeline.prom"))
+    monkeypatch.setattr(instrumentation, "_latest", {})
+    return tmp_path
+
+
+def records(metrics_dir):
+    with open(metrics_dir / "stages.jsonl") as f:
+        return {r["labels"]["table"]: r for r in map(json.loads, f)}
+
+
+def test_bytes_are_credited_to_the_calling_threads_stage(metrics_dir):
+    # Both stages are open at once; each thread's bytes must land only in its own
+    barrier = threading.Barrier(2, timeout=5)
+
+    def merge(table, written):
+        with stage("silver.merge", table=table):
+            barrier.wait()
+            count_bytes(bytes_written=written)
+            barrier.wait()
+
+    threads = [threading.Thread(target=merge, args=(t, n)) for t, n in (("a", 100), ("b", 7))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    by_table = records(metrics_dir)
+    assert by_table["a"]["bytes_written"] == 100
+    assert by_table["b"]["bytes_written"] == 7
+
+
+def test_thread_cpu_ignores_other_threads(metrics_dir):
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            pass
+
+    busy = threading.Thread(target=spin)
+    busy.start()
+    try:
+        with stage("silver.merge", thread_cpu=True, table="idle"):
+            time.sleep(0.3)
+    finally:
+        stop.set()
+        busy.join()
+
+    assert records(metrics_dir)["idle"]["cpu_seconds"] < 0.1
+
+
+def test_bytes_added_counts_only_the_new_versions_files(tmp_path):
+    path = str(tmp_path / "table")
+    write_deltalake(path, pl.DataFrame({"id": [1, 2]}).to_arrow())
+    first = bytes_added(path, {})
+    assert first > 0
+
+    before = latest_version(path, {})
+    write_deltalake(path, pl.DataFrame({"id": [3]}).to_arrow(), mode="append")
+    added = bytes_added(path, {}, before)
+    assert 0 < added < bytes_added(path, {})
+    assert bytes_added(path, {}, latest_version(path, {})) == 0
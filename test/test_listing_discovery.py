@@ -0,0 +1,153 @@
+import os
+
+import httpx
+import pytest
+
+from pipelines.listing_discovery import (
+    PropertyCardLinkParser,
+    discover_listing_links,
+    parse_card_links,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+PAGE_URL = "https://www.example.ie/search/page-1/"
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def card_hrefs(html: str) -> list:
+    parser = PropertyCardLinkParser()
+    parser.feed(html)
+    parser.close()
+    return parser.links
+
+
+def test_parser_reads_only_property_name_links_inside_cards():
+    assert card_hrefs(fixture("listing_page.html")) == [
+        "/property-for-sale/12-main-street-rathmines-a1b2c3/",
+        "https://www.example.ie/property-for-sale/4-park-road-ranelagh-d4e5f6/",
+        "../property-for-sale/7-mill-lane-swords-g7h8i9/",
+        "/property-for-sale/12-main-street-rathmines-a1b2c3/",
+    ]
+
+
+def test_parse_card_links_resolves_and_dedupes_in_page_order():
+    assert parse_card_links(fixture("listing_page.html"), PAGE_URL) == [
+        "https://www.example.ie/property-for-sale/12-main-street-rathmines-a1b2c3/",
+        "https://www.example.ie/property-for-sale/4-park-road-ranelagh-d4e5f6/",
+        "https://www.example.ie/search/property-for-sale/7-mill-lane-swords-g7h8i9/",
+    ]
+
+
+def test_client_rendered_page_has_no_links():
+    assert parse_card_links(fixture("listing_page_client_rendered.html"), PAGE_URL) == []
+
+
+def test_nested_name_inside_card():
+    html = """
+    <div class="property-card"><section><div><div class="property-name">
+      <h3><span><a href="/a/">A</a></span></h3>
+    </div></div></section></div>
+    """
+    assert card_hrefs(html) == ["/a/"]
+
+
+def test_name_outside_card_and_card_link_outside_name_are_ignored():
+    html = """
+    <div class="property-name"><a href="/outside/">x</a></div>
+    <div class="property-card"><a href="/image/">img</a>
+      <h3 class="property-name"><a href="/inside/">y</a></h3>
+    </div>
+    """
+    assert card_hrefs(html) == ["/inside/"]
+
+
+def test_unclosed_elements_do_not_leak_card_context():
+    html = """
+    <div class="property-card">
+      <h3 class="property-name"><span><a href="/first/">first</a>
+      <p>unclosed paragraph
+    </div>
+    <div class="footer"><a href="/after-card/">after</a></div>
+    <div class="property-card"><div class="property-name"><a href="/second/">second</a></div></div>
+    """
+    assert card_hrefs(html) == ["/first/", "/second/"]
+
+
+def test_void_and_self_closing_tags_keep_context():
+    html = """
+    <div class="property-card"><div class="property-name">
+      <img src="/x.jpg"><br><a href="/kept/"/>
+      <a href="/also-kept/">z</a>
+    </div></div>
+    """
+    assert card_hrefs(html) == ["/kept/", "/also-kept/"]
+
+
+@pytest.mark.parametrize(
+    "href, expected",
+    [
+        ("/p/1/", "https://www.example.ie/p/1/"),
+        ("p/1/", "https://www.example.ie/search/page-1/p/1/"),
+        ("../p/1/", "https://www.example.ie/search/p/1/"),
+        ("//cdn.example.ie/p/1/", "https://cdn.example.ie/p/1/"),
+        ("https://other.example.ie/p/1/", "https://other.example.ie/p/1/"),
+    ],
+)
+def test_relative_links_are_resolved_against_the_page(href, expected):
+    html = f'<div class="property-card"><h3 class="property-name"><a href="{href}">x</a></h3></div>'
+    assert parse_card_links(html, PAGE_URL) == [expected]
+
+
+def test_duplicate_links_are_dropped_after_resolving():
+    html = """
+    <div class="property-card"><h3 class="property-name"><a href="/p/1/">x</a></h3></div>
+    <div class="property-card"><h3 class="property-name"><a href="https://www.example.ie/p/1/">x</a></h3></div>
+    <div class="property-card"><h3 class="property-name"><a href="/p/2/">y</a></h3></div>
+    """
+    assert parse_card_links(html, PAGE_URL) == [
+        "https://www.example.ie/p/1/",
+        "https://www.example.ie/p/2/",
+    ]
+
+
+def test_discover_listing_links_over_mock_transport():
+    pages = {
+        "/search/page-1/": fixture("listing_page.html"),
+        # Page 2 repeats a card from page 1 and adds one of its own
+        "/search/page-2/": (
+            '<div class="property-card"><h3 class="property-name">'
+            '<a href="/property-for-sale/4-park-road-ranelagh-d4e5f6/">dup</a></h3></div>'
+            '<div class="property-card"><h3 class="property-name">'
+            '<a href="/property-for-sale/9-station-road-howth-j1k2l3/">new</a></h3></div>'
+        ),
+        "/search/page-3/": fixture("listing_page_client_rendered.html"),
+    }
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        if request.url.path in pages:
+            return httpx.Response(200, text=pages[request.url.path])
+        return httpx.Response(404, text="not found")
+
+    links = discover_listing_links(
+        start_page=1,
+        end_page=4,
+        base_url="https://www.example.ie/search/page-{page}/",
+        rate_per_sec=1000,
+        browser_fallback=False,
+        transport=httpx.MockTransport(handler),
+    )
+
+    assert links == [
+        "https://www.example.ie/property-for-sale/12-main-street-rathmines-a1b2c3/",
+        "https://www.example.ie/property-for-sale/4-park-road-ranelagh-d4e5f6/",
+        "https://www.example.ie/search/property-for-sale/7-mill-lane-swords-g7h8i9/",
+        "https://www.example.ie/property-for-sale/9-station-road-howth-j1k2l3/",
+    ]
+    # 404 is not retried; each page is requested once
+    assert sorted(requested) == [f"/search/page-{n}/" for n in range(1, 5)]
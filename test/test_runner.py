@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from pipelines import instrumentation
+from pipelines.runner import EXCLUSIVE, SHARED, Stage, _can_start, default_stages, run_pipeline
+
+
+@pytest.fixture(autouse=True)
+def no_metrics(monkeypatch):
+    monkeypatch.setattr(instrumentation, "METRICS_ENABLED", False)
+
+
+def run(stages, tmp_path, workers=4):
+    pipeline = {stage.name: stage for stage in stages}
+    return run_pipeline(pipeline, list(pipeline), max_workers=workers,
+                        state_path=str(tmp_path / "state.json"))
+
+
+def test_independent_stages_run_together(tmp_path):
+    # Each stage waits for the other; run one after the other, the barrier times out
+    barrier = threading.Barrier(2, timeout=5)
+    shared = {"warehouse": SHARED}
+    results = run(
+        [
+            Stage("silver", lambda: None),
+            Stage("load", barrier.wait, deps=["silver"], resources=shared),
+            Stage("cache", barrier.wait, deps=["silver"], resources=shared),
+        ],
+        tmp_path,
+    )
+    assert {name: r["status"] for name, r in results.items()} == {
+        "silver": "ok", "load": "ok", "cache": "ok",
+    }
+
+
+def test_exclusive_stages_never_overlap(tmp_path):
+    active, snapshots, lock = set(), [], threading.Lock()
+
+    def body(name):
+        def run_stage():
+            with lock:
+                active.add(name)
+                snapshots.append(set(active))
+            time.sleep(0.05)
+            with lock:
+                active.discard(name)
+
+        return run_stage
+
+    results = run(
+        [
+            Stage("dbt", body("dbt"), resources={"warehouse": EXCLUSIVE}),
+            Stage("cube", body("cube"), resources={"warehouse": SHARED}),
+            Stage("load", body("load"), resources={"warehouse": SHARED}),
+        ],
+        tmp_path,
+    )
+    assert all(r["status"] == "ok" for r in results.values())
+    assert {"cube", "load"} in snapshots
+    assert all(snapshot == {"dbt"} for snapshot in snapshots if "dbt" in snapshot)
+
+
+def test_failed_stage_blocks_only_its_dependents(tmp_path):
+    def fail():
+        raise RuntimeError("boom")
+
+    results = run(
+        [
+            Stage("a", fail),
+            Stage("b", lambda: None, deps=["a"]),
+            Stage("c", lambda: None),
+        ],
+        tmp_path,
+    )
+    assert {name: r["status"] for name, r in results.items()} == {
+        "a": "failed", "b": "blocked", "c": "ok",
+    }
+
+
+def test_default_pipeline_loads_the_warehouse_in_parallel():
+    stages = default_stages()
+    load, cache = stages["duckdb_load"], stages["lake_cache"]
+
+    assert load.deps == cache.deps == ["build_silver"]
+    assert _can_start(load, [cache]) and _can_start(cache, [load])
+    assert not _can_start(stages["dbt_marts"], [stages["price_cube"]])